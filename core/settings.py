@@ -35,6 +35,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Ghi giỏ hàng của khách vào session / cookie (shop/cart_utils.py)
+    'shop.middleware.GuestCartMiddleware',
+    # Cache toàn trang catalog cho khách chưa đăng nhập (phải đứng cuối)
+    'shop.middleware.AnonymousPageCacheMiddleware',
 ]
 
 # Cấu hình URL gốc
@@ -52,7 +56,6 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'shop.context_processors.cart_context',
             ],
         },
     },
@@ -69,6 +72,40 @@ DATABASES = {
     }
 }
 
+# Test runner: cache dạng file (catalog version) nằm trong thư mục tạm khi chạy test
+TEST_RUNNER = 'core.test_runner.ShopTestRunner'
+
+# Cache - dùng cho cache catalog (trang chủ, sản phẩm)
+# 'default' là LocMemCache riêng của từng process. Catalog version và session phải
+# dùng chung giữa các worker web và management command (rebuild_search_index,
+# rebuild_review_stats...), nên nằm trong cache file 'catalog_version' và 'sessions'.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'phone-shop',
+    },
+    'catalog_version': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'catalog-version',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Session đọc từ cache (ghi cả vào database) - badge giỏ hàng đọc tóm tắt giỏ
+# từ session nên không tốn truy vấn database nào khi cache còn. Cache 'sessions'
+# dùng chung giữa các worker: đăng xuất, gộp giỏ khi đăng nhập hay tóm tắt giỏ
+# hàng ghi ở worker này thì worker khác đọc được ngay (LocMemCache thì không)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Nơi lưu giỏ hàng của khách chưa đăng nhập: 'cookie' (cookie đã ký), 'session'
+# hoặc 'database' (Cart/CartItem). Giỏ được chuyển vào database khi khách đăng nhập.
+CART_STORAGE = 'cookie'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -0,0 +1,33 @@
+"""
+Test runner của project.
+Cache dạng file (FileBasedCache trong settings.CACHES, ví dụ catalog version)
+được chuyển sang một thư mục tạm cho mỗi lần chạy test, để test không đọc và
+không tăng version của server dev đang chạy trên cùng thư mục project.
+"""
+
+import copy
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class ShopTestRunner(DiscoverRunner):
+    """DiscoverRunner với cache file trong thư mục tạm (xóa khi chạy xong)."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='phone-shop-test-cache-')
+        test_caches = copy.deepcopy(settings.CACHES)
+        for alias, config in test_caches.items():
+            if config['BACKEND'] == 'django.core.cache.backends.filebased.FileBasedCache':
+                config['LOCATION'] = f'{self.cache_dir}/{alias}'
+        self.cache_override = override_settings(CACHES=test_caches)
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
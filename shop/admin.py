@@ -9,13 +9,15 @@ from .models import (
     ProductImage, 
     StorageOption, 
     ColorOption, 
+    ProductAttribute,
     Review, 
     Coupon,
     ShippingAddress,
     Order,
     OrderItem,
     SpecialPromotion,
-    SpecialPromotionProduct
+    SpecialPromotionProduct,
+    SearchQueryDaily
 )
 
 
@@ -29,6 +31,8 @@ class StorageOptionInline(admin.TabularInline):
     """Hiển thị tùy chọn bộ nhớ inline."""
     model = StorageOption
     extra = 1
+    # Giá khuyến mãi được tính tự động từ discount_percent của sản phẩm
+    readonly_fields = ['sale_price']
 
 
 class ColorOptionInline(admin.TabularInline):
@@ -37,6 +41,18 @@ class ColorOptionInline(admin.TabularInline):
     extra = 1
 
 
+class ProductAttributeInline(admin.TabularInline):
+    """Hiển thị thông số có cấu trúc (chỉ đọc - tách tự động từ specifications)."""
+    model = ProductAttribute
+    extra = 0
+    can_delete = False
+    fields = ['key', 'label', 'value', 'numeric_value']
+    readonly_fields = fields
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     """
@@ -49,11 +65,13 @@ class ProductAdmin(admin.ModelAdmin):
         'original_price', 
         'sale_price', 
         'discount_percent',
+        'review_count',
         'created_at'
     ]
     list_filter = ['brand', 'created_at']
     search_fields = ['name', 'brand']
-    inlines = [ProductImageInline, StorageOptionInline, ColorOptionInline]
+    readonly_fields = ['review_count', 'last_reviewed_at']
+    inlines = [ProductImageInline, StorageOptionInline, ColorOptionInline, ProductAttributeInline]
 
 
 @admin.register(Review)
@@ -149,3 +167,16 @@ class SpecialPromotionAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(SearchQueryDaily)
+class SearchQueryDailyAdmin(admin.ModelAdmin):
+    """Admin cho thống kê tìm kiếm theo ngày (chỉ xem - tạo bởi rollup_search_logs)."""
+    list_display = ['date', 'query', 'searches', 'zero_results', 'total_results']
+    list_filter = ['date']
+    search_fields = ['query']
+    ordering = ['-date', '-searches']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
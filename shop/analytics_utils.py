@@ -0,0 +1,192 @@
+"""
+Search analytics utilities for the shop application.
+Thống kê tìm kiếm: khách tìm gì, từ khóa nào không có kết quả.
+
+Mỗi lượt tìm kiếm (từ khóa đã chuẩn hóa, số kết quả, thời gian xử lý) được
+đưa vào bộ đệm trong bộ nhớ của process thay vì ghi database ngay trong
+request. Bộ đệm được ghi xuống bảng SearchLog bằng một lần bulk_create khi
+đủ SEARCH_LOG_BATCH_SIZE lượt hoặc đã quá SEARCH_LOG_FLUSH_INTERVAL giây kể
+từ lần ghi trước (kiểm tra mỗi khi có lượt mới), và khi process kết thúc.
+
+SearchLog được tổng hợp theo ngày và từ khóa vào SearchQueryDaily
+(rollup_search_logs, lệnh python manage.py rollup_search_logs); báo cáo
+trong trang quản trị chỉ đọc bảng tổng hợp này.
+"""
+
+import atexit
+import datetime
+import logging
+import threading
+import time
+
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+# Ghi xuống database khi bộ đệm có đủ số lượt này...
+SEARCH_LOG_BATCH_SIZE = 100
+
+# ...hoặc khi đã quá số giây này kể từ lần ghi trước
+SEARCH_LOG_FLUSH_INTERVAL = 30
+
+# Số lượt tối đa giữ lại khi ghi database lỗi (quá thì bỏ lượt cũ nhất)
+SEARCH_LOG_MAX_BUFFER = 5000
+
+# Số ngày mặc định của báo cáo và số từ khóa mỗi bảng
+SEARCH_REPORT_DAYS = 7
+SEARCH_REPORT_LIMIT = 20
+
+
+class SearchLogBuffer:
+    """Bộ đệm lượt tìm kiếm trong bộ nhớ, ghi xuống SearchLog theo lô."""
+
+    def __init__(self, batch_size=SEARCH_LOG_BATCH_SIZE, flush_interval=SEARCH_LOG_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.records = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+    def record(self, query, result_count, latency_ms, corrected_query=''):
+        """Thêm một lượt tìm kiếm; ghi cả lô xuống database nếu đã đến ngưỡng."""
+        from .models import SearchLog
+
+        entry = SearchLog(
+            query=query[:200],
+            corrected_query=corrected_query[:200],
+            result_count=result_count,
+            latency_ms=round(latency_ms, 2),
+            created_at=timezone.now(),
+        )
+        with self.lock:
+            self.records.append(entry)
+            due = (
+                len(self.records) >= self.batch_size
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Ghi mọi lượt đang chờ bằng một lần bulk_create. Trả về số lượt đã ghi."""
+        from .models import SearchLog
+
+        with self.lock:
+            records, self.records = self.records, []
+            self.last_flush = time.monotonic()
+        if not records:
+            return 0
+        try:
+            # Transaction riêng: không bị rollback cùng request đang xử lý
+            with transaction.atomic():
+                SearchLog.objects.bulk_create(records, batch_size=500)
+        except DatabaseError:
+            logger.exception('Không ghi được %d lượt tìm kiếm', len(records))
+            with self.lock:
+                self.records = (records + self.records)[-SEARCH_LOG_MAX_BUFFER:]
+            return 0
+        return len(records)
+
+
+# Bộ đệm dùng chung trong process
+search_log_buffer = SearchLogBuffer()
+atexit.register(search_log_buffer.flush)
+
+
+def record_search(query, result_count, latency_ms, corrected_query=''):
+    """Ghi nhận một lượt tìm kiếm (không truy vấn database trừ khi đến lúc ghi lô)."""
+    from .search_utils import search_cache_key
+
+    key = search_cache_key(query)
+    if key:
+        search_log_buffer.record(key, result_count, latency_ms, search_cache_key(corrected_query))
+
+
+def day_range(day):
+    """Khoảng thời gian [đầu ngày, đầu ngày hôm sau) của một ngày theo múi giờ hiện tại."""
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def rollup_search_logs(day):
+    """
+    Tổng hợp SearchLog của một ngày vào SearchQueryDaily (1 truy vấn GROUP BY).
+    Chạy lại nhiều lần cho cùng một ngày vẫn cho cùng kết quả.
+    Trả về số từ khóa của ngày đó.
+    """
+    from .models import SearchLog, SearchQueryDaily
+
+    start, end = day_range(day)
+    rows = (
+        SearchLog.objects.filter(created_at__gte=start, created_at__lt=end)
+        .values('query')
+        .annotate(
+            searches=Count('id'),
+            zero_results=Count('id', filter=Q(result_count=0)),
+            total_results=Sum('result_count'),
+            total_latency_ms=Sum('latency_ms'),
+        )
+        .order_by()
+    )
+    rollups = [SearchQueryDaily(date=day, **row) for row in rows]
+    with transaction.atomic():
+        SearchQueryDaily.objects.filter(date=day).delete()
+        SearchQueryDaily.objects.bulk_create(rollups, batch_size=500)
+    return len(rollups)
+
+
+def purge_search_logs(keep_days):
+    """Xóa SearchLog cũ hơn keep_days ngày (đã có trong bảng tổng hợp). Trả về số dòng đã xóa."""
+    from .models import SearchLog
+
+    cutoff, end = day_range(timezone.localdate() - datetime.timedelta(days=keep_days))
+    deleted, details = SearchLog.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def get_search_report(days=SEARCH_REPORT_DAYS, limit=SEARCH_REPORT_LIMIT):
+    """
+    Báo cáo từ khóa trong days ngày gần nhất (từ bảng tổng hợp theo ngày):
+    tổng số lượt, từ khóa phổ biến nhất và từ khóa không có kết quả nhiều nhất.
+    """
+    from .models import SearchQueryDaily
+
+    since = timezone.localdate() - datetime.timedelta(days=days - 1)
+    queries = (
+        SearchQueryDaily.objects.filter(date__gte=since)
+        .values('query')
+        .annotate(
+            search_count=Sum('searches'),
+            zero_count=Sum('zero_results'),
+            result_sum=Sum('total_results'),
+            latency_sum=Sum('total_latency_ms'),
+        )
+    )
+    totals = SearchQueryDaily.objects.filter(date__gte=since).aggregate(
+        search_count=Sum('searches'),
+        zero_count=Sum('zero_results'),
+    )
+
+    def with_averages(rows):
+        rows = list(rows)
+        for row in rows:
+            row['avg_results'] = row['result_sum'] / row['search_count']
+            row['avg_latency_ms'] = row['latency_sum'] / row['search_count']
+        return rows
+
+    searches = totals['search_count'] or 0
+    zero_results = totals['zero_count'] or 0
+    return {
+        'days': days,
+        'since': since,
+        'searches': searches,
+        'zero_results': zero_results,
+        'zero_result_rate': zero_results / searches * 100 if searches else 0,
+        'top_queries': with_averages(queries.order_by('-search_count', 'query')[:limit]),
+        'zero_result_queries': with_averages(
+            queries.filter(zero_count__gt=0).order_by('-zero_count', 'query')[:limit]
+        ),
+    }
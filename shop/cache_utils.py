@@ -0,0 +1,257 @@
+"""
+Cache utilities for the shop application.
+Các hàm tiện ích cache cho catalog (trang chủ, sản phẩm).
+
+Catalog version là một số nguyên lưu trong cache, được tăng mỗi khi
+Product / Promotion / PromotionProduct thay đổi (xem signals trong models.py).
+Mọi key cache của catalog đều chứa version, nên khi version đổi thì dữ liệu
+cũ tự động không còn được đọc nữa (không cần xóa từng key).
+
+Version nằm trong cache 'catalog_version' (settings.CACHES, dùng chung giữa các
+process) để thay đổi từ management command hoặc worker khác cũng đến được mọi
+worker web; dữ liệu catalog vẫn nằm trong cache 'default' của từng process.
+Nếu không cấu hình 'catalog_version' thì version nằm trong 'default': với
+LocMemCache, sau khi chạy command phải khởi động lại server để thấy dữ liệu mới.
+Search version (cache kết quả tìm kiếm, từ vựng sửa lỗi chính tả) cũng nằm ở đó
+nhưng chỉ tăng khi nội dung tìm kiếm của sản phẩm đổi.
+Trong một request, mỗi version chỉ được đọc từ cache dùng chung một lần rồi nhớ
+trong thread (bỏ đi ở đầu và cuối mỗi request, xem signals trong models.py).
+"""
+
+import datetime
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+# Version của dữ liệu tìm kiếm (hãng, tên, search_text): chỉ tăng khi sản phẩm
+# được thêm/xóa hoặc đổi nội dung tìm kiếm, không tăng khi chỉ đổi giá, tồn kho...
+SEARCH_VERSION_KEY = 'search:version'
+
+# Alias trong settings.CACHES của cache chứa catalog version / search version
+CATALOG_VERSION_CACHE = 'catalog_version'
+
+# Thời gian sống của các section trang chủ (giây)
+HOME_SECTIONS_TIMEOUT = 60 * 60
+
+# Thời gian sống của danh sách hãng (giây)
+BRANDS_TIMEOUT = 60 * 60
+
+# Thời gian sống của cache toàn trang cho khách chưa đăng nhập (giây)
+PAGE_CACHE_TIMEOUT = 10 * 60
+
+# Các version đã đọc trong request hiện tại (mỗi thread một giá trị)
+_request_local = threading.local()
+
+
+def get_version_cache():
+    """Cache chứa các version: 'catalog_version' nếu đã cấu hình, nếu không thì 'default'."""
+    if CATALOG_VERSION_CACHE in settings.CACHES:
+        return caches[CATALOG_VERSION_CACHE]
+    return cache
+
+
+def get_request_versions():
+    """Các version đã đọc trong request hiện tại {key: version}."""
+    versions = getattr(_request_local, 'versions', None)
+    if versions is None:
+        versions = _request_local.versions = {}
+    return versions
+
+
+def get_version(key):
+    """
+    Lấy version hiện tại của key (đọc cache dùng chung một lần mỗi request).
+    Nếu chưa có (hoặc bị cache xóa) thì khởi tạo bằng timestamp (ms),
+    để không bao giờ quay lại một version cũ đã từng dùng.
+    """
+    versions = get_request_versions()
+    version = versions.get(key)
+    if version is None:
+        version = versions[key] = read_version(key)
+    return version
+
+
+def read_version(key):
+    """Đọc version từ cache dùng chung (khởi tạo nếu chưa có)."""
+    version_cache = get_version_cache()
+    version = version_cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        version_cache.add(key, version, None)
+        version = version_cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    """Tăng version của key."""
+    version = max(int(time.time() * 1000), read_version(key) + 1)
+    get_version_cache().set(key, version, None)
+    get_request_versions()[key] = version
+    return version
+
+
+def forget_versions():
+    """Bỏ các version đã nhớ trong thread (lần đọc sau lấy lại từ cache dùng chung)."""
+    _request_local.versions = {}
+
+
+def get_catalog_version():
+    """Lấy version hiện tại của catalog."""
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Tăng version catalog - làm mất hiệu lực toàn bộ cache của catalog."""
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def get_search_version():
+    """Lấy version hiện tại của dữ liệu tìm kiếm (cache kết quả tìm kiếm, từ vựng sửa lỗi chính tả)."""
+    return get_version(SEARCH_VERSION_KEY)
+
+
+def bump_search_version():
+    """Tăng search version - làm mất hiệu lực các cache tìm kiếm."""
+    return bump_version(SEARCH_VERSION_KEY)
+
+
+def is_anonymous_catalog_request(request):
+    """
+    Request có được dùng validator (ETag / Last-Modified) của catalog không:
+    chỉ khách chưa đăng nhập và không có thông báo (messages) đang chờ hiển thị.
+    """
+    if request.user.is_authenticated:
+        return False
+    if request.COOKIES.get('messages'):
+        return False
+    if settings.SESSION_COOKIE_NAME in request.COOKIES and request.session.get('_messages'):
+        return False
+    return True
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    ETag cho các trang catalog (trang chủ, chi tiết, tìm kiếm) - không truy vấn database.
+    Gồm catalog version, URL đầy đủ và CSRF cookie (các form trong trang chứa token).
+    Lấy cookie CSRF từ request.META (giá trị sẽ gửi kèm response), không từ
+    request.COOKIES: lần đầu khách chưa có cookie, ETag vẫn khớp ở request sau.
+    """
+    if not is_anonymous_catalog_request(request):
+        return None
+    raw = '|'.join([
+        str(get_catalog_version()),
+        request.get_full_path(),
+        request.META.get('CSRF_COOKIE', ''),
+    ])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    """
+    Last-Modified cho các trang catalog.
+    Catalog version là timestamp (ms) của lần thay đổi gần nhất (hoặc lúc khởi tạo cache).
+    """
+    if not is_anonymous_catalog_request(request):
+        return None
+    return datetime.datetime.fromtimestamp(get_catalog_version() / 1000, tz=datetime.timezone.utc)
+
+
+def anonymous_page_cache(view_func):
+    """
+    Đánh dấu view được cache toàn trang cho khách chưa đăng nhập
+    (xem AnonymousPageCacheMiddleware trong middleware.py).
+    Trang của view phải giống nhau với mọi khách: không có csrf_token
+    trong HTML (form lấy token từ cookie bằng JS) và không có giỏ hàng.
+    """
+    view_func.anonymous_page_cache = True
+    return view_func
+
+
+def page_cache_key(request):
+    """Key cache toàn trang: theo catalog version và URL đầy đủ."""
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{get_catalog_version()}:{path_hash}'
+
+
+def get_home_sections():
+    """
+    Lấy dữ liệu các section "sản phẩm mới" và "khuyến mãi đặc biệt" của trang chủ.
+    Kết quả được cache theo catalog version, nên khi cache còn ấm
+    thì trang chủ không cần truy vấn database cho dữ liệu catalog.
+    """
+    version = get_catalog_version()
+    key = f'home:sections:{version}'
+
+    sections = cache.get(key)
+    if sections is None:
+        sections = build_home_sections()
+        # Lần build đầu tiên tạo Promotion (signal tăng version): lưu theo version mới
+        key = f'home:sections:{get_catalog_version()}'
+        cache.set(key, sections, HOME_SECTIONS_TIMEOUT)
+    return sections
+
+
+def get_catalog_brands():
+    """
+    Danh sách các hãng đang có sản phẩm (sắp xếp theo tên).
+    Cache theo catalog version, dùng cho bộ lọc hãng của trang danh sách.
+    """
+    key = f'catalog:brands:{get_catalog_version()}'
+
+    brands = cache.get(key)
+    if brands is None:
+        from .models import Product
+        brands = list(
+            Product.objects.order_by('brand').values_list('brand', flat=True).distinct()
+        )
+        cache.set(key, brands, BRANDS_TIMEOUT)
+    return brands
+
+
+def build_home_sections():
+    """Truy vấn database và tính toán dữ liệu các section trang chủ."""
+    from .models import Product, Promotion
+
+    # Lấy tối đa 15 sản phẩm, sắp xếp theo ngày tạo mới nhất
+    products = list(Product.objects.all().order_by('-created_at')[:15])
+
+    # Lấy sản phẩm khuyến mãi đặc biệt từ Promotion model
+    special_promotions = []
+    show_promotion = False
+
+    # Chỉ tạo promotion config khi chưa có (lần build đầu tiên)
+    promotion = Promotion.objects.filter(id=1).first()
+    if promotion is None:
+        promotion, created = Promotion.objects.get_or_create(id=1)
+
+    if promotion.is_active:
+        show_promotion = True
+        max_products = promotion.max_products or 5
+        # Lấy sản phẩm từ PromotionProduct
+        promo_products = promotion.promotion_products.select_related('product')[:max_products]
+        for promo_product in promo_products:
+            product = promo_product.product
+            # Tính phần trăm giảm giá từ giá gốc và giá bán
+            if product.original_price > 0 and product.sale_price < product.original_price:
+                discount_percent = int((product.original_price - product.sale_price) / product.original_price * 100)
+            else:
+                discount_percent = int(product.discount_percent) if product.discount_percent else 0
+
+            special_promotions.append({
+                'product': product,
+                'discount_percent': discount_percent,
+                'discounted_price': product.sale_price,
+            })
+
+    return {
+        'products': products,
+        'show_promotion': show_promotion,
+        'special_promotions': special_promotions,
+        'promotion': promotion,
+    }
@@ -0,0 +1,581 @@
+"""
+Cart storage utilities for the shop application.
+Nơi lưu giỏ hàng: database (Cart/CartItem) hoặc, với khách chưa đăng nhập,
+session / cookie đã ký để khách chỉ xem hàng không tạo ra dòng nào trong database.
+
+settings.CART_STORAGE chọn backend cho giỏ hàng của khách:
+- 'database': mỗi khách có một Cart theo session key (tạo session + Cart ngay lần đầu dùng giỏ).
+- 'session': các dòng giỏ hàng nằm trong session, không có Cart/CartItem.
+- 'cookie': các dòng giỏ hàng nằm trong cookie đã ký, không có session lẫn Cart/CartItem.
+
+Người dùng đã đăng nhập luôn dùng database. Khi khách đăng nhập, giỏ hàng của
+khách được gộp vào giỏ của tài khoản (merge_guest_cart, gọi từ signal
+user_logged_in trong models.py); thanh toán yêu cầu đăng nhập nên đơn hàng
+luôn được tạo từ Cart/CartItem.
+
+Các view dùng giỏ hàng qua get_cart_storage(request), cùng một giao diện cho
+mọi backend: cart (để hiển thị), get_item, add, set_quantity, set_quantities,
+remove, clear, summary. Backend session / cookie ghi lại dữ liệu vào response
+trong GuestCartMiddleware (middleware.py).
+"""
+
+from abc import ABC, abstractmethod
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+
+# Key trong session lưu tóm tắt giỏ hàng (số sản phẩm, tổng tiền) cho badge
+CART_SUMMARY_SESSION_KEY = 'cart_summary'
+
+# Key trong session lưu giỏ hàng của khách (backend 'session')
+GUEST_CART_SESSION_KEY = 'guest_cart'
+
+# Key trong session lưu session key của Cart của khách (backend 'database'):
+# đăng nhập đổi session key (cycle_key) nên cần key cũ để gộp giỏ
+GUEST_CART_KEY_SESSION_KEY = 'cart_session_key'
+
+# Cookie lưu giỏ hàng của khách (backend 'cookie')
+GUEST_CART_COOKIE_NAME = 'guest_cart'
+GUEST_CART_COOKIE_SALT = 'shop.cart_utils.guest_cart'
+GUEST_CART_COOKIE_AGE = 30 * 24 * 60 * 60
+
+# Số dòng tối đa trong giỏ của khách (giữ cookie dưới giới hạn 4KB của trình duyệt)
+GUEST_CART_MAX_LINES = 30
+
+
+def get_or_create_cart(request, user=None):
+    """
+    Lấy hoặc tạo giỏ hàng trong database cho user hiện tại.
+    Hỗ cả user đã đăng nhập và guest (session).
+    user: tài khoản của giỏ khi request.user chưa được gán (signal user_logged_in).
+    """
+    from .models import Cart
+
+    if user is None:
+        user = request.user
+    if user.is_authenticated:
+        # User đã đăng nhập - dùng user object
+        cart, created = Cart.objects.get_or_create(user=user)
+    else:
+        # Guest - dùng session
+        session_key = request.session.session_key
+        if not session_key:
+            request.session.create()
+            session_key = request.session.session_key
+
+        cart, created = Cart.objects.get_or_create(session_key=session_key)
+        # Ghi lại key để gộp giỏ khi đăng nhập (merge_guest_cart)
+        if request.session.get(GUEST_CART_KEY_SESSION_KEY) != session_key:
+            request.session[GUEST_CART_KEY_SESSION_KEY] = session_key
+
+    return cart
+
+
+def update_cart_summary(request, cart):
+    """
+    Tính lại tóm tắt giỏ hàng (lưu trên Cart và trong session) sau khi giỏ thay đổi.
+    Gọi trong cùng transaction.atomic() với thay đổi. Trả về số dòng sản phẩm còn lại.
+    """
+    lines = cart.refresh_summary()
+    request.session[CART_SUMMARY_SESSION_KEY] = cart.summary()
+    return lines
+
+
+def reprice_cart_items(request, cart, items):
+    """
+    Cập nhật giá các dòng giỏ hàng (CartItem.price là giá lúc thêm vào giỏ) theo giá
+    hiện tại, giống cách cart_add chọn giá: giá khuyến mãi của tùy chọn bộ nhớ nếu
+    có, nếu không thì giá khuyến mãi của sản phẩm (đã tính discount_percent đang áp dụng).
+    items: queryset CartItem cần thanh toán. Giá hiện tại được lấy trong cùng một
+    truy vấn với các dòng (join sản phẩm + subquery tùy chọn bộ nhớ); dòng đổi giá
+    được ghi bằng một bulk_update.
+    Trả về (danh sách dòng với giá hiện tại, danh sách dòng đã đổi giá). Dòng đổi giá
+    có previous_price là giá cũ (các dòng khác là None).
+    """
+    from .models import CartItem, StorageOption
+
+    # Trùng tên bộ nhớ thì lấy tùy chọn tạo trước, như .first() trong cart_add
+    storage_prices = StorageOption.objects.filter(
+        product=OuterRef('product_id'), storage=OuterRef('storage'),
+    ).order_by('id').values('sale_price')[:1]
+    lines = list(
+        items.select_related('product')
+        .annotate(current_price=Coalesce(Subquery(storage_prices), F('product__sale_price')))
+        .order_by('id')
+    )
+    changed = []
+    for line in lines:
+        line.previous_price = None
+        if line.price != line.current_price:
+            line.previous_price = line.price
+            line.price = line.current_price
+            changed.append(line)
+    if changed:
+        with transaction.atomic():
+            CartItem.objects.bulk_update(changed, ['price'])
+            update_cart_summary(request, cart)
+    return lines, changed
+
+
+class BaseCartStorage(ABC):
+    """Giao diện chung của các backend lưu giỏ hàng (backend thiếu phương thức nào thì không tạo được)."""
+
+    def __init__(self, request):
+        self.request = request
+
+    @property
+    @abstractmethod
+    def cart(self):
+        """Giỏ hàng để hiển thị (cart.items.all/exists/count, cart.total_items, cart.total_price)."""
+
+    @property
+    @abstractmethod
+    def line_count(self):
+        """Số dòng sản phẩm trong giỏ."""
+
+    def refresh(self):
+        """Tính lại tóm tắt giỏ hàng (trước khi hiển thị trang giỏ hàng)."""
+
+    @abstractmethod
+    def get_item(self, item_id):
+        """Dòng item_id trong giỏ (Http404 nếu không có)."""
+
+    @abstractmethod
+    def add(self, product, storage, color, quantity, price):
+        """
+        Thêm sản phẩm (cộng dồn số lượng nếu đã có dòng cùng bộ nhớ/màu).
+        Trả về (dòng, có phải dòng mới không); (None, False) nếu giỏ đã đầy.
+        """
+
+    def set_quantity(self, item, quantity):
+        """Đổi số lượng một dòng (quantity <= 0 thì xóa dòng)."""
+        self.set_quantities({item.id: quantity})
+
+    @abstractmethod
+    def set_quantities(self, quantities):
+        """Đổi số lượng nhiều dòng cùng lúc: {id dòng: số lượng}, số lượng <= 0 thì xóa."""
+
+    @abstractmethod
+    def remove(self, item_ids):
+        """Xóa các dòng theo id. Trả về số dòng đã xóa."""
+
+    @abstractmethod
+    def clear(self):
+        """Xóa toàn bộ giỏ hàng."""
+
+    @abstractmethod
+    def summary(self):
+        """Tóm tắt giỏ hàng {'total_items', 'total_price'} cho badge."""
+
+    def update(self, response):
+        """Ghi lại giỏ hàng đã thay đổi vào response (GuestCartMiddleware gọi sau view)."""
+
+
+class DatabaseCartStorage(BaseCartStorage):
+    """Giỏ hàng trong Cart/CartItem; mỗi thay đổi cùng transaction với tóm tắt giỏ hàng."""
+
+    def __init__(self, request, user=None):
+        super().__init__(request)
+        # None: dùng request.user; merge_guest_cart truyền user của signal đăng nhập
+        self.user = user
+        self._cart = None
+        self._line_count = None
+
+    @property
+    def cart(self):
+        if self._cart is None:
+            self._cart = get_or_create_cart(self.request, self.user)
+        return self._cart
+
+    @property
+    def line_count(self):
+        if self._line_count is None:
+            self._line_count = self.cart.items.count()
+        return self._line_count
+
+    def refresh(self):
+        self._line_count = update_cart_summary(self.request, self.cart)
+
+    def get_item(self, item_id):
+        from .models import CartItem
+
+        return get_object_or_404(CartItem, id=item_id, cart=self.cart)
+
+    def add(self, product, storage, color, quantity, price):
+        from .models import CartItem
+
+        cart = self.cart
+        with transaction.atomic():
+            # Một câu upsert: cộng dồn số lượng nếu đã có dòng cùng product, storage, color
+            [(item, created)] = CartItem.upsert_lines(cart, [(product.id, storage, color, quantity, price)])
+            self.refresh()
+        item.product = product
+        return item, created
+
+    def add_items(self, lines):
+        """
+        Thêm nhiều dòng (product_id, storage, color, quantity, price) bằng một câu upsert,
+        cộng dồn số lượng với dòng cùng sản phẩm/bộ nhớ/màu đã có trong giỏ.
+        """
+        from .models import CartItem
+
+        with transaction.atomic():
+            CartItem.upsert_lines(self.cart, lines)
+            self.refresh()
+
+    def set_quantities(self, quantities):
+        """
+        So sánh số lượng mới với các dòng hiện có ngay trong bộ nhớ, rồi ghi bằng một
+        bulk_update và một delete (số câu lệnh không phụ thuộc số dòng trong giỏ).
+        """
+        from .models import CartItem
+
+        with transaction.atomic():
+            changed, removed = [], []
+            for item in self.cart.items.filter(id__in=list(quantities)):
+                quantity = quantities[item.id]
+                if quantity <= 0:
+                    removed.append(item.id)
+                elif quantity != item.quantity:
+                    item.quantity = quantity
+                    changed.append(item)
+            if changed:
+                CartItem.objects.bulk_update(changed, ['quantity'])
+            if removed:
+                CartItem.objects.filter(id__in=removed).delete()
+            self.refresh()
+
+    def remove(self, item_ids):
+        with transaction.atomic():
+            deleted = self.cart.items.filter(id__in=item_ids).delete()[0]
+            self.refresh()
+        return deleted
+
+    def clear(self):
+        with transaction.atomic():
+            self.cart.items.all().delete()
+            self.refresh()
+
+    def summary(self):
+        """
+        Tóm tắt lấy từ session (không truy vấn giỏ hàng); chỉ khi session chưa có
+        mới đọc các cột đã lưu sẵn trên Cart (không tạo Cart mới).
+        """
+        from .models import Cart
+
+        if self._cart is not None:
+            return self._cart.summary()
+        request = self.request
+        summary = request.session.get(CART_SUMMARY_SESSION_KEY)
+        if summary is None:
+            carts = Cart.objects.none()
+            user = self.user or request.user
+            if user.is_authenticated:
+                carts = Cart.objects.filter(user=user)
+            elif request.session.session_key:
+                carts = Cart.objects.filter(session_key=request.session.session_key)
+            cart = carts.only('item_count', 'total_amount').first()
+            summary = cart.summary() if cart else {'total_items': 0, 'total_price': 0}
+            # Không tạo session mới chỉ để lưu giỏ hàng trống của khách
+            if request.session.session_key:
+                request.session[CART_SUMMARY_SESSION_KEY] = summary
+        return summary
+
+
+class GuestCartItem:
+    """Một dòng giỏ hàng của khách, có các thuộc tính như CartItem mà view/template dùng."""
+
+    def __init__(self, id, product_id, storage, color, quantity, price, product=None):
+        self.id = id
+        self.product_id = product_id
+        self.storage = storage
+        self.color = color
+        self.quantity = quantity
+        self.price = Decimal(price)
+        self.product = product
+
+    @property
+    def subtotal(self):
+        """Thành tiền."""
+        return self.price * self.quantity
+
+    def to_data(self):
+        return [self.id, self.product_id, self.storage, self.color, self.quantity, int(self.price)]
+
+
+class GuestCartItems:
+    """Các dòng của giỏ khách, với all/exists/count như related manager cart.items."""
+
+    def __init__(self, items):
+        self._items = items
+
+    def all(self):
+        return list(self._items)
+
+    def exists(self):
+        return bool(self._items)
+
+    def count(self):
+        return len(self._items)
+
+
+class GuestCart:
+    """Giỏ hàng của khách để hiển thị (thay cho Cart trong template cart/detail.html)."""
+
+    def __init__(self, items):
+        self.items = GuestCartItems(items)
+
+    @property
+    def total_items(self):
+        return sum(item.quantity for item in self.items.all())
+
+    @property
+    def total_price(self):
+        return sum((item.subtotal for item in self.items.all()), Decimal(0))
+
+
+class GuestCartStorage(BaseCartStorage):
+    """
+    Giỏ hàng của khách ngoài database, dữ liệu dạng
+    {'next_id': ..., 'items': [[id, product_id, storage, color, quantity, price], ...]}.
+    Lớp con đọc/ghi dữ liệu này qua load_data / save_data.
+    """
+
+    def __init__(self, request):
+        super().__init__(request)
+        self._items = None
+        self._products_loaded = False
+        self.next_id = 1
+        self.modified = False
+
+    @abstractmethod
+    def load_data(self):
+        """Đọc dữ liệu giỏ hàng (None nếu chưa có)."""
+
+    @abstractmethod
+    def save_data(self, data, response):
+        """Ghi dữ liệu giỏ hàng vào session / response (data rỗng: xóa giỏ)."""
+
+    @property
+    def items(self):
+        """Các dòng giỏ hàng (chưa có product)."""
+        if self._items is None:
+            data = self.load_data() or {}
+            try:
+                self.next_id = int(data.get('next_id', 1))
+                self._items = [GuestCartItem(*line) for line in data.get('items', [])]
+            except (AttributeError, TypeError, ValueError):
+                self.next_id = 1
+                self._items = []
+        return self._items
+
+    def load_products(self):
+        """Gắn product cho các dòng (1 truy vấn); bỏ dòng có sản phẩm đã bị xóa."""
+        from .models import Product
+
+        items = self.items
+        if not self._products_loaded:
+            products = Product.objects.in_bulk({item.product_id for item in items if item.product is None})
+            for item in items:
+                if item.product is None:
+                    item.product = products.get(item.product_id)
+            kept = [item for item in items if item.product is not None]
+            if len(kept) != len(items):
+                self._items = kept
+                self.modified = True
+            self._products_loaded = True
+        return self._items
+
+    @property
+    def cart(self):
+        return GuestCart(self.load_products())
+
+    @property
+    def line_count(self):
+        return len(self.items)
+
+    def get_item(self, item_id):
+        for item in self.load_products():
+            if str(item.id) == str(item_id):
+                return item
+        raise Http404('Không có sản phẩm này trong giỏ hàng.')
+
+    def add(self, product, storage, color, quantity, price):
+        for item in self.items:
+            if (item.product_id, item.storage, item.color) == (product.id, storage, color):
+                item.quantity += quantity
+                item.product = product
+                self.modified = True
+                return item, False
+        if len(self.items) >= GUEST_CART_MAX_LINES:
+            return None, False
+        item = GuestCartItem(self.next_id, product.id, storage, color, quantity, price, product=product)
+        self.next_id += 1
+        self.items.append(item)
+        self.modified = True
+        return item, True
+
+    def set_quantities(self, quantities):
+        quantities = {str(item_id): quantity for item_id, quantity in quantities.items()}
+        kept = []
+        for item in self.items:
+            quantity = quantities.get(str(item.id), item.quantity)
+            if quantity > 0:
+                item.quantity = quantity
+                kept.append(item)
+        self._items = kept
+        self.modified = True
+
+    def remove(self, item_ids):
+        item_ids = {str(item_id) for item_id in item_ids}
+        kept = [item for item in self.items if str(item.id) not in item_ids]
+        deleted = len(self.items) - len(kept)
+        self._items = kept
+        self.modified = True
+        return deleted
+
+    def clear(self):
+        self._items = []
+        self.modified = True
+
+    def summary(self):
+        """Tính trực tiếp từ dữ liệu giỏ hàng (không truy vấn database)."""
+        return {
+            'total_items': sum(item.quantity for item in self.items),
+            'total_price': int(sum(item.subtotal for item in self.items)),
+        }
+
+    def update(self, response):
+        if not self.modified:
+            return
+        data = {'next_id': self.next_id, 'items': [item.to_data() for item in self.items]}
+        self.save_data(data if data['items'] else None, response)
+        self.modified = False
+
+
+class SessionCartStorage(GuestCartStorage):
+    """Giỏ hàng của khách trong session (chỉ tạo session, không tạo Cart/CartItem)."""
+
+    def load_data(self):
+        return self.request.session.get(GUEST_CART_SESSION_KEY)
+
+    def save_data(self, data, response):
+        if data:
+            self.request.session[GUEST_CART_SESSION_KEY] = data
+        else:
+            self.request.session.pop(GUEST_CART_SESSION_KEY, None)
+
+
+class CookieCartStorage(GuestCartStorage):
+    """Giỏ hàng của khách trong cookie đã ký (không ghi gì vào database)."""
+
+    def load_data(self):
+        value = self.request.COOKIES.get(GUEST_CART_COOKIE_NAME)
+        if not value:
+            return None
+        try:
+            return signing.loads(value, salt=GUEST_CART_COOKIE_SALT, max_age=GUEST_CART_COOKIE_AGE)
+        except signing.BadSignature:
+            return None
+
+    def save_data(self, data, response):
+        if data:
+            response.set_cookie(
+                GUEST_CART_COOKIE_NAME,
+                signing.dumps(data, salt=GUEST_CART_COOKIE_SALT, compress=True),
+                max_age=GUEST_CART_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        else:
+            response.delete_cookie(GUEST_CART_COOKIE_NAME, samesite='Lax')
+
+
+CART_STORAGE_BACKENDS = {
+    'database': DatabaseCartStorage,
+    'session': SessionCartStorage,
+    'cookie': CookieCartStorage,
+}
+
+
+def get_guest_cart_storage(request):
+    """Backend giỏ hàng của khách theo settings.CART_STORAGE (một instance cho mỗi request)."""
+    storage = getattr(request, '_guest_cart_storage', None)
+    if storage is None:
+        name = getattr(settings, 'CART_STORAGE', 'session')
+        if name not in CART_STORAGE_BACKENDS:
+            raise ImproperlyConfigured(
+                f"CART_STORAGE phải là một trong {', '.join(CART_STORAGE_BACKENDS)} (đang là {name!r})."
+            )
+        storage = CART_STORAGE_BACKENDS[name](request)
+        request._guest_cart_storage = storage
+    return storage
+
+
+def get_cart_storage(request):
+    """Backend giỏ hàng cho request: database nếu đã đăng nhập, nếu không thì theo CART_STORAGE."""
+    if request.user.is_authenticated:
+        storage = getattr(request, '_cart_storage', None)
+        if storage is None:
+            storage = request._cart_storage = DatabaseCartStorage(request)
+        return storage
+    return get_guest_cart_storage(request)
+
+
+def merge_guest_cart(request, user):
+    """
+    Gộp giỏ hàng của khách vào giỏ của tài khoản user vừa đăng nhập: giỏ trong session /
+    cookie, và Cart theo session key cũ (CART_STORAGE = 'database'). Dòng cùng sản
+    phẩm/bộ nhớ/màu được cộng dồn số lượng. Trong một transaction: 1 câu upsert cho
+    mọi dòng, rồi xóa giỏ của khách. Trả về số dòng đã gộp.
+    Giỏ của tài khoản lấy theo user của signal, không theo request.user
+    (Client.login() gửi user_logged_in với request chưa có .user).
+    """
+    from .models import Cart, CartItem
+
+    guest = get_guest_cart_storage(request)
+    session_key = request.session.pop(GUEST_CART_KEY_SESSION_KEY, None)
+
+    lines = []
+    if isinstance(guest, GuestCartStorage) and guest.items:
+        lines += [
+            (item.product_id, item.storage, item.color, item.quantity, item.price)
+            for item in guest.load_products()
+        ]
+    guest_cart_ids = set()
+    if session_key:
+        for cart_id, *line in CartItem.objects.filter(
+            cart__session_key=session_key, cart__user__isnull=True,
+        ).values_list('cart_id', 'product_id', 'storage', 'color', 'quantity', 'price'):
+            guest_cart_ids.add(cart_id)
+            lines.append(tuple(line))
+    if not lines:
+        # Giỏ của khách không còn sản phẩm nào thì chỉ cần xóa
+        if isinstance(guest, GuestCartStorage) and guest.items:
+            guest.clear()
+        if session_key:
+            Cart.objects.filter(session_key=session_key, user__isnull=True).delete()
+        return 0
+
+    storage = DatabaseCartStorage(request, user)
+    with transaction.atomic():
+        storage.add_items(lines)
+        if guest_cart_ids:
+            Cart.objects.filter(id__in=guest_cart_ids).delete()
+    if isinstance(guest, GuestCartStorage):
+        guest.clear()
+    # Id dòng của giỏ khách không phải id dòng trong giỏ của tài khoản
+    request.session.pop('selected_cart_items', None)
+    if getattr(request, 'user', None) == user:
+        # Phần còn lại của request (badge giỏ hàng) dùng luôn giỏ vừa gộp
+        request._cart_storage = storage
+    return len(lines)
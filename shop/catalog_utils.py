@@ -0,0 +1,174 @@
+"""
+Catalog listing utilities for the shop application.
+Các hàm tiện ích cho trang danh sách sản phẩm: lọc theo hãng, khoảng giá,
+dung lượng bộ nhớ, RAM, miễn phí vận chuyển, sắp xếp và phân trang keyset.
+
+Mỗi kiểu sắp xếp có index tương ứng trên Product (xem Product.Meta.indexes),
+cả loại có hãng đứng đầu (khi lọc theo hãng) lẫn loại không có. Nhờ vậy
+trang thứ N chỉ tốn một lần seek index như trang đầu tiên.
+"""
+
+import decimal
+
+from .cache_utils import get_catalog_brands
+from .facet_utils import normalize_storage, parse_ram, storage_db_values
+from .pagination_utils import keyset_paginate, encode_cursor, decode_cursor
+from .search_utils import search_cache_key, search_result_cache
+
+
+# Số sản phẩm mỗi trang
+CATALOG_PAGE_SIZE = 20
+
+# Các kiểu sắp xếp: mã -> (thứ tự ORDER BY, nhãn hiển thị)
+# Field cuối luôn là id để thứ tự là duy nhất (yêu cầu của keyset pagination)
+CATALOG_SORTS = {
+    'newest': (['-created_at', '-id'], 'Mới nhất'),
+    'price_asc': (['sale_price', 'id'], 'Giá thấp đến cao'),
+    'price_desc': (['-sale_price', '-id'], 'Giá cao đến thấp'),
+    'discount': (['-discount_percent', '-id'], 'Giảm giá nhiều nhất'),
+}
+DEFAULT_SORT = 'newest'
+
+# Sắp xếp theo độ liên quan - chỉ có khi tìm kiếm (thứ tự lấy từ search_utils)
+RELEVANCE_SORT = 'relevance'
+RELEVANCE_LABEL = 'Liên quan nhất'
+
+
+def parse_price(value):
+    """Chuyển chuỗi giá (cho phép dấu chấm/phẩy ngăn cách) thành Decimal, không hợp lệ thì None."""
+    value = (value or '').replace('.', '').replace(',', '').strip()
+    if not value:
+        return None
+    try:
+        price = decimal.Decimal(value)
+        # "NaN", "Infinity" vẫn là Decimal hợp lệ nhưng không lọc được
+        if not price.is_finite() or price < 0:
+            return None
+    except decimal.InvalidOperation:
+        return None
+    return price
+
+
+def resolve_brand(value):
+    """
+    Chuẩn hóa tên hãng theo dữ liệu trong database (không phân biệt hoa thường),
+    để có thể lọc bằng so sánh bằng (dùng được index) thay vì iexact.
+    """
+    value = (value or '').strip()
+    if not value:
+        return ''
+    for brand in get_catalog_brands():
+        if brand.lower() == value.lower():
+            return brand
+    return value
+
+
+def get_catalog_filters(request, allow_relevance=False):
+    """
+    Đọc bộ lọc và kiểu sắp xếp từ query string.
+    allow_relevance: cho phép (và mặc định) sắp xếp theo độ liên quan khi tìm kiếm.
+    """
+    default_sort = RELEVANCE_SORT if allow_relevance else DEFAULT_SORT
+    sort = request.GET.get('sort', default_sort)
+    if sort not in CATALOG_SORTS and not (allow_relevance and sort == RELEVANCE_SORT):
+        sort = default_sort
+
+    min_price = parse_price(request.GET.get('min_price'))
+    max_price = parse_price(request.GET.get('max_price'))
+    if min_price is not None and max_price is not None and min_price > max_price:
+        min_price, max_price = max_price, min_price
+
+    return {
+        'brand': resolve_brand(request.GET.get('brand')),
+        'min_price': min_price,
+        'max_price': max_price,
+        'storage': normalize_storage(request.GET.get('storage')),
+        'ram': parse_ram(request.GET.get('ram')),
+        'free_shipping': request.GET.get('free_shipping') == '1',
+        'sort': sort,
+    }
+
+
+def filter_catalog(queryset, filters):
+    """
+    Áp dụng bộ lọc hãng, khoảng giá (theo giá khuyến mãi), dung lượng bộ nhớ,
+    RAM và miễn phí vận chuyển lên queryset sản phẩm.
+    """
+    from .models import StorageOption
+    from .spec_utils import attribute_product_ids
+
+    if filters['brand']:
+        queryset = queryset.filter(brand=filters['brand'])
+    if filters['min_price'] is not None:
+        queryset = queryset.filter(sale_price__gte=filters['min_price'])
+    if filters['max_price'] is not None:
+        queryset = queryset.filter(sale_price__lte=filters['max_price'])
+    if filters['storage']:
+        # Subquery thay vì join để không bị trùng dòng (giữ đúng keyset pagination)
+        queryset = queryset.filter(id__in=StorageOption.objects.filter(
+            storage__in=storage_db_values(filters['storage'])
+        ).values('product_id'))
+    if filters['ram'] is not None:
+        # RAM lấy từ thông số đã tách (ProductAttribute), tra bằng index (key, numeric_value)
+        queryset = queryset.filter(id__in=attribute_product_ids(
+            'ram', min_value=filters['ram'], max_value=filters['ram']
+        ))
+    if filters['free_shipping']:
+        queryset = queryset.filter(free_shipping=True)
+    return queryset
+
+
+def get_catalog_page(queryset, filters, cursor=None, limit=CATALOG_PAGE_SIZE):
+    """
+    Lấy một trang sản phẩm đã lọc và sắp xếp.
+    Trả về (danh sách sản phẩm, cursor trang sau hoặc None).
+    """
+    ordering = CATALOG_SORTS[filters['sort']][0]
+    return keyset_paginate(filter_catalog(queryset, filters), ordering, cursor, limit)
+
+
+def filter_cache_key(filters):
+    """Phần key cache ứng với các bộ lọc (không gồm kiểu sắp xếp)."""
+    return (
+        filters['brand'], str(filters['min_price']), str(filters['max_price']),
+        filters['storage'], filters['ram'], filters['free_shipping'],
+    )
+
+
+def filter_ranked_ids(queryset, ranked_ids, filters):
+    """Giữ lại các id trong ranked_ids thỏa bộ lọc, vẫn theo thứ tự của ranked_ids (1 query)."""
+    allowed = set(
+        filter_catalog(queryset.filter(id__in=ranked_ids), filters)
+        .values_list('id', flat=True)
+    )
+    return [pk for pk in ranked_ids if pk in allowed]
+
+
+def get_ranked_page(queryset, ranked_ids, filters, cursor=None, limit=CATALOG_PAGE_SIZE, query=''):
+    """
+    Lấy một trang sản phẩm theo thứ tự có sẵn (ranked_ids, ví dụ độ liên quan
+    của kết quả tìm kiếm). Danh sách đã bị giới hạn số lượng nên cursor là vị trí
+    trong danh sách; mỗi trang tốn 2 query (lọc id và lấy sản phẩm của trang).
+    query: câu tìm kiếm tạo ra ranked_ids - nếu có thì danh sách id đã lọc được
+    cache (search_result_cache) theo câu tìm kiếm và bộ lọc, trang sau chỉ còn 1 query.
+    Trả về (danh sách sản phẩm, cursor trang sau hoặc None).
+    """
+    values = decode_cursor(cursor)
+    start = values[0] if values and isinstance(values[0], int) and values[0] > 0 else 0
+
+    key = search_cache_key(query)
+    if key:
+        ordered_ids = search_result_cache.get_or_set(
+            ('filtered', key, len(ranked_ids), filter_cache_key(filters)),
+            lambda: filter_ranked_ids(queryset, ranked_ids, filters),
+        )
+    else:
+        ordered_ids = filter_ranked_ids(queryset, ranked_ids, filters)
+    page_ids = ordered_ids[start:start + limit]
+
+    products = queryset.in_bulk(page_ids)
+    items = [products[pk] for pk in page_ids if pk in products]
+    next_cursor = None
+    if len(ordered_ids) > start + limit:
+        next_cursor = encode_cursor([start + limit])
+    return items, next_cursor
@@ -0,0 +1,324 @@
+"""
+Facet utilities for the shop application.
+Đếm số sản phẩm theo từng giá trị bộ lọc (hãng, mức giá, bộ nhớ, RAM, miễn
+phí vận chuyển) bằng chỉ mục bitmap trong bộ nhớ.
+
+Mỗi sản phẩm ứng với một vị trí bit; mỗi giá trị bộ lọc là một số nguyên
+Python dùng làm bitmap (bit bật = sản phẩm có giá trị đó). Số lượng của một
+giá trị = số bit bật sau khi AND với các bộ lọc đang chọn, nên mọi con số
+trên trang được tính trong bộ nhớ mà không cần COUNT từng giá trị.
+
+Chỉ mục được tạo lại (3 truy vấn) khi catalog version đổi
+(xem cache_utils.py - version tăng khi Product hoặc bộ nhớ của nó thay đổi).
+"""
+
+import bisect
+import re
+import threading
+
+from .cache_utils import get_catalog_version
+
+
+# Các mức giá: (mã, nhãn, giá từ, giá đến) - đã gồm cả hai đầu như bộ lọc min/max_price
+PRICE_BANDS = [
+    ('0-5', 'Dưới 5 triệu', 0, 4_999_999),
+    ('5-10', 'Từ 5 - 10 triệu', 5_000_000, 9_999_999),
+    ('10-20', 'Từ 10 - 20 triệu', 10_000_000, 19_999_999),
+    ('20-30', 'Từ 20 - 30 triệu', 20_000_000, 29_999_999),
+    ('30', 'Trên 30 triệu', 30_000_000, None),
+]
+
+# Hàng logo hãng (static/icons): (tên hãng, nhãn, file logo)
+BRAND_LOGOS = [
+    ('Apple', 'iPhone', 'icons/logo_iphone_ngang_eac93ff477.webp'),
+    ('Samsung', 'Samsung', 'icons/logo_samsung_ngang_1624d75bd8.webp'),
+    ('Xiaomi', 'Xiaomi', 'icons/logo_xiaomi_ngang_0faf267234.webp'),
+    ('OPPO', 'OPPO', 'icons/logo_oppo_ngang_68d31fcd73.webp'),
+    ('vivo', 'Vivo', 'icons/logo_vivo_ngang_45494ff733.webp'),
+    ('realme', 'Realme', 'icons/logo_realme_ngang_0185815a13.webp'),
+    ('Honor', 'Honor', 'icons/logo_honor_ngang_814fca59e4.webp'),
+    ('RedMagic', 'Redmagic', 'icons/logo_redmagic_ngang_505d29c537.webp'),
+    ('Tecno', 'Tecno', 'icons/logo_tecno_ngang_c587e5f1fa.webp'),
+    ('Benco', 'Benco', 'icons/logo_benco_ngang_d31d9c3b77.webp'),
+]
+
+
+def normalize_storage(value):
+    """Chuẩn hóa dung lượng bộ nhớ: '128' / '128 gb' -> '128GB', '1 tb' -> '1TB'."""
+    value = re.sub(r'\s+', '', value or '').upper()
+    if value.isdigit():
+        value += 'GB'
+    return value
+
+
+def storage_sort_key(value):
+    """Sắp xếp dung lượng theo số GB (1TB sau 512GB)."""
+    match = re.match(r'(\d+)(GB|TB)$', value)
+    if not match:
+        return (1, value)
+    size = int(match.group(1)) * (1024 if match.group(2) == 'TB' else 1)
+    return (0, size)
+
+
+def parse_ram(value):
+    """Đọc bộ lọc RAM (số GB): '8' / '8GB' -> 8, không hợp lệ thì None."""
+    match = re.fullmatch(r'\s*(\d{1,4})\s*(?:gb)?\s*', value or '', re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+def bitmap_from_positions(positions, size):
+    """Tạo bitmap (số nguyên) từ danh sách vị trí bit - O(n), không OR từng bit."""
+    data = bytearray((size + 7) // 8)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+class FacetIndex:
+    """Chỉ mục bitmap của catalog tại một catalog version."""
+
+    def __init__(self, version):
+        self.version = version
+        self.ids = []               # vị trí bit -> id sản phẩm
+        self.positions = {}         # id sản phẩm -> vị trí bit
+        self.all = 0                # bitmap mọi sản phẩm
+        self.brands = {}            # hãng -> bitmap
+        self.price_bands = {}       # mã mức giá -> bitmap
+        self.storages = {}          # dung lượng đã chuẩn hóa -> bitmap
+        self.storage_values = {}    # dung lượng đã chuẩn hóa -> các giá trị gốc trong database
+        self.rams = {}              # RAM (GB, từ ProductAttribute) -> bitmap
+        self.free_shipping = 0      # bitmap sản phẩm miễn phí vận chuyển
+        self.prices = []            # (giá bán, vị trí bit) đã sắp xếp - cho khoảng giá tùy ý
+
+    def build(self):
+        """Tạo chỉ mục từ database: 1 truy vấn sản phẩm + 1 truy vấn bộ nhớ + 1 truy vấn RAM."""
+        from .models import Product, ProductAttribute, StorageOption
+
+        brand_positions = {}
+        band_positions = {key: [] for key, label, low, high in PRICE_BANDS}
+        shipping_positions = []
+        rows = Product.objects.order_by('id').values_list('id', 'brand', 'sale_price', 'free_shipping')
+        for position, (product_id, brand, sale_price, free_shipping) in enumerate(rows.iterator(chunk_size=2000)):
+            self.ids.append(product_id)
+            self.positions[product_id] = position
+            brand_positions.setdefault(brand, []).append(position)
+            self.prices.append((sale_price, position))
+            for key, label, low, high in PRICE_BANDS:
+                if sale_price >= low and (high is None or sale_price <= high):
+                    band_positions[key].append(position)
+                    break
+            if free_shipping:
+                shipping_positions.append(position)
+
+        storage_positions = {}
+        options = StorageOption.objects.order_by().values_list('product_id', 'storage')
+        for product_id, storage in options.iterator(chunk_size=2000):
+            position = self.positions.get(product_id)
+            if position is None:
+                continue
+            key = normalize_storage(storage)
+            storage_positions.setdefault(key, set()).add(position)
+            self.storage_values.setdefault(key, set()).add(storage)
+
+        ram_positions = {}
+        rams = ProductAttribute.objects.filter(key='ram', numeric_value__isnull=False)
+        for product_id, ram in rams.order_by().values_list('product_id', 'numeric_value').iterator(chunk_size=2000):
+            position = self.positions.get(product_id)
+            if position is not None and ram == int(ram):
+                ram_positions.setdefault(int(ram), []).append(position)
+
+        size = len(self.ids)
+        self.all = (1 << size) - 1
+        self.brands = {brand: bitmap_from_positions(p, size) for brand, p in brand_positions.items()}
+        self.price_bands = {key: bitmap_from_positions(p, size) for key, p in band_positions.items()}
+        self.storages = {key: bitmap_from_positions(p, size) for key, p in storage_positions.items()}
+        self.rams = {ram: bitmap_from_positions(p, size) for ram, p in sorted(ram_positions.items())}
+        self.free_shipping = bitmap_from_positions(shipping_positions, size)
+        self.prices.sort()
+        return self
+
+    def ids_bitmap(self, product_ids):
+        """Bitmap của một tập id (ví dụ kết quả tìm kiếm)."""
+        positions = [self.positions[pk] for pk in product_ids if pk in self.positions]
+        return bitmap_from_positions(positions, len(self.ids))
+
+    def price_bitmap(self, min_price=None, max_price=None):
+        """Bitmap các sản phẩm có giá trong khoảng [min_price, max_price]."""
+        if min_price is None and max_price is None:
+            return self.all
+        for key, label, low, high in PRICE_BANDS:
+            if (min_price or 0) == low and max_price == high:
+                return self.price_bands[key]
+        start = 0 if min_price is None else bisect.bisect_left(self.prices, (min_price, -1))
+        end = len(self.prices)
+        if max_price is not None:
+            end = bisect.bisect_right(self.prices, (max_price, len(self.ids)))
+        return bitmap_from_positions((position for price, position in self.prices[start:end]), len(self.ids))
+
+
+_facet_index = None
+_facet_lock = threading.Lock()
+
+
+def get_facet_index():
+    """Lấy chỉ mục bitmap của catalog version hiện tại (tạo lại nếu version đã đổi)."""
+    global _facet_index
+    version = get_catalog_version()
+    index = _facet_index
+    if index is None or index.version != version:
+        with _facet_lock:
+            index = _facet_index
+            if index is None or index.version != version:
+                index = FacetIndex(version).build()
+                _facet_index = index
+    return index
+
+
+def storage_db_values(storage):
+    """Các giá trị gốc trong database của một dung lượng đã chuẩn hóa (dùng để lọc)."""
+    return get_facet_index().storage_values.get(storage, {storage})
+
+
+def get_facet_counts(filters, ranked_ids=None):
+    """
+    Tính số sản phẩm cho mọi giá trị bộ lọc cùng lúc.
+    Số của một nhóm (ví dụ hãng) được tính với các bộ lọc của những nhóm khác,
+    để người dùng thấy chọn giá trị khác trong nhóm sẽ ra bao nhiêu sản phẩm.
+    ranked_ids: giới hạn trong kết quả tìm kiếm (nếu có).
+    """
+    index = get_facet_index()
+
+    masks = {
+        'search': index.all if ranked_ids is None else index.ids_bitmap(ranked_ids),
+        'brand': index.brands.get(filters['brand'], 0) if filters['brand'] else index.all,
+        'price': index.price_bitmap(filters['min_price'], filters['max_price']),
+        'storage': index.storages.get(filters['storage'], 0) if filters['storage'] else index.all,
+        'ram': index.all if filters['ram'] is None else index.rams.get(filters['ram'], 0),
+        'free_shipping': index.free_shipping if filters['free_shipping'] else index.all,
+    }
+
+    def base_without(group):
+        bitmap = index.all
+        for name, mask in masks.items():
+            if name != group:
+                bitmap &= mask
+        return bitmap
+
+    brand_base = base_without('brand')
+    price_base = base_without('price')
+    storage_base = base_without('storage')
+    ram_base = base_without('ram')
+    shipping_base = base_without('free_shipping')
+
+    return {
+        'total': base_without(None).bit_count(),
+        'brands': {
+            brand: (bitmap & brand_base).bit_count()
+            for brand, bitmap in index.brands.items()
+        },
+        'price_bands': {
+            key: (bitmap & price_base).bit_count()
+            for key, bitmap in index.price_bands.items()
+        },
+        'storages': {
+            storage: (index.storages[storage] & storage_base).bit_count()
+            for storage in sorted(index.storages, key=storage_sort_key)
+        },
+        'rams': {
+            ram: (bitmap & ram_base).bit_count()
+            for ram, bitmap in index.rams.items()
+        },
+        'free_shipping': (index.free_shipping & shipping_base).bit_count(),
+    }
+
+
+def get_brand_logo_row(brand_counts=None):
+    """
+    Dữ liệu hàng logo hãng (trang chủ, trang danh sách) kèm số sản phẩm của mỗi hãng.
+    brand_counts: số lượng theo hãng từ get_facet_counts (mặc định: toàn bộ catalog).
+    """
+    if brand_counts is None:
+        index = get_facet_index()
+        brand_counts = {brand: bitmap.bit_count() for brand, bitmap in index.brands.items()}
+    counts = {}
+    for brand, count in brand_counts.items():
+        counts[brand.lower()] = counts.get(brand.lower(), 0) + count
+    return [
+        {'brand': brand, 'label': label, 'icon': icon, 'count': counts.get(brand.lower(), 0)}
+        for brand, label, icon in BRAND_LOGOS
+    ]
+
+
+def build_facet_groups(request, filters, counts):
+    """
+    Dữ liệu hiển thị các nhóm bộ lọc cho template: nhãn, số lượng,
+    đang chọn hay không và link bật/tắt (giữ nguyên các tham số khác).
+    """
+    def url_with(**changes):
+        params = request.GET.copy()
+        params.pop('cursor', None)
+        for key, value in changes.items():
+            params.pop(key, None)
+            if value not in (None, ''):
+                params[key] = value
+        query = params.urlencode()
+        return f'{request.path}?{query}' if query else request.path
+
+    def option(label, count, selected, **changes):
+        return {
+            'label': label,
+            'count': count,
+            'selected': selected,
+            # Bấm vào giá trị đang chọn thì bỏ chọn
+            'url': url_with(**{key: None for key in changes}) if selected else url_with(**changes),
+        }
+
+    brands = [
+        option(brand, count, brand == filters['brand'], brand=brand)
+        for brand, count in sorted(counts['brands'].items(), key=lambda item: item[0].lower())
+        if count or brand == filters['brand']
+    ]
+
+    price_bands = []
+    for key, label, low, high in PRICE_BANDS:
+        selected = (filters['min_price'] or 0) == low and filters['max_price'] == high
+        if filters['min_price'] is None and filters['max_price'] is None:
+            selected = False
+        price_bands.append(option(
+            label, counts['price_bands'][key], selected,
+            min_price=low or None, max_price=high,
+        ))
+
+    storages = [
+        option(storage, count, storage == filters['storage'], storage=storage)
+        for storage, count in counts['storages'].items()
+        if count or storage == filters['storage']
+    ]
+
+    rams = [
+        option(f'{ram}GB', count, ram == filters['ram'], ram=ram)
+        for ram, count in counts['rams'].items()
+        if count or ram == filters['ram']
+    ]
+
+    shipping = [option(
+        'Miễn phí vận chuyển', counts['free_shipping'], filters['free_shipping'], free_shipping='1',
+    )]
+
+    brand_logos = get_brand_logo_row(counts['brands'])
+    for logo in brand_logos:
+        selected = logo['brand'].lower() == (filters['brand'] or '').lower()
+        logo['selected'] = selected
+        logo['url'] = url_with(brand=None) if selected else url_with(brand=logo['brand'])
+
+    return {
+        'total': counts['total'],
+        'brand_logos': brand_logos,
+        'groups': [
+            {'title': 'Hãng', 'options': brands},
+            {'title': 'Mức giá', 'options': price_bands},
+            {'title': 'Bộ nhớ', 'options': storages},
+            {'title': 'RAM', 'options': rams},
+            {'title': 'Vận chuyển', 'options': shipping},
+        ],
+    }
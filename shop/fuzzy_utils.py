@@ -0,0 +1,182 @@
+"""
+Fuzzy search utilities for the shop application.
+Tìm kiếm chấp nhận lỗi chính tả ("samsumg", "xaomi", "ipone").
+
+Từ vựng là các từ (đã chuẩn hóa) trong hãng và tên sản phẩm, được đặt vào
+một BK-tree trong bộ nhớ. Khi tìm kiếm thường (search_utils.py) không ra kết
+quả, mỗi từ không có trong từ vựng được thay bằng từ gần nhất theo khoảng cách
+Levenshtein (từ có trong mô tả/thông số thì giữ nguyên), rồi tìm lại bằng
+chỉ mục FTS5 như bình thường. BK-tree chỉ duyệt các nhánh có thể chứa từ đủ
+gần, nên thời gian tra phụ thuộc vào số từ vựng (vài nghìn từ) chứ không
+phụ thuộc số sản phẩm, và không quét bảng Product.
+
+Chỉ mục được tạo lại (1 truy vấn) khi search version đổi, và chỉ khi
+thực sự cần sửa lỗi chính tả.
+"""
+
+import re
+import threading
+from collections import Counter
+
+from .cache_utils import get_search_version
+from .search_utils import normalize_search_text, search_product_ids, search_tokens
+
+
+# Từ ngắn hơn độ dài này không sửa (quá nhiều từ gần giống)
+FUZZY_MIN_LENGTH = 4
+
+# Số từ tối đa được sửa trong một câu tìm kiếm (giới hạn thời gian xử lý)
+FUZZY_MAX_TOKENS = 5
+
+
+def max_distance(token):
+    """Số lỗi cho phép theo độ dài từ: 4-5 ký tự sai 1, từ 6 ký tự trở lên sai 2."""
+    if len(token) < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if len(token) <= 5 else 2
+
+
+def levenshtein(a, b, limit=None):
+    """
+    Khoảng cách Levenshtein giữa hai chuỗi.
+    limit: dừng sớm và trả về limit + 1 khi chắc chắn khoảng cách lớn hơn limit.
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """BK-tree theo khoảng cách Levenshtein: mỗi nút là [từ, {khoảng cách: nút con}]."""
+
+    def __init__(self, terms=()):
+        self.root = None
+        self.size = 0
+        for term in terms:
+            self.add(term)
+
+    def add(self, term):
+        if self.root is None:
+            self.root = [term, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            distance = levenshtein(term, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [term, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, term, limit):
+        """Các từ cách term không quá limit, dạng danh sách (khoảng cách, từ)."""
+        if self.root is None:
+            return []
+        matches = []
+        stack = [self.root]
+        while stack:
+            node_term, children = stack.pop()
+            distance = levenshtein(term, node_term)
+            if distance <= limit:
+                matches.append((distance, node_term))
+            # Bất đẳng thức tam giác: chỉ nhánh trong [d - limit, d + limit] có thể chứa từ phù hợp
+            for child_distance, child in children.items():
+                if distance - limit <= child_distance <= distance + limit:
+                    stack.append(child)
+        return matches
+
+
+class FuzzyIndex:
+    """Từ vựng hãng + tên sản phẩm tại một search version, kèm BK-tree."""
+
+    def __init__(self, version):
+        self.version = version
+        self.frequencies = Counter()    # từ -> số sản phẩm (ưu tiên từ phổ biến khi hòa)
+        self.tree = BKTree()
+
+    def build(self):
+        """Tạo từ vựng từ database (1 truy vấn, chỉ lấy các cặp hãng/tên khác nhau)."""
+        from .models import Product
+        from django.db.models import Count
+
+        rows = Product.objects.order_by().values_list('brand', 'name').annotate(total=Count('id'))
+        for brand, name, total in rows.iterator(chunk_size=2000):
+            for token in set(re.findall(r'\w+', normalize_search_text(f'{brand} {name}'))):
+                # Chỉ sửa từ chữ cái: "s24" -> "s23" là một sản phẩm khác chứ không phải lỗi gõ
+                if token.isalpha() and len(token) >= FUZZY_MIN_LENGTH - 1:
+                    self.frequencies[token] += total
+        # Thêm từ phổ biến trước để cây cân bằng hơn
+        for term, count in self.frequencies.most_common():
+            self.tree.add(term)
+        return self
+
+    def needs_correction(self, token):
+        """Token có thể là từ gõ sai (đủ dài, chỉ gồm chữ cái, không có trong từ vựng)."""
+        return bool(max_distance(token)) and token.isalpha() and token not in self.frequencies
+
+    def correct_token(self, token):
+        """Từ trong từ vựng gần nhất với token (chính token nếu không tìm được)."""
+        matches = self.tree.search(token, max_distance(token))
+        if not matches:
+            return token
+        distance, term = min(matches, key=lambda match: (match[0], -self.frequencies[match[1]], match[1]))
+        return term
+
+
+_fuzzy_index = None
+_fuzzy_lock = threading.Lock()
+
+
+def get_fuzzy_index():
+    """Lấy chỉ mục sửa lỗi chính tả của search version hiện tại (tạo lại nếu version đã đổi)."""
+    global _fuzzy_index
+    version = get_search_version()
+    index = _fuzzy_index
+    if index is None or index.version != version:
+        with _fuzzy_lock:
+            index = _fuzzy_index
+            if index is None or index.version != version:
+                index = FuzzyIndex(version).build()
+                _fuzzy_index = index
+    return index
+
+
+def correct_query(query):
+    """
+    Sửa lỗi chính tả câu tìm kiếm theo từ vựng hãng/tên sản phẩm.
+    Trả về câu đã sửa, hoặc '' nếu không có từ nào cần sửa.
+    """
+    tokens = search_tokens(query)
+    if not tokens:
+        return ''
+    index = get_fuzzy_index()
+    corrected = []
+    for position, token in enumerate(tokens):
+        # Từ không có trong hãng/tên nhưng có trong mô tả, thông số (tra bằng FTS) thì giữ nguyên
+        if (position < FUZZY_MAX_TOKENS and index.needs_correction(token)
+                and not search_product_ids(token, limit=1)):
+            token = index.correct_token(token)
+        corrected.append(token)
+    if corrected == tokens:
+        return ''
+    return ' '.join(corrected)
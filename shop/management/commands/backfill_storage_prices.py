@@ -0,0 +1,19 @@
+"""
+Management command tinh lai gia khuyen mai da luu (sale_price) cua tuy chon bo nho.
+Su dung: python manage.py backfill_storage_prices
+"""
+
+from django.core.management.base import BaseCommand
+
+from shop.models import StorageOption
+
+
+class Command(BaseCommand):
+    help = 'Tinh lai gia khuyen mai da luu cua tat ca tuy chon bo nho'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='So dong moi lan UPDATE')
+
+    def handle(self, *args, **options):
+        count = StorageOption.recompute_sale_prices(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'[OK] Da cap nhat gia cho {count} tuy chon bo nho'))
@@ -0,0 +1,51 @@
+"""
+Management command do toc do sua loi chinh ta khi tim kiem (fuzzy_utils.py).
+Du lieu gia duoc tao trong transaction va rollback khi xong, khong anh huong database.
+Su dung: python manage.py benchmark_fuzzy --sizes 10000 100000
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.models import Product
+from shop.fuzzy_utils import FuzzyIndex, correct_query, get_fuzzy_index
+from shop.management.commands.benchmark_search import seed_products
+
+
+DEFAULT_QUERIES = ['samsumg', 'xaomi', 'ipone 15 pro', 'galxy ultra', 'khongtontai']
+
+
+class Command(BaseCommand):
+    help = 'Do thoi gian tao chi muc va thoi gian sua loi chinh ta cua tim kiem'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                            help='So san pham can do')
+        parser.add_argument('--iterations', type=int, default=200, help='So lan sua moi tu khoa')
+
+    def handle(self, *args, **options):
+        for size in sorted(options['sizes']):
+            with transaction.atomic():
+                seed_products(size)
+                count = Product.objects.count()
+
+                start = time.perf_counter()
+                index = FuzzyIndex(None).build()
+                build_ms = (time.perf_counter() - start) * 1000
+                self.stdout.write(
+                    f'[INFO] {count} san pham: {index.tree.size} tu vung, tao chi muc {build_ms:.0f} ms'
+                )
+
+                get_fuzzy_index()
+                for query in DEFAULT_QUERIES:
+                    start = time.perf_counter()
+                    for _ in range(options['iterations']):
+                        corrected = correct_query(query)
+                    avg_ms = (time.perf_counter() - start) * 1000 / options['iterations']
+                    self.stdout.write(f'  "{query}" -> "{corrected}": {avg_ms:.2f} ms')
+
+                # Khong giu lai du lieu gia
+                transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('[OK] Da rollback du lieu gia'))
@@ -0,0 +1,64 @@
+"""
+Management command do toc do render trang chu (cache lanh va cache am).
+Su dung: python manage.py benchmark_home --iterations 50
+"""
+
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = 'Do thoi gian render trang chu khi cache lanh (cold) va cache am (warm)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='So lan request moi truong hop')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        client = Client()
+        url = reverse('home')
+
+        # Cold: xoa cache truoc moi request
+        cold_times, cold_queries = self.measure(client, url, iterations, clear_cache=True)
+
+        # Warm: cache da co san tu request truoc
+        client.get(url)
+        warm_times, warm_queries = self.measure(client, url, iterations, clear_cache=False)
+
+        self.report('Cold', cold_times, cold_queries)
+        self.report('Warm', warm_times, warm_queries)
+
+        if warm_times:
+            speedup = (sum(cold_times) / len(cold_times)) / (sum(warm_times) / len(warm_times))
+            self.stdout.write(self.style.SUCCESS(f'[OK] Warm nhanh hon cold {speedup:.1f} lan'))
+
+    def measure(self, client, url, iterations, clear_cache):
+        """Chay request nhieu lan, tra ve danh sach thoi gian (ms) va so query."""
+        times = []
+        queries = []
+        for _ in range(iterations):
+            if clear_cache:
+                cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = client.get(url)
+                times.append((time.perf_counter() - start) * 1000)
+            queries.append(len(ctx.captured_queries))
+            if response.status_code != 200:
+                self.stderr.write(f'[ERROR] {url} tra ve {response.status_code}')
+        return times, queries
+
+    def report(self, label, times, queries):
+        times = sorted(times)
+        avg = sum(times) / len(times)
+        p95 = times[int(len(times) * 0.95) - 1] if len(times) > 1 else times[0]
+        self.stdout.write(
+            f'  {label}: trung binh {avg:.2f} ms, p95 {p95:.2f} ms, '
+            f'query/request {max(queries)}'
+        )
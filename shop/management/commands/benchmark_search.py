@@ -0,0 +1,95 @@
+"""
+Management command so sanh toc do tim kiem: LIKE tren search_text va FTS5.
+Du lieu gia duoc tao trong transaction va rollback khi xong, khong anh huong database.
+Su dung: python manage.py benchmark_search --sizes 10000 100000
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shop.models import Product
+from shop.search_utils import fts_available, fts_search_ids, like_search_ids
+
+
+BRANDS = ['Apple', 'Samsung', 'Xiaomi', 'OPPO', 'vivo', 'realme', 'Honor', 'Tecno']
+MODELS = ['Galaxy', 'iPhone', 'Redmi', 'Note', 'Reno', 'Find', 'Magic', 'Spark', 'Pova']
+SUFFIXES = ['Pro', 'Max', 'Ultra', 'Plus', 'Lite', '5G', 'Mini', 'Neo']
+# Tu vung mo ta: mot it tu pho bien va nhieu tu hiem (phan bo Zipf, giong van ban that)
+WORDS = [
+    'camera', 'pin', 'sac', 'nhanh', 'man', 'hinh', 'amoled', 'chip', 'snapdragon',
+    'dimensity', 'bionic', 'ram', 'bo', 'nho', 'mau', 'den', 'trang', 'xanh',
+] + [f'tu{i}' for i in range(5000)]
+WORD_WEIGHTS = [1 / (rank + 1) for rank in range(len(WORDS))]
+DEFAULT_QUERIES = ['galaxy', 'iphone pro max', 'snapdragon', 'samsung ultra', 'tu4321', 'khongtontai']
+
+
+def seed_products(size):
+    """
+    Tao them san pham gia cho du size san pham (trigger tu cap nhat bang FTS).
+    Dung chung cho cac lenh benchmark, nen goi trong transaction roi rollback.
+    """
+    missing = size - Product.objects.count()
+    rng = random.Random(size)
+    batch = []
+    for i in range(max(missing, 0)):
+        price = rng.randint(20, 400) * 100000
+        product = Product(
+            brand=rng.choice(BRANDS),
+            name=f'{rng.choice(MODELS)} {rng.randint(1, 99)} {rng.choice(SUFFIXES)}',
+            description=' '.join(rng.choices(WORDS, WORD_WEIGHTS, k=60)),
+            specifications=' '.join(rng.choices(WORDS, WORD_WEIGHTS, k=30)),
+            original_price=price,
+            sale_price=price,
+            main_image='products/benchmark.jpg',
+        )
+        # bulk_create khong goi save() nen phai tu tao search_text
+        product.search_text = product.build_search_text()
+        batch.append(product)
+        if len(batch) == 2000:
+            Product.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Product.objects.bulk_create(batch)
+
+
+class Command(BaseCommand):
+    help = 'Do thoi gian tim kiem bang LIKE tren search_text va FTS5 voi 10k/100k san pham'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                            help='So san pham can do')
+        parser.add_argument('--iterations', type=int, default=5, help='So lan chay moi tu khoa')
+        parser.add_argument('--query', action='append', dest='queries', help='Tu khoa (co the lap lai)')
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError('[ERROR] Database khong co bang FTS5 (chay migrate tren SQLite)')
+
+        queries = options['queries'] or DEFAULT_QUERIES
+        for size in sorted(options['sizes']):
+            with transaction.atomic():
+                seed_products(size)
+                self.stdout.write(f'[INFO] {Product.objects.count()} san pham')
+                for query in queries:
+                    like_ms, like_count = self.measure(like_search_ids, query, options['iterations'])
+                    fts_ms, fts_count = self.measure(fts_search_ids, query, options['iterations'])
+                    self.stdout.write(
+                        f'  "{query}": LIKE {like_ms:.2f} ms ({like_count} kq), '
+                        f'FTS5 {fts_ms:.2f} ms ({fts_count} kq), '
+                        f'nhanh hon {like_ms / max(fts_ms, 0.001):.1f} lan'
+                    )
+                # Khong giu lai du lieu gia
+                transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('[OK] Da rollback du lieu gia'))
+
+    def measure(self, search, query, iterations):
+        """Chay search nhieu lan, tra ve thoi gian trung binh (ms) va so ket qua."""
+        times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            ids = search(query)
+            times.append((time.perf_counter() - start) * 1000)
+        return sum(times) / len(times), len(ids)
@@ -0,0 +1,61 @@
+"""
+Management command do bo nho va toc do cua chi muc goi y tim kiem (suggest_utils.py).
+Du lieu gia duoc tao trong transaction va rollback khi xong, khong anh huong database.
+Su dung: python manage.py benchmark_suggest --sizes 10000 100000
+"""
+
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.models import Product
+from shop.suggest_utils import SuggestIndex
+from shop.management.commands.benchmark_search import seed_products
+
+
+DEFAULT_QUERIES = ['g', 'gal', 'galaxy 4', 'iphone 15 p', 'samsung', 'pro', 'khongtontai']
+
+
+class Command(BaseCommand):
+    help = 'Do bo nho, thoi gian tao va thoi gian tra cuu cua chi muc goi y tim kiem'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                            help='So san pham can do')
+        parser.add_argument('--iterations', type=int, default=1000, help='So lan tra cuu moi tu khoa')
+
+    def handle(self, *args, **options):
+        for size in sorted(options['sizes']):
+            with transaction.atomic():
+                seed_products(size)
+                count = Product.objects.count()
+
+                index = SuggestIndex()
+                start = time.perf_counter()
+                index.build()
+                build_ms = (time.perf_counter() - start) * 1000
+
+                # Bo nho: tao lai chi muc khi bat tracemalloc (tracemalloc lam cham nen do rieng)
+                index = SuggestIndex()
+                tracemalloc.start()
+                index.build()
+                memory, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                self.stdout.write(
+                    f'[INFO] {count} san pham: {len(index.keys)} khoa, '
+                    f'tao chi muc {build_ms:.0f} ms, bo nho {memory / 1024 / 1024:.1f} MB '
+                    f'(dinh {peak / 1024 / 1024:.1f} MB)'
+                )
+                for query in DEFAULT_QUERIES:
+                    start = time.perf_counter()
+                    for _ in range(options['iterations']):
+                        results = index.suggest(query)
+                    avg_us = (time.perf_counter() - start) * 1_000_000 / options['iterations']
+                    self.stdout.write(f'  "{query}": {avg_us:.1f} us ({len(results)} goi y)')
+
+                # Khong giu lai du lieu gia
+                transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('[OK] Da rollback du lieu gia'))
@@ -0,0 +1,73 @@
+"""
+Management command kiem tra them vao gio hang dong thoi (CartItem.upsert_lines).
+Nhieu thread cung them mot san pham vao cung mot gio (moi thread mot ket noi database,
+giong cac request bam "Them vao gio" lien tiep). Ket qua dung khi gio chi co mot dong,
+so luong bang tong so lan them va tom tat gio hang khop voi CartItem.
+Gio tam duoc xoa khi xong.
+Su dung: python manage.py check_cart_concurrency --threads 8 --adds 25
+"""
+
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from shop.models import Cart, CartItem, Product
+
+
+class Command(BaseCommand):
+    help = 'Kiem tra nhieu request them cung mot san pham vao mot gio hang cung luc'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='So thread chay song song')
+        parser.add_argument('--adds', type=int, default=25, help='So lan them cua moi thread')
+
+    def handle(self, *args, **options):
+        product = Product.objects.order_by('id').first()
+        if product is None:
+            raise CommandError('[ERROR] Chua co san pham nao')
+
+        threads, adds = options['threads'], options['adds']
+        cart = Cart.objects.create(session_key=f'concurrency-check-{uuid.uuid4().hex}')
+        barrier = threading.Barrier(threads)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(adds):
+                    # Giong DatabaseCartStorage.add: upsert + tom tat gio trong mot transaction
+                    with transaction.atomic():
+                        CartItem.upsert_lines(cart, [(product.id, '', '', 1, product.sale_price)])
+                        cart.refresh_summary()
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        try:
+            start = time.perf_counter()
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            lines = list(cart.items.values_list('quantity', flat=True))
+            cart.refresh_from_db()
+            expected = threads * adds
+            self.stdout.write(
+                f'[INFO] {threads} thread x {adds} lan them: {len(lines)} dong, so luong {sum(lines)} '
+                f'(can {expected}), tom tat {cart.item_count}, {elapsed * 1000:.0f} ms '
+                f'({expected / elapsed:.0f} lan/giay)'
+            )
+            for exc in errors[:5]:
+                self.stdout.write(f'[ERROR] {exc!r}')
+            if errors or lines != [expected] or cart.item_count != expected:
+                raise CommandError('[ERROR] Them dong thoi bi trung dong hoac mat so luong')
+        finally:
+            cart.delete()
+        self.stdout.write(self.style.SUCCESS('[OK] Khong trung dong, khong mat so luong'))
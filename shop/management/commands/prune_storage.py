@@ -0,0 +1,106 @@
+"""
+Management command xoa gio hang bo do cua khach va session da het han.
+Xoa theo tung lo nho (moi lo mot transaction ngan), nghi giua cac lo de request
+khac (dat hang, gio hang) khong phai cho khoa ghi cua SQLite qua lau.
+Nen chay dinh ky (vi du moi dem bang cron).
+Su dung: python manage.py prune_storage [--cart-days 30] [--chunk-size 500] [--pause 0.05]
+                                        [--dry-run] [--vacuum] [--analyze]
+"""
+
+import datetime
+import os
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from shop.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Xoa gio hang cua khach khong dung lau ngay va session het han theo tung lo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cart-days', type=int, default=30,
+                            help='Xoa gio hang cua khach khong thay doi trong so ngay nay')
+        parser.add_argument('--chunk-size', type=int, default=500, help='So dong moi lo')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='So giay nghi giua cac lo (nha khoa ghi cho request khac)')
+        parser.add_argument('--dry-run', action='store_true', help='Chi dem, khong xoa')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Chay VACUUM sau khi xoa de thu nho file database (SQLite)')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Chay ANALYZE sau khi xoa de cap nhat thong ke cho query planner')
+
+    def handle(self, *args, **options):
+        if options['cart_days'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('[ERROR] --cart-days va --chunk-size phai lon hon 0')
+
+        now = timezone.now()
+        cart_cutoff = now - datetime.timedelta(days=options['cart_days'])
+        targets = [
+            ('gio hang cua khach', Cart.objects.filter(user__isnull=True, updated_at__lt=cart_cutoff)),
+            ('session het han', Session.objects.filter(expire_date__lt=now)),
+        ]
+
+        for label, queryset in targets:
+            if options['dry_run']:
+                self.stdout.write(f'[INFO] Se xoa {queryset.count()} {label}')
+                continue
+            deleted, chunks, elapsed = self.prune(queryset, options['chunk_size'], options['pause'])
+            rate = deleted / elapsed if elapsed else 0
+            self.stdout.write(
+                f'[INFO] Da xoa {deleted} {label} ({chunks} lo, {elapsed:.2f} giay, {rate:.0f} dong/giay)'
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('[OK] Chay thu xong, khong xoa gi'))
+            return
+        if options['analyze']:
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.stdout.write(f'[INFO] ANALYZE: {time.perf_counter() - start:.2f} giay')
+        if options['vacuum']:
+            self.vacuum()
+        self.stdout.write(self.style.SUCCESS('[OK] Da don dep xong'))
+
+    def prune(self, queryset, chunk_size, pause):
+        """
+        Xoa cac dong cua queryset theo lo chunk_size dong (moi lo mot transaction),
+        nghi pause giay giua cac lo. Tra ve (so dong chinh da xoa, so lo, so giay xoa).
+        """
+        model = queryset.model
+        deleted = chunks = 0
+        elapsed = 0.0
+        while True:
+            start = time.perf_counter()
+            with transaction.atomic():
+                ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+                if ids:
+                    # Gio hang: CartItem bi xoa theo (CASCADE) trong cung transaction
+                    total, details = model.objects.filter(pk__in=ids).delete()
+                    deleted += details.get(model._meta.label, 0)
+            elapsed += time.perf_counter() - start
+            if len(ids) < chunk_size:
+                return deleted, chunks + bool(ids), elapsed
+            chunks += 1
+            # Ngoai transaction: request khac co the ghi trong luc nghi
+            time.sleep(pause)
+
+    def vacuum(self):
+        """VACUUM (chi SQLite) va in kich thuoc file database truoc/sau."""
+        if connection.vendor != 'sqlite':
+            self.stdout.write('[INFO] Bo qua VACUUM (chi ho tro SQLite)')
+            return
+        path = connection.settings_dict['NAME']
+        before = os.path.getsize(path)
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+        self.stdout.write(
+            f'[INFO] VACUUM: {before / 1024 / 1024:.1f} MB -> {os.path.getsize(path) / 1024 / 1024:.1f} MB '
+            f'({time.perf_counter() - start:.2f} giay)'
+        )
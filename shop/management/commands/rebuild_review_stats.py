@@ -0,0 +1,25 @@
+"""
+Management command tinh lai thong ke danh gia (review_count, last_reviewed_at) cua san pham.
+Su dung: python manage.py rebuild_review_stats [--product 1 --product 2]
+"""
+
+from django.core.management.base import BaseCommand
+
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Tinh lai so danh gia va ngay danh gia gan nhat cho san pham (mot cau UPDATE)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            type=int,
+            action='append',
+            dest='product_ids',
+            help='ID san pham can tinh lai (mac dinh: tat ca)',
+        )
+
+    def handle(self, *args, **options):
+        updated = Product.rebuild_review_stats(options['product_ids'])
+        self.stdout.write(self.style.SUCCESS(f'[OK] Da cap nhat thong ke danh gia cho {updated} san pham'))
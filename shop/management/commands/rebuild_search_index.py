@@ -0,0 +1,29 @@
+"""
+Management command tinh lai van ban tim kiem (search_text) va tao lai chi muc FTS5.
+Dung sau khi nhap san pham bang bulk_create/update() hoac khi bang FTS bi lech du lieu
+(vi du sau khi khoi phuc database tu ban sao luu).
+Su dung: python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from shop.models import Product
+from shop.search_utils import rebuild_fts_index, fts_available
+
+
+class Command(BaseCommand):
+    help = 'Tinh lai search_text va tao lai bang FTS5, trigger dong bo cua san pham'
+
+    def handle(self, *args, **options):
+        count = Product.rebuild_search_text()
+        self.stdout.write(self.style.SUCCESS(f'[OK] Da tinh lai van ban tim kiem cho {count} san pham'))
+
+        if connection.vendor != 'sqlite':
+            self.stdout.write('[INFO] Database khong phai SQLite, tim kiem dung search_text (contains)')
+            return
+        rebuild_fts_index()
+        if fts_available():
+            self.stdout.write(self.style.SUCCESS('[OK] Da tao lai chi muc tim kiem san pham'))
+        else:
+            self.stderr.write('[ERROR] Khong tao duoc bang FTS5')
@@ -0,0 +1,31 @@
+"""
+Management command tach lai thong so ky thuat (specifications) thanh ProductAttribute.
+Dung sau khi nhap san pham bang bulk_create/update() hoac khi bo tach thong so
+(shop/spec_utils.py) thay doi.
+Su dung: python manage.py reparse_specifications [--brand Apple] [--batch-size 500]
+"""
+
+from django.core.management.base import BaseCommand
+
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Tach lai thong so ky thuat cua san pham thanh cac thuoc tinh co cau truc'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--brand', help='Chi tach lai san pham cua mot hang')
+        parser.add_argument('--batch-size', type=int, default=500, help='So san pham moi lo')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['brand']:
+            products = products.filter(brand__iexact=options['brand'])
+
+        count, created = Product.rebuild_attributes(products, batch_size=options['batch_size'])
+        if not count:
+            self.stdout.write('[INFO] Khong co san pham nao can tach thong so')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Da tach {created} thuoc tinh tu thong so cua {count} san pham'
+        ))
@@ -0,0 +1,37 @@
+"""
+Management command tong hop luot tim kiem (SearchLog) theo ngay vao SearchQueryDaily.
+Nen chay dinh ky (vi du moi gio bang cron) de bao cao thong ke tim kiem luon moi.
+Su dung: python manage.py rollup_search_logs [--days 2] [--purge-days 90]
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shop.analytics_utils import rollup_search_logs, purge_search_logs
+
+
+class Command(BaseCommand):
+    help = 'Tong hop luot tim kiem theo ngay va tu khoa, xoa luot tim kiem cu'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2,
+                            help='So ngay gan nhat can tong hop lai (mac dinh: hom nay va hom qua)')
+        parser.add_argument('--purge-days', type=int, default=None,
+                            help='Xoa SearchLog cu hon so ngay nay (bang tong hop van giu)')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        for offset in range(options['days'] - 1, -1, -1):
+            day = today - datetime.timedelta(days=offset)
+            count = rollup_search_logs(day)
+            self.stdout.write(f'[INFO] {day:%d/%m/%Y}: {count} tu khoa')
+        self.stdout.write(self.style.SUCCESS(f'[OK] Da tong hop {options["days"]} ngay'))
+
+        if options['purge_days'] is not None:
+            if options['purge_days'] < options['days']:
+                self.stderr.write('[ERROR] --purge-days phai lon hon hoac bang --days')
+                return
+            deleted = purge_search_logs(options['purge_days'])
+            self.stdout.write(self.style.SUCCESS(f'[OK] Da xoa {deleted} luot tim kiem cu'))
@@ -0,0 +1,99 @@
+"""
+Middleware for the shop application.
+Middleware cache toàn trang cho khách chưa đăng nhập và ghi giỏ hàng của khách.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .analytics_utils import record_search
+from .cache_utils import (
+    PAGE_CACHE_TIMEOUT, page_cache_key, is_anonymous_catalog_request,
+    catalog_etag, catalog_last_modified,
+)
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Cache toàn bộ HTML của các view được đánh dấu @anonymous_page_cache
+    cho khách chưa đăng nhập (request GET/HEAD, không có thông báo đang chờ).
+
+    Key cache chứa catalog version nên khi catalog thay đổi thì trang cũ
+    tự hết hiệu lực. Khi trúng cache, view không chạy và không có truy vấn
+    database nào cho catalog. Badge giỏ hàng được tải riêng bằng JS
+    (view cart_summary) nên HTML giống nhau với mọi khách.
+
+    Cần đặt sau SessionMiddleware, CsrfViewMiddleware, AuthenticationMiddleware
+    và MessageMiddleware trong settings.MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        key = getattr(request, '_page_cache_key', None)
+        if (key and response.status_code == 200 and not response.streaming
+                and not response.cookies):
+            cache.set(key, response, PAGE_CACHE_TIMEOUT)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if not getattr(view_func, 'anonymous_page_cache', False):
+            return None
+        if not is_anonymous_catalog_request(request):
+            return None
+
+        # Form trong trang lấy CSRF token từ cookie (bằng JS),
+        # nên phải đảm bảo khách có cookie CSRF kể cả khi trang lấy từ cache
+        get_token(request)
+
+        key = page_cache_key(request)
+        started = time.perf_counter()
+        response = cache.get(key)
+        if response is None:
+            if request.method == 'GET':
+                request._page_cache_key = key
+            return None
+
+        # Trang tìm kiếm lấy từ cache vẫn được tính là một lượt tìm (analytics_utils.py)
+        search_log = getattr(response, 'search_log', None)
+        if search_log:
+            record_search(latency_ms=(time.perf_counter() - started) * 1000, **search_log)
+
+        # Validator (ETag chứa cookie CSRF) được tạo lại cho từng khách
+        etag = quote_etag(catalog_etag(request))
+        last_modified = int(catalog_last_modified(request).timestamp())
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified, response=response,
+        )
+
+
+class GuestCartMiddleware:
+    """
+    Ghi giỏ hàng của khách (backend session / cookie trong cart_utils.py) vào
+    response sau khi view (hoặc lúc đăng nhập) thay đổi giỏ hàng.
+
+    Cần đặt sau SessionMiddleware (session được lưu sau khi middleware này chạy)
+    và trước AnonymousPageCacheMiddleware trong settings.MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        storage = getattr(request, '_guest_cart_storage', None)
+        if storage is not None:
+            storage.update(response)
+        return response
@@ -0,0 +1,60 @@
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Coalesce
+
+
+def populate_review_stats(apps, schema_editor):
+    """Tính thống kê đánh giá ban đầu cho các sản phẩm đã có."""
+    Product = apps.get_model('shop', 'Product')
+    Review = apps.get_model('shop', 'Review')
+
+    reviews = Review.objects.filter(product=models.OuterRef('pk'))
+    Product.objects.update(
+        review_count=Coalesce(
+            models.Subquery(
+                reviews.order_by().values('product').annotate(total=Count('id')).values('total')
+            ),
+            0,
+        ),
+        last_reviewed_at=models.Subquery(
+            reviews.order_by('-created_at').values('created_at')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0015_order_orderitem_indexes'),
+    ]
+
+    operations = [
+        # Trạng thái migration của bảng shop_product đang lệch với bảng thật
+        # (stock_quantity, youtube_id), nên không để Django tạo lại bảng (remake
+        # table trên SQLite) mà thêm cột trực tiếp bằng ALTER TABLE.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'ALTER TABLE shop_product ADD COLUMN review_count integer NOT NULL DEFAULT 0',
+                    reverse_sql='ALTER TABLE shop_product DROP COLUMN review_count',
+                ),
+                migrations.RunSQL(
+                    'ALTER TABLE shop_product ADD COLUMN last_reviewed_at datetime NULL',
+                    reverse_sql='ALTER TABLE shop_product DROP COLUMN last_reviewed_at',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='product',
+                    name='review_count',
+                    field=models.PositiveIntegerField(default=0, verbose_name='Số đánh giá'),
+                ),
+                migrations.AddField(
+                    model_name='product',
+                    name='last_reviewed_at',
+                    field=models.DateTimeField(blank=True, null=True, verbose_name='Ngày đánh giá gần nhất'),
+                ),
+            ],
+        ),
+        migrations.RunPython(populate_review_stats, migrations.RunPython.noop),
+    ]
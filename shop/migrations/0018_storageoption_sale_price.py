@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def populate_sale_price(apps, schema_editor):
+    """Tính giá khuyến mãi cho các tùy chọn bộ nhớ đã có (giống StorageOption.compute_sale_price)."""
+    StorageOption = apps.get_model('shop', 'StorageOption')
+
+    # Chỉ lấy các cột cần thiết (trạng thái migration của shop_product lệch với bảng thật)
+    options = list(StorageOption.objects.select_related('product').only(
+        'id', 'original_price', 'sale_price', 'product__discount_percent'
+    ))
+    for option in options:
+        discount = option.product.discount_percent
+        if discount and float(discount) > 0:
+            raw_price = float(option.original_price) * (100 - float(discount)) / 100
+            option.sale_price = int(round(raw_price / 1000) * 1000)
+        else:
+            option.sale_price = option.original_price
+    StorageOption.objects.bulk_update(options, ['sale_price'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0017_review_product_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storageoption',
+            name='sale_price',
+            field=models.DecimalField(decimal_places=0, default=0, max_digits=12, verbose_name='Giá khuyến mãi'),
+        ),
+        migrations.RunPython(populate_sale_price, migrations.RunPython.noop),
+    ]
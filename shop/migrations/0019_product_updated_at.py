@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0018_storageoption_sale_price'),
+    ]
+
+    operations = [
+        # Thêm cột trực tiếp bằng ALTER TABLE (xem 0016_product_review_stats),
+        # sau đó lấy created_at làm giá trị ban đầu.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    [
+                        "ALTER TABLE shop_product ADD COLUMN updated_at datetime NOT NULL DEFAULT '2000-01-01 00:00:00'",
+                        'UPDATE shop_product SET updated_at = created_at',
+                    ],
+                    reverse_sql='ALTER TABLE shop_product DROP COLUMN updated_at',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='product',
+                    name='updated_at',
+                    field=models.DateTimeField(auto_now=True, verbose_name='Ngày cập nhật'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,77 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+# Bảng FTS5 cho tìm kiếm sản phẩm (xem search_utils.py), chỉ dùng với SQLite
+FTS_SETUP_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS shop_product_fts USING fts5(
+        name, brand, description, specifications,
+        content='shop_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_ai AFTER INSERT ON shop_product BEGIN
+        INSERT INTO shop_product_fts(rowid, name, brand, description, specifications)
+        VALUES (new.id, new.name, new.brand, new.description, new.specifications);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_ad AFTER DELETE ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, brand, description, specifications)
+        VALUES ('delete', old.id, old.name, old.brand, old.description, old.specifications);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_au
+    AFTER UPDATE OF name, brand, description, specifications ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, brand, description, specifications)
+        VALUES ('delete', old.id, old.name, old.brand, old.description, old.specifications);
+        INSERT INTO shop_product_fts(rowid, name, brand, description, specifications)
+        VALUES (new.id, new.name, new.brand, new.description, new.specifications);
+    END
+    """,
+    "INSERT INTO shop_product_fts(shop_product_fts) VALUES ('rebuild')",
+]
+
+FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS shop_product_fts_ai",
+    "DROP TRIGGER IF EXISTS shop_product_fts_ad",
+    "DROP TRIGGER IF EXISTS shop_product_fts_au",
+    "DROP TABLE IF EXISTS shop_product_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    """Tạo bảng FTS5 và trigger; bỏ qua nếu không phải SQLite hoặc SQLite không có FTS5."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(FTS_SETUP_SQL[0])
+        except OperationalError:
+            # SQLite được build không có FTS5 - tìm kiếm sẽ dùng icontains
+            return
+        for sql in FTS_SETUP_SQL[1:]:
+            cursor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in FTS_DROP_SQL:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0020_product_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
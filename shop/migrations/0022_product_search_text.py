@@ -0,0 +1,112 @@
+import importlib
+import unicodedata
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+SOURCE_FIELDS = ('brand', 'name', 'description', 'specifications')
+
+# Bảng FTS5 mới: đánh chỉ mục search_text đã chuẩn hóa thay cho description/specifications
+FTS_SETUP_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS shop_product_fts USING fts5(
+        name, brand, search_text,
+        content='shop_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_ai AFTER INSERT ON shop_product BEGIN
+        INSERT INTO shop_product_fts(rowid, name, brand, search_text)
+        VALUES (new.id, new.name, new.brand, new.search_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_ad AFTER DELETE ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, brand, search_text)
+        VALUES ('delete', old.id, old.name, old.brand, old.search_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_au
+    AFTER UPDATE OF name, brand, search_text ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, brand, search_text)
+        VALUES ('delete', old.id, old.name, old.brand, old.search_text);
+        INSERT INTO shop_product_fts(rowid, name, brand, search_text)
+        VALUES (new.id, new.name, new.brand, new.search_text);
+    END
+    """,
+    "INSERT INTO shop_product_fts(shop_product_fts) VALUES ('rebuild')",
+]
+
+
+def normalize_search_text(text):
+    """Bản sao của search_utils.normalize_search_text tại thời điểm tạo migration."""
+    text = unicodedata.normalize('NFD', text or '')
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    text = text.replace('đ', 'd').replace('Đ', 'D').lower()
+    return ' '.join(text.split())
+
+
+def populate_search_text(apps, schema_editor):
+    """Tạo search_text cho các sản phẩm đã có."""
+    Product = apps.get_model('shop', 'Product')
+    products = list(Product.objects.only('id', *SOURCE_FIELDS))
+    for product in products:
+        product.search_text = normalize_search_text(
+            ' '.join(getattr(product, name) or '' for name in SOURCE_FIELDS)
+        )
+    Product.objects.bulk_update(products, ['search_text'], batch_size=500)
+
+
+def replace_fts(drop_sql, setup_sql):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            for sql in drop_sql:
+                cursor.execute(sql)
+            try:
+                cursor.execute(setup_sql[0])
+            except OperationalError:
+                # SQLite được build không có FTS5 - tìm kiếm dùng search_text
+                return
+            for sql in setup_sql[1:]:
+                cursor.execute(sql)
+    return run
+
+
+previous = importlib.import_module('shop.migrations.0021_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0021_product_fts'),
+    ]
+
+    operations = [
+        # Thêm cột trực tiếp bằng ALTER TABLE (xem 0016_product_review_stats)
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    "ALTER TABLE shop_product ADD COLUMN search_text text NOT NULL DEFAULT ''",
+                    reverse_sql='ALTER TABLE shop_product DROP COLUMN search_text',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='product',
+                    name='search_text',
+                    field=models.TextField(blank=True, default='', editable=False, verbose_name='Văn bản tìm kiếm'),
+                ),
+            ],
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+        migrations.RunPython(
+            replace_fts(previous.FTS_DROP_SQL, FTS_SETUP_SQL),
+            replace_fts(previous.FTS_DROP_SQL, previous.FTS_SETUP_SQL),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_attributes(apps, schema_editor):
+    """Tách thuộc tính thông số cho các sản phẩm đã có."""
+    # Bộ tách thông số không phụ thuộc model nên dùng trực tiếp; nếu sau này
+    # bộ tách thay đổi thì chạy lại: python manage.py reparse_specifications
+    from shop.spec_utils import parse_specifications
+
+    Product = apps.get_model('shop', 'Product')
+    ProductAttribute = apps.get_model('shop', 'ProductAttribute')
+
+    # Chỉ lấy các cột cần thiết (trạng thái migration của shop_product lệch với bảng thật)
+    rows = Product.objects.order_by('id').values_list('id', 'specifications')
+    ProductAttribute.objects.bulk_create([
+        ProductAttribute(product_id=product_id, **attribute)
+        for product_id, specifications in rows.iterator(chunk_size=500)
+        for attribute in parse_specifications(specifications)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0022_product_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAttribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, verbose_name='Mã thông số')),
+                ('label', models.CharField(max_length=100, verbose_name='Tên thông số')),
+                ('value', models.CharField(max_length=255, verbose_name='Giá trị')),
+                ('value_text', models.CharField(max_length=255, verbose_name='Giá trị chuẩn hóa')),
+                ('numeric_value', models.FloatField(blank=True, null=True, verbose_name='Giá trị số')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attributes', to='shop.product', verbose_name='Sản phẩm')),
+            ],
+            options={
+                'verbose_name': 'Thông số sản phẩm',
+                'verbose_name_plural': 'Thông số sản phẩm',
+                'indexes': [
+                    models.Index(fields=['key', 'numeric_value'], name='shop_attr_key_number_idx'),
+                    models.Index(fields=['key', 'value_text'], name='shop_attr_key_text_idx'),
+                    models.Index(fields=['product', 'key'], name='shop_attr_product_key_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(populate_attributes, migrations.RunPython.noop),
+    ]
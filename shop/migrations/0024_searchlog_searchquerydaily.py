@@ -0,0 +1,49 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0023_productattribute'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200, verbose_name='Từ khóa')),
+                ('corrected_query', models.CharField(blank=True, max_length=200, verbose_name='Từ khóa đã sửa')),
+                ('result_count', models.PositiveIntegerField(default=0, verbose_name='Số kết quả')),
+                ('latency_ms', models.FloatField(default=0, verbose_name='Thời gian xử lý (ms)')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Thời gian')),
+            ],
+            options={
+                'verbose_name': 'Lượt tìm kiếm',
+                'verbose_name_plural': 'Lượt tìm kiếm',
+                'indexes': [
+                    models.Index(fields=['created_at'], name='shop_searchlog_created_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchQueryDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ngày')),
+                ('query', models.CharField(max_length=200, verbose_name='Từ khóa')),
+                ('searches', models.PositiveIntegerField(default=0, verbose_name='Số lượt tìm')),
+                ('zero_results', models.PositiveIntegerField(default=0, verbose_name='Số lượt không có kết quả')),
+                ('total_results', models.PositiveIntegerField(default=0, verbose_name='Tổng số kết quả')),
+                ('total_latency_ms', models.FloatField(default=0, verbose_name='Tổng thời gian xử lý (ms)')),
+            ],
+            options={
+                'verbose_name': 'Thống kê tìm kiếm theo ngày',
+                'verbose_name_plural': 'Thống kê tìm kiếm theo ngày',
+                'constraints': [
+                    models.UniqueConstraint(fields=('date', 'query'), name='shop_searchdaily_date_query_uniq'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+def populate_cart_summary(apps, schema_editor):
+    """Tính tổng số sản phẩm và tổng tiền cho các giỏ hàng đã có."""
+    Cart = apps.get_model('shop', 'Cart')
+    CartItem = apps.get_model('shop', 'CartItem')
+
+    totals = (
+        CartItem.objects.values('cart_id')
+        .annotate(
+            item_quantity=models.Sum('quantity'),
+            item_amount=models.Sum(models.F('price') * models.F('quantity')),
+        )
+        .order_by()
+    )
+    carts = []
+    for row in totals:
+        carts.append(Cart(pk=row['cart_id'], item_count=row['item_quantity'] or 0, total_amount=row['item_amount'] or 0))
+    Cart.objects.bulk_update(carts, ['item_count', 'total_amount'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0024_searchlog_searchquerydaily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Tổng số sản phẩm'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=0, default=0, max_digits=14, verbose_name='Tổng tiền'),
+        ),
+        migrations.RunPython(populate_cart_summary, migrations.RunPython.noop),
+    ]
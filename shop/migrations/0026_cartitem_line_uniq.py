@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Gộp các dòng trùng (cùng giỏ, sản phẩm, bộ nhớ, màu) vào dòng cũ nhất trước khi thêm ràng buộc."""
+    CartItem = apps.get_model('shop', 'CartItem')
+
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id', 'storage', 'color')
+        .annotate(lines=models.Count('id'), first_id=models.Min('id'), item_quantity=models.Sum('quantity'))
+        .filter(lines__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        lines = CartItem.objects.filter(
+            cart_id=row['cart_id'], product_id=row['product_id'],
+            storage=row['storage'], color=row['color'],
+        )
+        lines.filter(id=row['first_id']).update(quantity=row['item_quantity'])
+        lines.exclude(id=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0025_cart_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(
+                fields=('cart', 'product', 'storage', 'color'),
+                name='shop_cartitem_line_uniq',
+            ),
+        ),
+    ]
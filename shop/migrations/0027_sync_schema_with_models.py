@@ -0,0 +1,158 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Các cột có trong model nhưng chưa có migration: database đang chạy đã được thêm
+# bằng tay (ALTER TABLE), database mới tạo từ migration thì chưa có
+ADDED_COLUMNS = [
+    ('shop_product', 'stock_quantity', 'integer unsigned NOT NULL DEFAULT 0 CHECK ("stock_quantity" >= 0)'),
+    ('shop_coupon', 'description', "text NOT NULL DEFAULT ''"),
+    ('shop_coupon', 'max_product_limit', 'integer unsigned NOT NULL DEFAULT 0 CHECK ("max_product_limit" >= 0)'),
+    ('shop_coupon', 'max_usage', 'integer unsigned NOT NULL DEFAULT 0 CHECK ("max_usage" >= 0)'),
+    ('shop_coupon', 'max_usage_per_user', 'integer unsigned NOT NULL DEFAULT 1 CHECK ("max_usage_per_user" >= 0)'),
+    ('shop_coupon', 'specific_email', 'varchar(254) NULL'),
+    ('shop_coupon', 'usage_type', "varchar(10) NOT NULL DEFAULT 'all'"),
+    ('shop_coupon', 'used_count', 'integer unsigned NOT NULL DEFAULT 0 CHECK ("used_count" >= 0)'),
+    ('shop_uservoucher', 'is_used', 'bool NOT NULL DEFAULT 0'),
+    ('shop_uservoucher', 'used_at', 'datetime NULL'),
+    ('shop_uservoucher', 'order_id', 'bigint NULL REFERENCES "shop_order" ("id") DEFERRABLE INITIALLY DEFERRED'),
+]
+
+# Các cột đã bỏ khỏi model nhưng migration vẫn tạo (NOT NULL, không có default)
+DROPPED_COLUMNS = [
+    ('shop_product', 'youtube_id', "varchar(50) NOT NULL DEFAULT ''"),
+    ('shop_coupon', 'max_discount', 'integer unsigned NOT NULL DEFAULT 0 CHECK ("max_discount" >= 0)'),
+]
+
+USERVOUCHER_ORDER_INDEX = 'shop_uservoucher_order_id_idx'
+REVIEW_UNIQUE_INDEX = 'shop_review_product_id_user_id_34338eec_uniq'
+
+
+def table_columns(connection, cursor, table):
+    return {column.name for column in connection.introspection.get_table_description(cursor, table)}
+
+
+def sync_schema(apps, schema_editor):
+    """
+    Đưa bảng về đúng model, chỉ thay đổi phần còn thiếu/thừa (chạy được cả trên
+    database đã sửa bằng tay lẫn database mới tạo từ migration).
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for table, column, definition in ADDED_COLUMNS:
+            if column not in table_columns(connection, cursor, table):
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        for table, column, definition in DROPPED_COLUMNS:
+            if column in table_columns(connection, cursor, table):
+                cursor.execute(f'ALTER TABLE {table} DROP COLUMN {column}')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {USERVOUCHER_ORDER_INDEX} ON shop_uservoucher (order_id)')
+        # Review không còn unique_together (product, user)
+        cursor.execute(f'DROP INDEX IF EXISTS {REVIEW_UNIQUE_INDEX}')
+
+
+def unsync_schema(apps, schema_editor):
+    """Ngược lại sync_schema: bỏ các cột đã thêm, thêm lại các cột đã bỏ."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS {REVIEW_UNIQUE_INDEX} ON shop_review (product_id, user_id)'
+        )
+        cursor.execute(f'DROP INDEX IF EXISTS {USERVOUCHER_ORDER_INDEX}')
+        for table, column, definition in DROPPED_COLUMNS:
+            if column not in table_columns(connection, cursor, table):
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        for table, column, definition in reversed(ADDED_COLUMNS):
+            if column in table_columns(connection, cursor, table):
+                cursor.execute(f'ALTER TABLE {table} DROP COLUMN {column}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0026_cartitem_line_uniq'),
+    ]
+
+    operations = [
+        # Trạng thái migration lệch với model và với database đang chạy (các cột được
+        # thêm bằng tay), nên sửa bảng bằng ALTER TABLE có kiểm tra cột (xem
+        # 0016_product_review_stats) rồi cập nhật trạng thái cho khớp với model.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(sync_schema, unsync_schema),
+            ],
+            state_operations=[
+                migrations.AlterUniqueTogether(
+                    name='review',
+                    unique_together=set(),
+                ),
+                migrations.RemoveField(
+                    model_name='coupon',
+                    name='max_discount',
+                ),
+                migrations.RemoveField(
+                    model_name='product',
+                    name='youtube_id',
+                ),
+                migrations.AddField(
+                    model_name='coupon',
+                    name='description',
+                    field=models.TextField(blank=True, default='', verbose_name='Mô tả voucher'),
+                ),
+                migrations.AddField(
+                    model_name='coupon',
+                    name='max_product_limit',
+                    field=models.PositiveIntegerField(default=0, help_text='0 = không giới hạn. Ví dụ: set 1 thì chỉ áp dụng cho 1 sản phẩm, set 3 thì áp dụng cho tối đa 3 sản phẩm.', verbose_name='Sản phẩm tối đa cùng lúc'),
+                ),
+                migrations.AddField(
+                    model_name='coupon',
+                    name='max_usage',
+                    field=models.PositiveIntegerField(default=0, help_text='0 = không giới hạn số người', verbose_name='Số người sử dụng tối đa'),
+                ),
+                migrations.AddField(
+                    model_name='coupon',
+                    name='max_usage_per_user',
+                    field=models.PositiveIntegerField(default=1, help_text='Số lần mỗi user được sử dụng voucher này', verbose_name='Mỗi user sử dụng tối đa'),
+                ),
+                migrations.AddField(
+                    model_name='coupon',
+                    name='specific_email',
+                    field=models.EmailField(blank=True, help_text='Nhập email người dùng được sử dụng voucher này', max_length=254, null=True, verbose_name='Email áp dụng'),
+                ),
+                migrations.AddField(
+                    model_name='coupon',
+                    name='usage_type',
+                    field=models.CharField(choices=[('all', 'Mọi người'), ('specific', 'Nhập email')], default='all', max_length=10, verbose_name='Ai có thể sử dụng'),
+                ),
+                migrations.AddField(
+                    model_name='coupon',
+                    name='used_count',
+                    field=models.PositiveIntegerField(default=0, help_text='Số lần voucher đã được sử dụng trong đơn hàng', verbose_name='Đã sử dụng'),
+                ),
+                migrations.AddField(
+                    model_name='product',
+                    name='stock_quantity',
+                    field=models.PositiveIntegerField(default=0, verbose_name='Số lượng tồn kho'),
+                ),
+                migrations.AddField(
+                    model_name='uservoucher',
+                    name='is_used',
+                    field=models.BooleanField(default=False, verbose_name='Đã sử dụng'),
+                ),
+                migrations.AddField(
+                    model_name='uservoucher',
+                    name='order',
+                    field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='used_vouchers', to='shop.order', verbose_name='Đơn hàng sử dụng'),
+                ),
+                migrations.AddField(
+                    model_name='uservoucher',
+                    name='used_at',
+                    field=models.DateTimeField(blank=True, null=True, verbose_name='Ngày sử dụng'),
+                ),
+                migrations.AlterField(
+                    model_name='coupon',
+                    name='min_order',
+                    field=models.PositiveIntegerField(default=0, verbose_name='Đơn hàng tối thiểu (đ)'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+# Trigger cập nhật FTS chỉ chạy khi name, brand hoặc search_text thật sự đổi:
+# UPDATE OF chạy với mọi câu UPDATE có các cột này trong SET (Product.save()
+# luôn ghi lại mọi cột), kể cả khi giá trị không đổi.
+CHANGED_TRIGGER_SQL = """
+    CREATE TRIGGER shop_product_fts_au
+    AFTER UPDATE OF name, brand, search_text ON shop_product
+    WHEN old.name IS NOT new.name OR old.brand IS NOT new.brand
+        OR old.search_text IS NOT new.search_text
+    BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, brand, search_text)
+        VALUES ('delete', old.id, old.name, old.brand, old.search_text);
+        INSERT INTO shop_product_fts(rowid, name, brand, search_text)
+        VALUES (new.id, new.name, new.brand, new.search_text);
+    END
+"""
+
+PREVIOUS_TRIGGER_SQL = """
+    CREATE TRIGGER shop_product_fts_au
+    AFTER UPDATE OF name, brand, search_text ON shop_product BEGIN
+        INSERT INTO shop_product_fts(shop_product_fts, rowid, name, brand, search_text)
+        VALUES ('delete', old.id, old.name, old.brand, old.search_text);
+        INSERT INTO shop_product_fts(rowid, name, brand, search_text)
+        VALUES (new.id, new.name, new.brand, new.search_text);
+    END
+"""
+
+
+def replace_update_trigger(trigger_sql):
+    def run(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            # SQLite không có FTS5 (0021/0022 bỏ qua bảng FTS) thì không có trigger
+            if 'shop_product_fts' not in connection.introspection.table_names(cursor):
+                return
+            cursor.execute('DROP TRIGGER IF EXISTS shop_product_fts_au')
+            cursor.execute(trigger_sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0027_sync_schema_with_models'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            replace_update_trigger(CHANGED_TRIGGER_SQL),
+            replace_update_trigger(PREVIOUS_TRIGGER_SQL),
+        ),
+    ]
@@ -7,12 +7,15 @@ Models:
 - ProductImage: Hình ảnh chi tiết của sản phẩm
 - StorageOption: Tùy chọn bộ nhớ và giá
 - ColorOption: Tùy chọn màu sắc và hình ảnh
+- ProductAttribute: Thông số kỹ thuật có cấu trúc (tách từ specifications)
+- SearchLog, SearchQueryDaily: Lượt tìm kiếm và thống kê theo ngày
 - Review: Đánh giá và bình luận của khách hàng
 - Coupon: Mã giảm giá
 """
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class UserProfile(models.Model):
@@ -118,16 +121,188 @@ class Product(models.Model):
         verbose_name="Đổi trả trong 30 ngày"
     )
     
-    # Thời gian tạo
+    # Thời gian tạo và cập nhật
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo")
+    # Version của sản phẩm: đổi khi sản phẩm hoặc ảnh/bộ nhớ/màu của nó thay đổi
+    # (dùng làm key cho cache fragment của template)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật")
+    
+    # Thống kê đánh giá (lưu sẵn để trang danh sách không cần COUNT từng sản phẩm)
+    review_count = models.PositiveIntegerField(default=0, verbose_name="Số đánh giá")
+    last_reviewed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Ngày đánh giá gần nhất"
+    )
+    
+    # Văn bản tìm kiếm đã chuẩn hóa (bỏ dấu, đ -> d, chữ thường) từ hãng, tên,
+    # mô tả và thông số - tự cập nhật khi lưu, được đánh chỉ mục FTS5 (search_utils.py)
+    search_text = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Văn bản tìm kiếm"
+    )
+    
+    # Các field dùng để tạo search_text
+    SEARCH_SOURCE_FIELDS = ('brand', 'name', 'description', 'specifications')
     
     class Meta:
         # Sắp xếp theo ngày tạo mới nhất
         ordering = ['-created_at']
+        # Index cho trang danh sách (catalog_utils.py): mỗi kiểu sắp xếp
+        # có một index, và một index có hãng đứng đầu khi lọc theo hãng
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='shop_product_created_idx'),
+            models.Index(fields=['sale_price', 'id'], name='shop_product_price_idx'),
+            models.Index(fields=['discount_percent', 'id'], name='shop_product_discount_idx'),
+            models.Index(fields=['brand', 'created_at', 'id'], name='shop_product_brand_created_idx'),
+            models.Index(fields=['brand', 'sale_price', 'id'], name='shop_product_brand_price_idx'),
+            models.Index(fields=['brand', 'discount_percent', 'id'], name='shop_product_brand_disc_idx'),
+        ]
     
     def __str__(self):
         return f"{self.brand} {self.name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Ghi nhớ discount_percent, specifications và các field tạo search_text lúc tải
+        để biết khi nào cần tính lại giá bộ nhớ, các thuộc tính thông số và search_text.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_discount_percent = instance.__dict__.get('discount_percent')
+        instance._loaded_specifications = instance.__dict__.get('specifications')
+        instance._loaded_search_sources = instance.search_sources()
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """
+        Lưu sản phẩm: nếu hãng, tên, mô tả hoặc thông số thay đổi thì cập nhật
+        search_text; nếu discount_percent thay đổi thì tính lại giá của các tùy chọn
+        bộ nhớ, nếu specifications thay đổi thì tách lại các thuộc tính thông số
+        (ProductAttribute).
+        """
+        # Chỉ tính lại search_text khi đã tải đủ các field nguồn (không bị defer)
+        # và có field nguồn thay đổi so với lúc tải; _search_changed dùng cho signal
+        # làm mất hiệu lực cache tìm kiếm
+        update_fields = kwargs.get('update_fields')
+        search_sources = self.search_sources()
+        saves_search_sources = (
+            update_fields is None or bool(set(update_fields) & set(self.SEARCH_SOURCE_FIELDS))
+        )
+        self._search_changed = (
+            search_sources is not None
+            and saves_search_sources
+            and (self._state.adding
+                 or getattr(self, '_loaded_search_sources', None) != search_sources)
+        )
+        if self._search_changed:
+            self.search_text = self.build_search_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'search_text'}
+        
+        discount_changed = (
+            not self._state.adding
+            and 'discount_percent' in self.__dict__
+            and getattr(self, '_loaded_discount_percent', None) != self.discount_percent
+        )
+        update_fields = kwargs.get('update_fields')
+        specifications_changed = (
+            'specifications' in self.__dict__
+            and (update_fields is None or 'specifications' in update_fields)
+            and (self._state.adding
+                 or getattr(self, '_loaded_specifications', None) != self.specifications)
+        )
+        super().save(*args, **kwargs)
+        if discount_changed:
+            self.sync_storage_sale_prices()
+        if specifications_changed:
+            self.sync_attributes()
+        self._loaded_discount_percent = self.__dict__.get('discount_percent')
+        self._loaded_specifications = self.__dict__.get('specifications')
+        if saves_search_sources:
+            self._loaded_search_sources = search_sources
+    
+    def search_sources(self):
+        """Giá trị các field tạo search_text (None nếu có field bị defer)."""
+        if not all(name in self.__dict__ for name in self.SEARCH_SOURCE_FIELDS):
+            return None
+        return tuple(self.__dict__[name] for name in self.SEARCH_SOURCE_FIELDS)
+    
+    def build_search_text(self):
+        """Tạo văn bản tìm kiếm đã chuẩn hóa từ hãng, tên, mô tả và thông số."""
+        from .search_utils import normalize_search_text
+        
+        return normalize_search_text(' '.join(
+            getattr(self, name) or '' for name in self.SEARCH_SOURCE_FIELDS
+        ))
+    
+    @classmethod
+    def rebuild_search_text(cls, queryset=None, batch_size=500):
+        """
+        Tính lại search_text cho nhiều sản phẩm (ví dụ sau bulk_create hoặc update()).
+        Trả về số sản phẩm đã cập nhật.
+        """
+        from .cache_utils import bump_search_version
+
+        if queryset is None:
+            queryset = cls.objects.all()
+        products = list(queryset.only('id', *cls.SEARCH_SOURCE_FIELDS))
+        for product in products:
+            product.search_text = product.build_search_text()
+        cls.objects.bulk_update(products, ['search_text'], batch_size=batch_size)
+        bump_search_version()
+        return len(products)
+    
+    def sync_attributes(self):
+        """Tách lại thuộc tính thông số từ specifications (1 DELETE + 1 INSERT)."""
+        from .spec_utils import parse_specifications
+        
+        ProductAttribute.objects.filter(product=self).delete()
+        ProductAttribute.objects.bulk_create([
+            ProductAttribute(product=self, **attribute)
+            for attribute in parse_specifications(self.specifications)
+        ])
+    
+    @classmethod
+    def rebuild_attributes(cls, queryset=None, batch_size=500):
+        """
+        Tách lại thuộc tính thông số cho nhiều sản phẩm (ví dụ sau bulk_create,
+        update() hoặc khi bộ tách thông số thay đổi), theo từng lô batch_size sản phẩm.
+        Trả về (số sản phẩm, số thuộc tính đã tạo).
+        """
+        from django.db import transaction
+        from .cache_utils import bump_catalog_version
+        from .spec_utils import parse_specifications
+        
+        if queryset is None:
+            queryset = cls.objects.all()
+        rows = list(queryset.order_by('id').values_list('id', 'specifications'))
+        created = 0
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            attributes = [
+                ProductAttribute(product_id=product_id, **attribute)
+                for product_id, specifications in batch
+                for attribute in parse_specifications(specifications)
+            ]
+            with transaction.atomic():
+                ProductAttribute.objects.filter(
+                    product_id__in=[product_id for product_id, specifications in batch]
+                ).delete()
+                ProductAttribute.objects.bulk_create(attributes, batch_size=batch_size)
+            created += len(attributes)
+        bump_catalog_version()
+        return len(rows), created
+    
+    def sync_storage_sale_prices(self):
+        """Tính lại giá khuyến mãi đã lưu của mọi tùy chọn bộ nhớ (1 SELECT + 1 UPDATE)."""
+        options = list(StorageOption.objects.filter(product=self))
+        for option in options:
+            option.sale_price = option.compute_sale_price(self.discount_percent)
+        StorageOption.objects.bulk_update(options, ['sale_price'])
+    
     @property
     def discount_percent_display(self):
         """
@@ -148,6 +323,75 @@ class Product(models.Model):
     def formatted_sale_price(self):
         """Định dạng giá khuyến mãi theo đ."""
         return f"{int(self.sale_price):,}đ"
+    
+    def record_review_added(self, review):
+        """
+        Cập nhật thống kê đánh giá khi có đánh giá mới (một câu UPDATE).
+        Gọi trong cùng transaction với review.save().
+        """
+        from django.db import transaction
+        from django.db.models import F
+        from .cache_utils import bump_catalog_version
+        
+        Product.objects.filter(pk=self.pk).update(
+            review_count=F('review_count') + 1,
+            last_reviewed_at=review.created_at,
+            updated_at=timezone.now(),
+        )
+        # Cache chỉ được tạo lại sau khi transaction đã commit
+        transaction.on_commit(bump_catalog_version)
+    
+    def record_review_removed(self):
+        """
+        Cập nhật thống kê đánh giá sau khi xóa một đánh giá.
+        Gọi trong cùng transaction với review.delete().
+        """
+        from django.db import transaction
+        from django.db.models import F
+        from .cache_utils import bump_catalog_version
+        
+        Product.objects.filter(pk=self.pk, review_count__gt=0).update(
+            review_count=F('review_count') - 1,
+        )
+        Product.objects.filter(pk=self.pk).update(
+            last_reviewed_at=models.Subquery(
+                Review.objects.filter(product=models.OuterRef('pk'))
+                .order_by('-created_at').values('created_at')[:1]
+            ),
+            updated_at=timezone.now(),
+        )
+        transaction.on_commit(bump_catalog_version)
+    
+    @classmethod
+    def rebuild_review_stats(cls, product_ids=None):
+        """
+        Tính lại thống kê đánh giá cho nhiều sản phẩm bằng một câu UPDATE.
+        Trả về số sản phẩm đã cập nhật.
+        """
+        from django.db.models import Count
+        from django.db.models.functions import Coalesce
+        from .cache_utils import bump_catalog_version
+        
+        reviews = Review.objects.filter(product=models.OuterRef('pk'))
+        products = cls.objects.all()
+        if product_ids is not None:
+            products = products.filter(pk__in=product_ids)
+        
+        updated = products.update(
+            review_count=Coalesce(
+                models.Subquery(
+                    reviews.order_by().values('product')
+                    .annotate(total=Count('id')).values('total')
+                ),
+                0,
+            ),
+            last_reviewed_at=models.Subquery(
+                reviews.order_by('-created_at').values('created_at')[:1]
+            ),
+            updated_at=timezone.now(),
+        )
+        bump_catalog_version()
+        return updated
 
 
 class ProductImage(models.Model):
@@ -191,6 +435,13 @@ class StorageOption(models.Model):
         default=0,
         verbose_name="Giá gốc"
     )
+    # Giá khuyến mãi đã làm tròn, lưu sẵn (tính lại khi sản phẩm đổi discount_percent)
+    sale_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=0,
+        default=0,
+        verbose_name="Giá khuyến mãi"
+    )
     
     class Meta:
         verbose_name = "Tùy chọn bộ nhớ"
@@ -199,15 +450,38 @@ class StorageOption(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.storage}"
     
-    @property
-    def sale_price(self):
+    def save(self, *args, **kwargs):
+        """Tính giá khuyến mãi trước khi lưu."""
+        self.sale_price = self.compute_sale_price()
+        super().save(*args, **kwargs)
+    
+    def compute_sale_price(self, discount_percent=None):
         """Tính giá khuyến mãi dựa trên discount_percent của sản phẩm. Làm tròn về ngàn."""
-        if self.product.discount_percent and float(self.product.discount_percent) > 0:
-            discount = float(self.product.discount_percent)
+        if discount_percent is None:
+            discount_percent = self.product.discount_percent
+        if discount_percent and float(discount_percent) > 0:
+            discount = float(discount_percent)
             raw_price = float(self.original_price) * (100 - discount) / 100
             # Làm tròn về ngàn (chia 1000, làm tròn, nhân lại 1000)
             return int(round(raw_price / 1000) * 1000)
         return self.original_price
+    
+    @classmethod
+    def recompute_sale_prices(cls, queryset=None, batch_size=500):
+        """
+        Tính lại giá khuyến mãi đã lưu cho nhiều tùy chọn bộ nhớ (cập nhật theo lô).
+        Trả về số dòng đã xử lý.
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        options = list(queryset.select_related('product').only(
+            'id', 'original_price', 'sale_price', 'product__discount_percent'
+        ))
+        for option in options:
+            option.sale_price = option.compute_sale_price()
+        cls.objects.bulk_update(options, ['sale_price'], batch_size=batch_size)
+        touch_products(queryset.values('product_id'))
+        return len(options)
 
 
 class ColorOption(models.Model):
@@ -236,6 +510,41 @@ class ColorOption(models.Model):
         return f"{self.product.name} - {self.color_name}"
 
 
+class ProductAttribute(models.Model):
+    """
+    Model cho một thông số kỹ thuật có cấu trúc của sản phẩm.
+    Được tách tự động từ Product.specifications khi lưu (xem spec_utils.py),
+    để lọc/so sánh theo RAM, chip, màn hình, pin... bằng index thay vì LIKE.
+    """
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='attributes',
+        verbose_name="Sản phẩm"
+    )
+    # Key chuẩn, ví dụ 'ram', 'chipset', 'screen' (xem spec_utils.SPEC_KEYS)
+    key = models.CharField(max_length=50, verbose_name="Mã thông số")
+    label = models.CharField(max_length=100, verbose_name="Tên thông số")
+    value = models.CharField(max_length=255, verbose_name="Giá trị")
+    # Giá trị đã chuẩn hóa (bỏ dấu, chữ thường) để so sánh bằng
+    value_text = models.CharField(max_length=255, verbose_name="Giá trị chuẩn hóa")
+    # Giá trị số theo đơn vị của key (GB, inch, mAh...), None nếu không có
+    numeric_value = models.FloatField(null=True, blank=True, verbose_name="Giá trị số")
+    
+    class Meta:
+        verbose_name = "Thông số sản phẩm"
+        verbose_name_plural = "Thông số sản phẩm"
+        indexes = [
+            models.Index(fields=['key', 'numeric_value'], name='shop_attr_key_number_idx'),
+            models.Index(fields=['key', 'value_text'], name='shop_attr_key_text_idx'),
+            models.Index(fields=['product', 'key'], name='shop_attr_product_key_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} - {self.label}: {self.value}"
+
+
 class Review(models.Model):
     """
     Model cho đánh giá và bình luận của khách hàng.
@@ -264,6 +573,10 @@ class Review(models.Model):
     class Meta:
         # Mỗi user chỉ được đánh giá một lần cho mỗi sản phẩm (mỗi lần mua)
         ordering = ['-created_at']
+        indexes = [
+            # Phân trang đánh giá theo sản phẩm (keyset trên created_at, id)
+            models.Index(fields=['product', '-created_at', '-id'], name='shop_review_prod_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.product.name}"
@@ -479,6 +792,16 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật")
     
+    # Tóm tắt giỏ hàng lưu sẵn (badge giỏ hàng không cần duyệt từng sản phẩm),
+    # tính lại bằng refresh_summary() mỗi khi sản phẩm trong giỏ thay đổi
+    item_count = models.PositiveIntegerField(default=0, verbose_name="Tổng số sản phẩm")
+    total_amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=0,
+        default=0,
+        verbose_name="Tổng tiền"
+    )
+    
     class Meta:
         verbose_name = "Giỏ hàng"
         verbose_name_plural = "Giỏ hàng"
@@ -490,13 +813,37 @@ class Cart(models.Model):
     
     @property
     def total_items(self):
-        """Tổng số sản phẩm trong giỏ."""
-        return sum(item.quantity for item in self.items.all())
+        """Tổng số sản phẩm trong giỏ (đã lưu sẵn)."""
+        return self.item_count
     
     @property
     def total_price(self):
-        """Tổng tiền."""
-        return sum(item.subtotal for item in self.items.all())
+        """Tổng tiền (đã lưu sẵn)."""
+        return self.total_amount
+    
+    def refresh_summary(self):
+        """
+        Tính lại tổng số sản phẩm và tổng tiền từ CartItem (1 SELECT + 1 UPDATE).
+        Gọi trong cùng transaction với thay đổi giỏ hàng.
+        Trả về số dòng sản phẩm còn trong giỏ.
+        """
+        totals = self.items.aggregate(
+            lines=models.Count('id'),
+            item_quantity=models.Sum('quantity'),
+            item_amount=models.Sum(models.F('price') * models.F('quantity')),
+        )
+        self.item_count = totals['item_quantity'] or 0
+        self.total_amount = totals['item_amount'] or 0
+        Cart.objects.filter(pk=self.pk).update(
+            item_count=self.item_count,
+            total_amount=self.total_amount,
+            updated_at=timezone.now(),
+        )
+        return totals['lines']
+    
+    def summary(self):
+        """Tóm tắt giỏ hàng dạng dict (lưu trong session, trả về cho badge)."""
+        return {'total_items': self.item_count, 'total_price': int(self.total_amount)}
 
 
 class CartItem(models.Model):
@@ -529,6 +876,13 @@ class CartItem(models.Model):
     class Meta:
         verbose_name = "Sản phẩm trong giỏ hàng"
         verbose_name_plural = "Sản phẩm trong giỏ hàng"
+        constraints = [
+            # Mỗi giỏ chỉ có một dòng cho cùng sản phẩm/bộ nhớ/màu (đích của upsert_lines)
+            models.UniqueConstraint(
+                fields=['cart', 'product', 'storage', 'color'],
+                name='shop_cartitem_line_uniq',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.product.name} - {self.quantity} x {self.price}"
@@ -537,6 +891,77 @@ class CartItem(models.Model):
     def subtotal(self):
         """Thành tiền."""
         return self.price * self.quantity
+    
+    @classmethod
+    def upsert_lines(cls, cart, lines):
+        """
+        Thêm các dòng (product_id, storage, color, quantity, price) vào giỏ; dòng cùng
+        sản phẩm/bộ nhớ/màu đã có thì cộng dồn số lượng (giữ giá cũ). Database hỗ trợ
+        ON CONFLICT (cột) ... RETURNING (PostgreSQL, SQLite >= 3.35) dùng một câu
+        INSERT ... ON CONFLICT DO UPDATE nên hai request thêm cùng lúc không tạo dòng
+        trùng và không mất số lượng; database khác thì INSERT rồi UPDATE F() khi trùng.
+        Trả về danh sách (CartItem sau khi ghi, có phải dòng mới không).
+        """
+        from django.db import IntegrityError, connection, transaction
+        
+        # Gộp trước các dòng trùng trong cùng lần thêm (một câu INSERT không được
+        # cập nhật một dòng hai lần trên PostgreSQL)
+        merged = {}
+        for product_id, storage, color, quantity, price in lines:
+            key = (product_id, storage, color)
+            if key in merged:
+                merged[key][3] += quantity
+            else:
+                merged[key] = [product_id, storage, color, quantity, price]
+        if not merged:
+            return []
+        
+        if connection.vendor in ('sqlite', 'postgresql'):
+            now = connection.ops.adapt_datetimefield_value(timezone.now())
+            table = cls._meta.db_table
+            placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(merged))
+            params = []
+            for product_id, storage, color, quantity, price in merged.values():
+                params += [cart.pk, product_id, storage, color, quantity, price, now]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (cart_id, product_id, storage, color, quantity, price, created_at) '
+                    f'VALUES {placeholders} '
+                    f'ON CONFLICT (cart_id, product_id, storage, color) '
+                    f'DO UPDATE SET quantity = {table}.quantity + excluded.quantity '
+                    f'RETURNING id, product_id, storage, color, quantity, price',
+                    params,
+                )
+                rows = cursor.fetchall()
+        else:
+            rows = []
+            for product_id, storage, color, quantity, price in merged.values():
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(
+                            cart=cart, product_id=product_id, storage=storage,
+                            color=color, quantity=quantity, price=price,
+                        )
+                except IntegrityError:
+                    cls.objects.filter(
+                        cart=cart, product_id=product_id, storage=storage, color=color,
+                    ).update(quantity=models.F('quantity') + quantity)
+            items = cls.objects.filter(cart=cart, product_id__in=[key[0] for key in merged])
+            rows = [
+                (item.id, item.product_id, item.storage, item.color, item.quantity, item.price)
+                for item in items if (item.product_id, item.storage, item.color) in merged
+            ]
+        
+        results = []
+        for item_id, product_id, storage, color, quantity, price in rows:
+            added = merged[(product_id, storage, color)][3]
+            item = cls(
+                id=item_id, cart=cart, product_id=product_id, storage=storage,
+                color=color, quantity=quantity, price=price,
+            )
+            # Dòng đã có luôn có số lượng >= 1 nên sau khi cộng dồn sẽ lớn hơn số vừa thêm
+            results.append((item, quantity == added))
+        return results
 
 
 class Order(models.Model):
@@ -618,6 +1043,10 @@ class Order(models.Model):
         verbose_name = "Đơn hàng"
         verbose_name_plural = "Đơn hàng"
         ordering = ['-created_at']
+        indexes = [
+            # Tra cứu đơn hàng theo user và trạng thái (vd: đơn đã hoàn thành)
+            models.Index(fields=['user', 'status'], name='shop_order_user_status_idx'),
+        ]
     
     def __str__(self):
         return f"Đơn hàng #{self.id} - {self.user.username}"
@@ -655,6 +1084,10 @@ class OrderItem(models.Model):
     class Meta:
         verbose_name = "Sản phẩm trong đơn hàng"
         verbose_name_plural = "Sản phẩm trong đơn hàng"
+        indexes = [
+            # Tìm sản phẩm đã mua nhưng chưa đánh giá
+            models.Index(fields=['product', 'is_reviewed'], name='shop_orderitem_prod_rev_idx'),
+        ]
     
     def __str__(self):
         return f"{self.product_name} x {self.quantity}"
@@ -663,6 +1096,20 @@ class OrderItem(models.Model):
     def subtotal(self):
         """Thành tiền."""
         return self.price * self.quantity
+    
+    @classmethod
+    def get_reviewable_item(cls, user, product_id):
+        """
+        Trả về một order item của user cho sản phẩm này mà chưa được đánh giá
+        (thuộc đơn hàng đã hoàn thành), hoặc None nếu không có.
+        Chỉ dùng một query, dựa trên index (product, is_reviewed) và (user, status).
+        """
+        return cls.objects.filter(
+            product_id=product_id,
+            is_reviewed=False,
+            order__user=user,
+            order__status='completed',
+        ).order_by('id').first()
 
 
 class Feedback(models.Model):
@@ -832,3 +1279,143 @@ class SpecialPromotionProduct(models.Model):
             return int(self.product.original_price * (100 - self.discount_percent) / 100)
         return self.product.sale_price
 
+
+class SearchLog(models.Model):
+    """
+    Model cho một lượt tìm kiếm (để thống kê từ khóa).
+    Được ghi theo lô từ bộ đệm trong bộ nhớ (analytics_utils.py), không ghi
+    ngay trong request; được tổng hợp theo ngày vào SearchQueryDaily.
+    """
+    
+    # Câu tìm kiếm đã chuẩn hóa (bỏ dấu, chữ thường) để gộp các cách gõ
+    query = models.CharField(max_length=200, verbose_name="Từ khóa")
+    corrected_query = models.CharField(max_length=200, blank=True, verbose_name="Từ khóa đã sửa")
+    result_count = models.PositiveIntegerField(default=0, verbose_name="Số kết quả")
+    latency_ms = models.FloatField(default=0, verbose_name="Thời gian xử lý (ms)")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Thời gian")
+    
+    class Meta:
+        verbose_name = "Lượt tìm kiếm"
+        verbose_name_plural = "Lượt tìm kiếm"
+        indexes = [
+            models.Index(fields=['created_at'], name='shop_searchlog_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.query} ({self.result_count} kết quả)"
+
+
+class SearchQueryDaily(models.Model):
+    """
+    Model tổng hợp lượt tìm kiếm theo ngày và từ khóa (từ SearchLog),
+    dùng cho báo cáo từ khóa phổ biến và từ khóa không có kết quả.
+    """
+    
+    date = models.DateField(verbose_name="Ngày")
+    query = models.CharField(max_length=200, verbose_name="Từ khóa")
+    searches = models.PositiveIntegerField(default=0, verbose_name="Số lượt tìm")
+    zero_results = models.PositiveIntegerField(default=0, verbose_name="Số lượt không có kết quả")
+    total_results = models.PositiveIntegerField(default=0, verbose_name="Tổng số kết quả")
+    total_latency_ms = models.FloatField(default=0, verbose_name="Tổng thời gian xử lý (ms)")
+    
+    class Meta:
+        verbose_name = "Thống kê tìm kiếm theo ngày"
+        verbose_name_plural = "Thống kê tìm kiếm theo ngày"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'query'], name='shop_searchdaily_date_query_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} - {self.query}: {self.searches} lượt"
+    
+    @property
+    def avg_latency_ms(self):
+        """Thời gian xử lý trung bình mỗi lượt tìm."""
+        return self.total_latency_ms / self.searches if self.searches else 0
+
+
+
+# Signals để làm mất hiệu lực cache catalog (trang chủ) khi dữ liệu thay đổi
+from django.db.models.signals import post_delete
+
+
+def touch_products(product_ids):
+    """
+    Cập nhật updated_at (version) cho các sản phẩm và làm mất hiệu lực cache catalog.
+    Dùng khi dữ liệu con (ảnh, bộ nhớ, màu) thay đổi mà không gọi Product.save().
+    product_ids: danh sách id hoặc queryset values('...').
+    """
+    from .cache_utils import bump_catalog_version
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=StorageOption)
+@receiver(post_delete, sender=StorageOption)
+@receiver(post_save, sender=ColorOption)
+@receiver(post_delete, sender=ColorOption)
+def touch_product_on_child_change(sender, instance, **kwargs):
+    touch_products([instance.product_id])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+@receiver(post_save, sender=PromotionProduct)
+@receiver(post_delete, sender=PromotionProduct)
+def invalidate_catalog_cache(sender, **kwargs):
+    from .cache_utils import bump_catalog_version
+    bump_catalog_version()
+
+
+# Cache tìm kiếm chỉ mất hiệu lực khi sản phẩm được thêm/xóa hoặc đổi nội dung tìm kiếm
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_search_cache(sender, instance, **kwargs):
+    from .cache_utils import bump_search_version
+    if getattr(instance, '_search_changed', True):
+        bump_search_version()
+
+
+# Catalog / search version chỉ được nhớ trong thread trong lúc xử lý một request (cache_utils.py)
+from django.core.signals import request_finished, request_started
+
+
+@receiver(request_started)
+@receiver(request_finished)
+def forget_versions_between_requests(sender, **kwargs):
+    from .cache_utils import forget_versions
+    forget_versions()
+
+
+# Signals cập nhật chỉ mục gợi ý tìm kiếm trong bộ nhớ (suggest_utils.py)
+@receiver(post_save, sender=Product)
+def update_suggest_index(sender, instance, **kwargs):
+    from django.db import transaction
+    from .suggest_utils import suggest_index
+    transaction.on_commit(lambda: suggest_index.update_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    from django.db import transaction
+    from .suggest_utils import suggest_index
+    product_id = instance.pk
+    transaction.on_commit(lambda: suggest_index.remove_product(product_id))
+
+
+# Tóm tắt giỏ hàng trong session là của giỏ khách (guest) - bỏ đi khi đăng nhập
+# để badge đọc lại từ giỏ hàng của tài khoản. Giỏ hàng của khách được gộp
+# vào giỏ của tài khoản (cart_utils.py)
+from django.contrib.auth.signals import user_logged_in
+
+
+@receiver(user_logged_in)
+def reset_cart_summary_on_login(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        from .cart_utils import CART_SUMMARY_SESSION_KEY, merge_guest_cart
+        request.session.pop(CART_SUMMARY_SESSION_KEY, None)
+        merge_guest_cart(request, user)
@@ -0,0 +1,97 @@
+"""
+Keyset pagination utilities for the shop application.
+Phân trang kiểu keyset (seek) thay cho OFFSET.
+
+Thay vì OFFSET (càng về sau càng chậm vì database phải bỏ qua N dòng),
+mỗi trang lọc theo giá trị của dòng cuối trang trước, ví dụ:
+    created_at < X OR (created_at = X AND id < Y)
+Với index phù hợp, trang thứ N tốn chi phí như trang đầu tiên.
+Vị trí trang được mã hóa thành một chuỗi "cursor" an toàn để đặt trên URL.
+"""
+
+import base64
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    """Mã hóa danh sách giá trị thành cursor (base64 url-safe)."""
+    data = []
+    for value in values:
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            # Giữ nguyên micro giây để so sánh bằng chính xác
+            value = value.isoformat()
+        elif isinstance(value, decimal.Decimal):
+            value = str(value)
+        data.append(value)
+    raw = json.dumps(data, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Giải mã cursor, trả về danh sách giá trị hoặc None nếu cursor không hợp lệ."""
+    if not cursor:
+        return None
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding).decode())
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def keyset_filter(fields, values):
+    """
+    Tạo điều kiện Q lấy các dòng nằm sau vị trí (values) theo thứ tự (fields).
+    fields: danh sách (tên field, giảm dần?)
+    """
+    condition = Q()
+    equal = {}
+    for (name, descending), value in zip(fields, values):
+        lookup = 'lt' if descending else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+
+    # Thêm điều kiện khoảng cho field đầu tiên (thừa về logic) để database
+    # nhảy thẳng tới vị trí cursor trong index, thay vì quét từ đầu index
+    # rồi loại bỏ dần các dòng của những trang trước.
+    if len(fields) > 1:
+        (name, descending), value = fields[0], values[0]
+        condition &= Q(**{f'{name}__{"lte" if descending else "gte"}': value})
+    return condition
+
+
+def keyset_paginate(queryset, ordering, cursor=None, limit=20):
+    """
+    Lấy một trang của queryset theo keyset pagination.
+
+    ordering: ví dụ ['-created_at', '-id']. Field cuối cùng phải là duy nhất
+    (thường là id) và các field không được NULL.
+    Trả về (danh sách đối tượng, cursor trang sau hoặc None nếu đã hết).
+    """
+    fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+    model_fields = [queryset.model._meta.get_field(name) for name, _ in fields]
+    queryset = queryset.order_by(*ordering)
+
+    values = decode_cursor(cursor)
+    if values is not None and len(values) == len(fields):
+        try:
+            values = [field.to_python(value) for field, value in zip(model_fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            # Cursor bị sửa tay (sai kiểu dữ liệu) thì quay về trang đầu
+            values = None
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(fields, values))
+
+    # Lấy thừa 1 dòng để biết còn trang sau hay không (không cần COUNT)
+    items = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, field.attname) for field in model_fields])
+    return items, next_cursor
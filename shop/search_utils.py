@@ -0,0 +1,285 @@
+"""
+Search utilities for the shop application.
+Tìm kiếm sản phẩm bằng chỉ mục full-text FTS5 của SQLite.
+
+Product.search_text lưu sẵn văn bản đã chuẩn hóa (bỏ dấu tiếng Việt,
+"đ" -> "d", chữ thường, gộp khoảng trắng) của hãng, tên, mô tả và thông số,
+nên khách gõ "dien thoai" vẫn tìm thấy "Điện thoại" mà không phải
+biến đổi từng dòng lúc truy vấn.
+
+Bảng ảo shop_product_fts đánh chỉ mục name, brand (để ưu tiên khi xếp hạng)
+và search_text của Product (external content, không lưu thêm bản sao dữ liệu),
+được đồng bộ bằng trigger trong database, nên cả queryset.update() hay
+bulk_update() cũng được cập nhật. Kết quả xếp theo độ liên quan BM25.
+
+Với database không phải SQLite (hoặc SQLite không có FTS5) thì tìm
+bằng contains trên cột search_text.
+
+Danh sách id kết quả được giữ trong SearchResultCache (LRU có TTL, trong
+bộ nhớ của process) theo câu tìm kiếm đã chuẩn hóa, nên các từ khóa phổ biến
+("iphone", "samsung") không phải chạy lại FTS. Cache bị xóa khi search
+version đổi (Product được thêm/xóa hoặc đổi nội dung tìm kiếm, xem cache_utils.py).
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.db import connection
+
+from .cache_utils import bump_search_version, get_search_version
+
+
+FTS_TABLE = 'shop_product_fts'
+
+# Số kết quả tối đa của một lần tìm kiếm
+SEARCH_MAX_RESULTS = 1000
+
+# Trọng số BM25 theo thứ tự cột: name, brand, search_text
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Số danh sách kết quả tối đa trong cache và thời gian sống (giây) của mỗi danh sách
+SEARCH_CACHE_SIZE = 500
+SEARCH_CACHE_TTL = 5 * 60
+
+# Tạo bảng FTS5, trigger đồng bộ và nạp dữ liệu sẵn có
+FTS_SETUP_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, brand, search_text,
+        content='shop_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON shop_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, brand, search_text)
+        VALUES (new.id, new.name, new.brand, new.search_text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON shop_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, brand, search_text)
+        VALUES ('delete', old.id, old.name, old.brand, old.search_text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF name, brand, search_text ON shop_product
+    WHEN old.name IS NOT new.name OR old.brand IS NOT new.brand
+        OR old.search_text IS NOT new.search_text
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, brand, search_text)
+        VALUES ('delete', old.id, old.name, old.brand, old.search_text);
+        INSERT INTO {FTS_TABLE}(rowid, name, brand, search_text)
+        VALUES (new.id, new.name, new.brand, new.search_text);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+FTS_DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+_fts_available = None
+
+
+def fts_available():
+    """Database hiện tại có bảng FTS5 của sản phẩm không (kiểm tra một lần)."""
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available
+
+
+def rebuild_fts_index():
+    """Xóa và tạo lại bảng FTS5, trigger, rồi nạp lại toàn bộ dữ liệu."""
+    global _fts_available
+    with connection.cursor() as cursor:
+        for sql in FTS_DROP_SQL + FTS_SETUP_SQL:
+            cursor.execute(sql)
+    _fts_available = None
+    bump_search_version()
+
+
+def normalize_search_text(text):
+    """
+    Chuẩn hóa văn bản để tìm kiếm: bỏ dấu tiếng Việt, "đ" -> "d",
+    chữ thường, gộp khoảng trắng. Ví dụ: "Điện  Thoại" -> "dien thoai".
+    """
+    text = unicodedata.normalize('NFD', text or '')
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    text = text.replace('đ', 'd').replace('Đ', 'D').lower()
+    return ' '.join(text.split())
+
+
+def search_tokens(query):
+    """Tách chuỗi người dùng nhập thành các từ đã chuẩn hóa."""
+    return re.findall(r'\w+', normalize_search_text(query))
+
+
+def build_fts_query(query):
+    """
+    Chuyển chuỗi người dùng nhập thành biểu thức MATCH của FTS5.
+    Mỗi từ được đặt trong dấu nháy (tránh lỗi cú pháp FTS), các từ nối với nhau
+    bằng AND; riêng từ cuối tìm theo tiền tố vì người dùng có thể đang gõ dở.
+    Trả về '' nếu không có từ nào.
+    """
+    tokens = [f'"{token}"' for token in search_tokens(query)]
+    if tokens:
+        tokens[-1] += '*'
+    return ' '.join(tokens)
+
+
+def fts_search_ids(query, limit=SEARCH_MAX_RESULTS):
+    """Tìm bằng FTS5, trả về danh sách id sản phẩm theo độ liên quan giảm dần."""
+    match = build_fts_query(query)
+    if not match:
+        return []
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def like_search_ids(query, limit=SEARCH_MAX_RESULTS):
+    """
+    Tìm bằng contains trên cột search_text (dùng khi không có FTS5).
+    Mọi từ phải xuất hiện; so sánh trên dữ liệu đã chuẩn hóa sẵn nên không cần
+    biến đổi từng dòng (không dùng UPPER/LOWER như icontains).
+    """
+    from .models import Product
+
+    tokens = search_tokens(query)
+    if not tokens:
+        return []
+    products = Product.objects.all()
+    for token in tokens:
+        products = products.filter(search_text__contains=token)
+    return list(products.order_by('-created_at', '-id').values_list('id', flat=True)[:limit])
+
+
+def search_product_ids(query, limit=SEARCH_MAX_RESULTS):
+    """Tìm sản phẩm, trả về danh sách id theo độ liên quan (tối đa limit kết quả)."""
+    query = query.strip()
+    if not query:
+        return []
+    if fts_available():
+        return fts_search_ids(query, limit)
+    return like_search_ids(query, limit)
+
+
+class SearchResultCache:
+    """
+    Cache LRU có TTL cho danh sách id kết quả tìm kiếm (trong bộ nhớ của process).
+    Giữ tối đa max_size danh sách, mỗi danh sách sống tối đa ttl giây, và bị xóa
+    toàn bộ khi search version đổi. Có bộ đếm hit/miss để chọn kích thước phù hợp.
+    """
+
+    def __init__(self, max_size=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()    # key -> (hết hạn lúc, tuple id), cũ nhất ở đầu
+        self.version = None
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Đặt lại các bộ đếm."""
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0        # miss do danh sách đã quá TTL
+        self.evictions = 0      # danh sách bị đẩy ra vì cache đầy
+        self.invalidations = 0  # số lần xóa toàn bộ do search version đổi
+
+    def _check_version(self):
+        version = get_search_version()
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    def get(self, key):
+        """Lấy danh sách id đã cache (None nếu chưa có hoặc đã hết hạn)."""
+        with self.lock:
+            self._check_version()
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self.entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def set(self, key, ids):
+        """Lưu danh sách id (dạng tuple để tốn ít bộ nhớ hơn list)."""
+        with self.lock:
+            self._check_version()
+            self.entries[key] = (time.monotonic() + self.ttl, tuple(ids))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_set(self, key, compute):
+        """Lấy danh sách id từ cache, chưa có thì gọi compute() rồi lưu lại."""
+        ids = self.get(key)
+        if ids is None:
+            ids = list(compute())
+            self.set(key, ids)
+        return ids
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Các bộ đếm của cache (dùng để chọn SEARCH_CACHE_SIZE / SEARCH_CACHE_TTL)."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+# Cache kết quả tìm kiếm dùng chung trong process
+search_result_cache = SearchResultCache()
+
+
+def search_cache_key(query):
+    """Key cache của một câu tìm kiếm: các từ đã chuẩn hóa ("iPhone  15" và "iphone 15" trùng key)."""
+    return ' '.join(search_tokens(query))
+
+
+def cached_search_product_ids(query, limit=SEARCH_MAX_RESULTS):
+    """Như search_product_ids nhưng lấy từ search_result_cache nếu đã có."""
+    key = search_cache_key(query)
+    if not key:
+        return []
+    return search_result_cache.get_or_set(('ids', key, limit), lambda: search_product_ids(query, limit))
@@ -0,0 +1,143 @@
+"""
+Specification utilities for the shop application.
+Tách thông số kỹ thuật dạng văn bản (Product.specifications) thành các
+thuộc tính có cấu trúc (ProductAttribute) để lọc/so sánh bằng index.
+
+Mỗi dòng dạng "- Tên thông số: giá trị" là một thuộc tính, ví dụ
+"- RAM: 8GB" -> key 'ram', giá trị '8GB', số 8. Tên thông số được chuẩn hóa
+(bỏ dấu, chữ thường) rồi ánh xạ về key chuẩn qua SPEC_KEY_ALIASES, nên
+"Màn hình" và "Man hinh" cùng là 'screen'. Thông số không có trong bảng
+vẫn được lưu với key tạo từ tên (ví dụ "Cong ket noi" -> 'cong_ket_noi').
+"""
+
+import re
+
+from .search_utils import normalize_search_text
+
+
+# Key chuẩn -> (nhãn hiển thị, đơn vị của giá trị số hoặc None)
+SPEC_KEYS = {
+    'screen': ('Màn hình', 'inch'),
+    'chipset': ('Chip', None),
+    'ram': ('RAM', 'GB'),
+    'storage': ('Bộ nhớ trong', 'GB'),
+    'main_camera': ('Camera chính', 'MP'),
+    'front_camera': ('Camera trước', 'MP'),
+    'battery': ('Pin', 'mAh'),
+    'charging': ('Sạc', 'W'),
+    'weight': ('Trọng lượng', 'g'),
+    'os': ('Hệ điều hành', None),
+}
+
+# Tên thông số (đã chuẩn hóa) -> key chuẩn
+SPEC_KEY_ALIASES = {
+    'man hinh': 'screen',
+    'kich thuoc man hinh': 'screen',
+    'chip': 'chipset',
+    'chipset': 'chipset',
+    'cpu': 'chipset',
+    'vi xu ly': 'chipset',
+    'ram': 'ram',
+    'bo nho trong': 'storage',
+    'rom': 'storage',
+    'camera chinh': 'main_camera',
+    'camera sau': 'main_camera',
+    'camera truoc': 'front_camera',
+    'pin': 'battery',
+    'dung luong pin': 'battery',
+    'sac': 'charging',
+    'sac nhanh': 'charging',
+    'trong luong': 'weight',
+    'khoi luong': 'weight',
+    'he dieu hanh': 'os',
+}
+
+# Độ dài tối đa (khớp với các field của ProductAttribute)
+SPEC_KEY_LENGTH = 50
+SPEC_VALUE_LENGTH = 255
+
+SPEC_LINE_RE = re.compile(r'^\s*[-*•+]?\s*([^:]{1,100}?)\s*:\s*(.+?)\s*$')
+NUMBER_RE = r'(\d+(?:[.,]\d+)?)'
+
+
+def normalize_spec_key(label):
+    """Chuẩn hóa tên thông số thành key: 'Màn hình' -> 'screen', 'Cổng sạc' -> 'cong_sac'."""
+    text = normalize_search_text(label)
+    if text in SPEC_KEY_ALIASES:
+        return SPEC_KEY_ALIASES[text]
+    return re.sub(r'\W+', '_', text).strip('_')[:SPEC_KEY_LENGTH]
+
+
+def parse_spec_number(key, value):
+    """
+    Lấy giá trị số của một thuộc tính theo đơn vị của key (None nếu không có).
+    RAM/bộ nhớ quy ra GB (1TB = 1024GB); nhiều mức bộ nhớ thì lấy mức nhỏ nhất,
+    nhiều mức công suất sạc thì lấy mức lớn nhất.
+    """
+    unit = SPEC_KEYS.get(key, (None, None))[1]
+    if unit is None:
+        return None
+
+    if unit == 'GB':
+        sizes = [
+            float(number.replace(',', '.')) * (1024 if size_unit.upper() == 'TB' else 1)
+            for number, size_unit in re.findall(NUMBER_RE + r'\s*(GB|TB)', value, re.IGNORECASE)
+        ]
+        return min(sizes) if sizes else None
+
+    if unit == 'inch':
+        pattern = NUMBER_RE + r'\s*(?:inch|in\b|")'
+    elif unit == 'g':
+        pattern = NUMBER_RE + r'\s*(?:g|gram)\b'
+    else:
+        pattern = NUMBER_RE + r'\s*' + unit + r'\b'
+    numbers = [float(number.replace(',', '.')) for number in re.findall(pattern, value, re.IGNORECASE)]
+    if not numbers:
+        return None
+    return max(numbers) if key == 'charging' else numbers[0]
+
+
+def parse_specifications(text):
+    """
+    Tách văn bản thông số thành danh sách dict
+    {'key', 'label', 'value', 'value_text', 'numeric_value'}.
+    Mỗi key chỉ lấy dòng đầu tiên; dòng không có dạng "tên: giá trị" bị bỏ qua.
+    """
+    attributes = []
+    seen = set()
+    for line in (text or '').splitlines():
+        match = SPEC_LINE_RE.match(line)
+        if not match:
+            continue
+        label, value = match.groups()
+        key = normalize_spec_key(label)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        attributes.append({
+            'key': key,
+            'label': label[:100],
+            'value': value[:SPEC_VALUE_LENGTH],
+            'value_text': normalize_search_text(value)[:SPEC_VALUE_LENGTH],
+            'numeric_value': parse_spec_number(key, value),
+        })
+    return attributes
+
+
+def attribute_product_ids(key, value=None, min_value=None, max_value=None):
+    """
+    Subquery id sản phẩm có thuộc tính key thỏa điều kiện, dùng trong
+    filter(id__in=...). value so sánh với giá trị đã chuẩn hóa (ví dụ chip),
+    min_value/max_value so sánh với giá trị số (ví dụ RAM >= 8).
+    Đều dùng index (key, value_text) / (key, numeric_value) của ProductAttribute.
+    """
+    from .models import ProductAttribute
+
+    attributes = ProductAttribute.objects.filter(key=key)
+    if value is not None:
+        attributes = attributes.filter(value_text=normalize_search_text(value))
+    if min_value is not None:
+        attributes = attributes.filter(numeric_value__gte=min_value)
+    if max_value is not None:
+        attributes = attributes.filter(numeric_value__lte=max_value)
+    return attributes.values('product_id')
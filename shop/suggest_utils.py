@@ -0,0 +1,144 @@
+"""
+Autocomplete utilities for the shop application.
+Gợi ý tìm kiếm (typeahead) từ chỉ mục tiền tố trong bộ nhớ.
+
+Chỉ mục là một mảng khóa đã sắp xếp (tìm bằng bisect), mỗi khóa là phần
+đuôi của "hãng + tên" đã chuẩn hóa bắt đầu từ một từ, ví dụ sản phẩm
+"Apple iPhone 15 Pro" có các khóa "apple iphone 15 pro", "iphone 15 pro",
+"15 pro", "pro". Nhờ vậy gõ "15 p" cũng ra iPhone 15 Pro. Mỗi khóa trỏ tới
+danh sách id sản phẩm (khóa trùng nhau giữa các sản phẩm chỉ lưu một lần).
+
+Chỉ mục được tạo khi dùng lần đầu và cập nhật từng sản phẩm qua signal
+của Product (xem models.py), nên tra cứu không cần truy vấn SQLite.
+Mỗi process có chỉ mục riêng: thay đổi ở process khác (hoặc qua
+queryset.update()) sẽ được thấy sau khi chỉ mục quá SUGGEST_MAX_AGE và
+được tạo lại.
+"""
+
+import bisect
+import sys
+import threading
+import time
+
+from .search_utils import normalize_search_text
+
+
+# Số gợi ý tối đa mỗi lần
+SUGGEST_LIMIT = 8
+
+# Tuổi tối đa của chỉ mục (giây) trước khi tạo lại toàn bộ
+SUGGEST_MAX_AGE = 15 * 60
+
+# Độ dài tối đa của một khóa (đủ cho gợi ý, tiết kiệm bộ nhớ)
+SUGGEST_KEY_LENGTH = 40
+
+
+def suggest_keys(brand, name):
+    """Các khóa tiền tố của một sản phẩm: phần đuôi của "hãng + tên" bắt đầu từ mỗi từ."""
+    words = normalize_search_text(f'{brand} {name}').split()
+    return {' '.join(words[i:])[:SUGGEST_KEY_LENGTH] for i in range(len(words))}
+
+
+class SuggestIndex:
+    """Chỉ mục tiền tố trong bộ nhớ cho gợi ý tìm kiếm."""
+
+    def __init__(self):
+        self.keys = []          # các khóa đã sắp xếp
+        self.postings = {}      # khóa -> danh sách id sản phẩm
+        self.products = {}      # id -> (tên hiển thị, hãng, giá bán)
+        self.built_at = None
+        self.lock = threading.Lock()
+
+    def build(self):
+        """Tạo lại toàn bộ chỉ mục từ database (một truy vấn)."""
+        from .models import Product
+
+        postings = {}
+        products = {}
+        rows = Product.objects.order_by().values_list('id', 'brand', 'name', 'sale_price')
+        for product_id, brand, name, sale_price in rows.iterator(chunk_size=2000):
+            # Tên hãng lặp lại rất nhiều - intern để chỉ giữ một bản trong bộ nhớ
+            products[product_id] = (name, sys.intern(brand), int(sale_price))
+            for key in suggest_keys(brand, name):
+                postings.setdefault(key, []).append(product_id)
+
+        with self.lock:
+            self.keys = sorted(postings)
+            self.postings = postings
+            self.products = products
+            self.built_at = time.monotonic()
+
+    def ensure_built(self):
+        """Tạo chỉ mục khi dùng lần đầu hoặc khi đã quá SUGGEST_MAX_AGE."""
+        if self.built_at is None or time.monotonic() - self.built_at > SUGGEST_MAX_AGE:
+            self.build()
+
+    def _remove_keys(self, product_id, keys):
+        for key in keys:
+            ids = self.postings.get(key)
+            if ids is None or product_id not in ids:
+                continue
+            ids.remove(product_id)
+            if not ids:
+                del self.postings[key]
+                position = bisect.bisect_left(self.keys, key)
+                if position < len(self.keys) and self.keys[position] == key:
+                    del self.keys[position]
+
+    def update_product(self, product):
+        """Cập nhật một sản phẩm (thêm mới hoặc đổi tên/hãng/giá)."""
+        if self.built_at is None:
+            return
+        with self.lock:
+            old = self.products.get(product.pk)
+            if old is not None:
+                self._remove_keys(product.pk, suggest_keys(old[1], old[0]))
+            self.products[product.pk] = (product.name, sys.intern(product.brand), int(product.sale_price))
+            for key in suggest_keys(product.brand, product.name):
+                ids = self.postings.get(key)
+                if ids is None:
+                    self.postings[key] = [product.pk]
+                    bisect.insort(self.keys, key)
+                elif product.pk not in ids:
+                    ids.append(product.pk)
+
+    def remove_product(self, product_id):
+        """Xóa một sản phẩm khỏi chỉ mục."""
+        if self.built_at is None:
+            return
+        with self.lock:
+            old = self.products.pop(product_id, None)
+            if old is not None:
+                self._remove_keys(product_id, suggest_keys(old[1], old[0]))
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        """
+        Trả về tối đa limit sản phẩm có một khóa bắt đầu bằng query (đã chuẩn hóa),
+        dạng danh sách (id, tên, hãng, giá bán), theo thứ tự chữ cái của khóa.
+        """
+        prefix = normalize_search_text(query)[:SUGGEST_KEY_LENGTH]
+        if not prefix:
+            return []
+        self.ensure_built()
+
+        keys = self.keys
+        position = bisect.bisect_left(keys, prefix)
+        matches = []
+        seen = set()
+        while position < len(keys) and len(matches) < limit:
+            key = keys[position]
+            if not key.startswith(prefix):
+                break
+            for product_id in self.postings.get(key, ()):
+                product = self.products.get(product_id)
+                if product is not None and product_id not in seen:
+                    seen.add(product_id)
+                    matches.append((product_id, *product))
+                    if len(matches) == limit:
+                        break
+            position += 1
+        return matches
+
+
+# Chỉ mục dùng chung trong process
+suggest_index = SuggestIndex()
@@ -0,0 +1,488 @@
+"""
+Tests for the shop application.
+Kiểm tra các phần dễ bị hỏng khi sửa về sau: tham số URL bị sửa tay, số truy vấn
+của các trang quan trọng, upsert giỏ hàng.
+"""
+
+import base64
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import Cart, CartItem, Order, OrderItem, Product, Review, StorageOption
+
+
+def make_product(**kwargs):
+    """Tạo một sản phẩm tối thiểu cho test."""
+    fields = {
+        'brand': 'Samsung',
+        'name': 'Galaxy Test',
+        'main_image': 'products/test.jpg',
+        'description': 'Mô tả',
+        'specifications': '- RAM: 8GB',
+        'original_price': 10000000,
+        'sale_price': 9000000,
+    }
+    fields.update(kwargs)
+    return Product.objects.create(**fields)
+
+
+def raw_cursor(values):
+    """Cursor dạng base64 chứa danh sách giá trị tùy ý (giống cursor bị sửa tay)."""
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+class ReviewCursorTests(TestCase):
+    """Cursor sai kiểu dữ liệu trên /product/<id>/reviews/ quay về trang đầu thay vì lỗi 500."""
+
+    def setUp(self):
+        self.product = make_product()
+        user = User.objects.create_user('reviewer', password='pw12345!')
+        Review.objects.create(product=self.product, user=user, comment='Tốt')
+
+    def test_wrong_typed_cursor_falls_back_to_first_page(self):
+        url = f'/product/{self.product.id}/reviews/'
+        for cursor in (raw_cursor([1, 2]), raw_cursor([[1], {'a': 1}]), raw_cursor(['khong-phai-ngay', 1]), 'khong-phai-base64'):
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 200, cursor)
+            self.assertEqual(response.json()['count'], 1, cursor)
+
+
+class ReviewStatsTests(TestCase):
+    """Thống kê đánh giá cập nhật khi thêm/xóa đánh giá khớp với rebuild_review_stats()."""
+
+    def setUp(self):
+        self.product = make_product()
+        self.user = User.objects.create_user('buyer', password='pw12345!')
+        order = Order.objects.create(
+            user=self.user, full_name='Nguyễn Văn A', phone='0900000000', address='1 Lê Lợi',
+            status='completed', subtotal=9000000, total=9000000,
+        )
+        self.item = OrderItem.objects.create(
+            order=order, product=self.product, product_name=self.product.name, quantity=1, price=9000000,
+        )
+        self.client.force_login(self.user)
+
+    def add_review(self):
+        return self.client.post(f'/product/{self.product.id}/review/', {'comment': 'Máy dùng rất tốt, pin trâu'})
+
+    def assert_stats_match_rebuild(self, review_count):
+        self.product.refresh_from_db()
+        stats = (self.product.review_count, self.product.last_reviewed_at)
+        Product.rebuild_review_stats([self.product.id])
+        self.product.refresh_from_db()
+        self.assertEqual(stats, (self.product.review_count, self.product.last_reviewed_at))
+        self.assertEqual(self.product.review_count, review_count)
+
+    def test_add_and_delete_review(self):
+        self.add_review()
+        review = Review.objects.get(product=self.product)
+        self.assert_stats_match_rebuild(1)
+        self.assertEqual(self.product.last_reviewed_at, review.created_at)
+
+        admin = User.objects.create_user('staff', password='pw12345!', is_staff=True)
+        self.client.force_login(admin)
+        self.client.post(f'/qhun22/reviews/{review.id}/delete/')
+        self.assertFalse(Review.objects.exists())
+        self.assert_stats_match_rebuild(0)
+        self.assertIsNone(self.product.last_reviewed_at)
+
+    def test_failed_review_leaves_stats_unchanged(self):
+        # Lỗi khi đánh dấu order item: đánh giá và thống kê cùng bị rollback
+        with mock.patch.object(OrderItem, 'save', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.add_review()
+        self.assertFalse(Review.objects.exists())
+        self.assert_stats_match_rebuild(0)
+
+
+class ProductDetailQueryTests(TestCase):
+    """Số truy vấn của trang chi tiết sản phẩm không tăng theo số đánh giá."""
+
+    def setUp(self):
+        self.product = make_product()
+        self.url = f'/product/{self.product.id}/'
+        self.user = User.objects.create_user('viewer', password='pw12345!')
+
+    def get_detail(self):
+        # Render lại từ đầu, không lấy trang/fragment đã cache
+        cache.clear()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_depend_on_review_count(self):
+        for login in (False, True):
+            with self.subTest(login=login):
+                Review.objects.all().delete()
+                if login:
+                    self.client.force_login(self.user)
+                with CaptureQueriesContext(connection) as queries:
+                    self.get_detail()
+
+                for i in range(5):
+                    reviewer = User.objects.create_user(f'reviewer{login:d}{i}', password='pw12345!')
+                    Review.objects.create(product=self.product, user=reviewer, comment=f'Đánh giá {i}')
+                with self.assertNumQueries(len(queries)):
+                    self.get_detail()
+
+
+class ProductSearchTests(TestCase):
+    """Tìm kiếm dùng bảng FTS5 (tạo bằng migration) và xếp hạng BM25."""
+
+    def setUp(self):
+        from .analytics_utils import search_log_buffer
+        from .search_utils import search_result_cache
+
+        search_result_cache.clear()
+        # Lượt tìm kiếm được ghi trong transaction của test (không chờ atexit)
+        self.addCleanup(search_log_buffer.flush)
+        # Từ khóa có trong tên (trọng số cao) và chỉ có trong mô tả (trọng số thấp).
+        # Sản phẩm mới hơn đứng sau: thứ tự không trùng với LIKE (mới nhất trước)
+        self.in_name = make_product(brand='Sony', name='Xperia 10 VI')
+        self.in_description = make_product(name='Điện thoại A', description='Bản nâng cấp của dòng Xperia')
+
+    def test_fts_table_is_used(self):
+        from .search_utils import fts_available
+
+        self.assertTrue(fts_available())
+
+    def test_bm25_ranks_name_matches_first(self):
+        from .search_utils import fts_search_ids
+
+        self.assertEqual(fts_search_ids('xperia'), [self.in_name.id, self.in_description.id])
+        # Bỏ dấu và tìm theo tiền tố từ cuối
+        self.assertEqual(fts_search_ids('dien tho'), [self.in_description.id])
+
+    def test_search_page_orders_by_relevance(self):
+        response = self.client.get('/products/search/', {'q': 'Xperia'})
+        self.assertEqual([product.id for product in response.context['products']],
+                         [self.in_name.id, self.in_description.id])
+
+    def test_save_updates_index_through_trigger(self):
+        from .search_utils import fts_search_ids
+
+        self.in_name.name = 'Walkman NW-A306'
+        self.in_name.save()
+        self.assertEqual(fts_search_ids('walkman'), [self.in_name.id])
+        self.assertEqual(fts_search_ids('xperia'), [self.in_description.id])
+
+        self.in_description.delete()
+        self.assertEqual(fts_search_ids('xperia'), [])
+
+    def fts_changes(self, product):
+        """Lưu sản phẩm, trả về số dòng bị thay đổi (trigger FTS cũng được tính)."""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT total_changes()')
+            before = cursor.fetchone()[0]
+            product.save()
+            cursor.execute('SELECT total_changes()')
+            return cursor.fetchone()[0] - before
+
+    def test_unrelated_update_keeps_search_index(self):
+        from .cache_utils import get_search_version
+        from .search_utils import search_result_cache
+
+        product = Product.objects.get(pk=self.in_name.pk)
+        search_text = product.search_text
+        search_result_cache.set('xperia', [product.id])
+        version = get_search_version()
+
+        product.stock_quantity = 7
+        # Chỉ ghi dòng shop_product, trigger FTS không chạy
+        self.assertEqual(self.fts_changes(product), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.search_text, search_text)
+        self.assertEqual(get_search_version(), version)
+        self.assertEqual(search_result_cache.get('xperia'), [product.id])
+
+        product.brand = 'Sony Mobile'
+        # Dòng shop_product + các dòng của bảng FTS
+        self.assertGreater(self.fts_changes(product), 1)
+        self.assertNotEqual(product.search_text, search_text)
+        self.assertNotEqual(get_search_version(), version)
+        self.assertIsNone(search_result_cache.get('xperia'))
+
+
+class CatalogPriceFilterTests(TestCase):
+    """Giá lọc không hợp lệ (NaN, Infinity, số âm, chữ) bị bỏ qua thay vì lỗi 500."""
+
+    def test_parse_price_rejects_non_finite_values(self):
+        from .catalog_utils import parse_price
+
+        for value in ('NaN', 'nan', 'sNaN', 'Infinity', '-Infinity', 'inf', '-1', 'abc', ''):
+            self.assertIsNone(parse_price(value), value)
+        self.assertEqual(parse_price('1.500.000'), 1500000)
+
+    def test_catalog_ignores_non_finite_prices(self):
+        make_product()
+        for value in ('NaN', 'Infinity', '-Infinity', 'sNaN'):
+            response = self.client.get('/products/', {'min_price': value, 'max_price': value})
+            self.assertEqual(response.status_code, 200, value)
+            self.assertEqual(len(response.context['products']), 1, value)
+
+
+class CartStorageFlowTests(TestCase):
+    """Cùng một luồng thêm / sửa / xóa / tóm tắt cho mọi backend giỏ hàng của khách."""
+
+    def setUp(self):
+        self.phone = make_product()
+        self.other = make_product(name='Galaxy Khác', sale_price=5000000)
+
+    def summary(self, client):
+        summary = client.get('/cart/summary/').json()
+        return summary['total_items'], int(summary['total_price'])
+
+    def lines(self, client):
+        cart = client.get('/cart/').context['cart']
+        return {item.product_id: (item.id, item.quantity) for item in cart.items.all()}
+
+    def test_add_update_remove_summary(self):
+        for backend in ('cookie', 'session', 'database'):
+            with self.subTest(backend=backend), override_settings(CART_STORAGE=backend):
+                client = self.client_class()
+                client.post(f'/cart/add/{self.phone.id}/', {'quantity': 1})
+                client.post(f'/cart/add/{self.phone.id}/', {'quantity': 2})
+                client.post(f'/cart/add/{self.other.id}/', {'quantity': 1})
+                lines = self.lines(client)
+                self.assertEqual({product_id: quantity for product_id, (item_id, quantity) in lines.items()},
+                                 {self.phone.id: 3, self.other.id: 1})
+                self.assertEqual(self.summary(client), (4, 3 * 9000000 + 5000000))
+
+                client.post(f'/cart/update/{lines[self.phone.id][0]}/', {'quantity': 5})
+                self.assertEqual(self.summary(client), (6, 5 * 9000000 + 5000000))
+
+                response = client.post(f'/cart/remove/{lines[self.other.id][0]}/').json()
+                self.assertEqual((response['remaining_count'], response['total_items']), (1, 5))
+                self.assertEqual(self.summary(client), (5, 5 * 9000000))
+                # Chỉ backend 'database' tạo Cart cho khách
+                self.assertEqual(Cart.objects.filter(user__isnull=True).exists(), backend == 'database')
+                Cart.objects.all().delete()
+
+    def test_incomplete_backend_cannot_be_created(self):
+        from django.test import RequestFactory
+
+        from .cart_utils import GuestCartStorage
+
+        class NoSaveCartStorage(GuestCartStorage):
+            def load_data(self):
+                return None
+
+        with self.assertRaises(TypeError):
+            NoSaveCartStorage(RequestFactory().get('/'))
+
+
+class CheckoutRepriceTests(TestCase):
+    """Giá trong giỏ được cập nhật theo giá hiện tại khi thanh toán."""
+
+    def setUp(self):
+        self.product = make_product()
+        self.storage = StorageOption.objects.create(product=self.product, storage='256GB', original_price=12000000)
+        # Tùy chọn trùng tên tạo sau không được dùng (cart_add lấy tùy chọn đầu tiên)
+        StorageOption.objects.create(product=self.product, storage='256GB', original_price=1000)
+        self.user = User.objects.create_user('checkout', password='pw12345!')
+        self.client.force_login(self.user)
+        self.client.post(f'/cart/add/{self.product.id}/', {'quantity': 1})
+        self.client.post(f'/cart/add/{self.product.id}/', {'quantity': 2, 'storage': '256GB'})
+        self.cart = Cart.objects.get(user=self.user)
+
+    def prices(self):
+        return dict(self.cart.items.values_list('storage', 'price'))
+
+    def change_prices(self):
+        self.product.sale_price = 8500000
+        self.product.save()
+        self.storage.original_price = 11000000
+        self.storage.save()
+
+    def test_checkout_writes_current_prices_to_cart(self):
+        self.assertEqual(self.prices(), {'': 9000000, '256GB': 12000000})
+        self.change_prices()
+
+        response = self.client.get('/checkout/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.prices(), {'': 8500000, '256GB': 11000000})
+        self.assertEqual(response.context['subtotal'], 8500000 + 2 * 11000000)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total_amount, 8500000 + 2 * 11000000)
+
+    def test_place_order_with_stale_price_redirects_to_checkout(self):
+        self.client.get('/checkout/')
+        self.change_prices()
+
+        response = self.client.post('/checkout/place-order/', {
+            'full_name': 'Nguyễn Văn A', 'phone': '0900000000', 'address': '1 Lê Lợi', 'payment_method': 'cod',
+        }, follow=True)
+        self.assertRedirects(response, '/checkout/')
+        self.assertFalse(Order.objects.exists())
+        self.assertIn('vừa thay đổi', ' '.join(str(message) for message in response.context['messages']))
+        self.assertEqual(self.prices(), {'': 8500000, '256GB': 11000000})
+
+
+class GuestCartMergeTests(TestCase):
+    """Client.login() (request không có .user) gộp giỏ của khách vào giỏ của tài khoản."""
+
+    def setUp(self):
+        self.product = make_product()
+        self.user = User.objects.create_user('buyer', password='pw12345!')
+        cart = Cart.objects.create(user=self.user)
+        CartItem.upsert_lines(cart, [(self.product.id, '', '', 1, self.product.sale_price)])
+
+    def test_login_merges_guest_cart(self):
+        for backend in ('session', 'database'):
+            with self.subTest(backend=backend), override_settings(CART_STORAGE=backend):
+                self.client.logout()
+                CartItem.objects.filter(cart__user=self.user).update(quantity=1)
+                self.client.post(f'/cart/add/{self.product.id}/', {'quantity': 2})
+
+                self.assertTrue(self.client.login(username='buyer', password='pw12345!'))
+                quantities = list(CartItem.objects.filter(cart__user=self.user).values_list('quantity', flat=True))
+                self.assertEqual(quantities, [3])
+                self.assertFalse(Cart.objects.filter(user__isnull=True).exists())
+
+
+class ConditionalGetTests(TestCase):
+    """Khách đã có trang (ETag / Last-Modified) nhận 304 mà gần như không tốn truy vấn."""
+
+    def test_catalog_pages_return_304(self):
+        product = make_product()
+        for url in ('/products/', f'/product/{product.id}/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            validators = {
+                'HTTP_IF_NONE_MATCH': response['ETag'],
+                'HTTP_IF_MODIFIED_SINCE': response['Last-Modified'],
+            }
+            for headers in ({'HTTP_IF_NONE_MATCH': validators['HTTP_IF_NONE_MATCH']},
+                            {'HTTP_IF_MODIFIED_SINCE': validators['HTTP_IF_MODIFIED_SINCE']},
+                            validators):
+                with self.subTest(url=url, headers=list(headers)):
+                    with self.assertNumQueries(0):
+                        response = self.client.get(url, **headers)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+
+
+class SessionCacheTests(TestCase):
+    """Session đọc từ cache dùng chung giữa các worker, không truy vấn django_session mỗi request."""
+
+    def setUp(self):
+        self.product = make_product()
+        self.user = User.objects.create_user('member', password='pw12345!')
+        self.client.force_login(self.user)
+        self.client.post(f'/cart/add/{self.product.id}/', {'quantity': 2})
+
+    def test_cart_badge_reads_session_without_queries(self):
+        # Worker khác: LocMemCache ('default') của nó trống
+        cache.clear()
+        with self.assertNumQueries(0):
+            response = self.client.get('/cart/summary/')
+        self.assertEqual(response.json()['total_items'], 2)
+
+    def test_logout_is_visible_to_other_workers(self):
+        from django.contrib.sessions.backends.cached_db import KEY_PREFIX
+        from django.core.cache import caches
+
+        session_key = self.client.session.session_key
+        self.assertIsNotNone(caches['sessions'].get(KEY_PREFIX + session_key))
+        self.assertIsNone(cache.get(KEY_PREFIX + session_key))
+
+        self.client.logout()
+        self.assertIsNone(caches['sessions'].get(KEY_PREFIX + session_key))
+        response = self.client.get('/cart/summary/')
+        self.assertEqual(response.json()['total_items'], 0)
+
+
+class CatalogVersionTests(TestCase):
+    """Catalog version nằm trong cache dùng chung, không trong LocMemCache của từng process."""
+
+    def test_bump_is_visible_without_local_cache(self):
+        from .cache_utils import bump_catalog_version, forget_versions, get_catalog_version
+
+        version = bump_catalog_version()
+        # Process khác (worker web, management command) có LocMemCache riêng, trống
+        cache.clear()
+        forget_versions()
+        self.assertEqual(get_catalog_version(), version)
+
+    def test_version_is_read_once_per_request(self):
+        from . import cache_utils
+
+        make_product()
+        self.client.get('/')
+        with mock.patch.object(cache_utils, 'read_version', wraps=cache_utils.read_version) as read:
+            self.client.get('/products/')
+            self.assertEqual(read.call_args_list, [mock.call(cache_utils.CATALOG_VERSION_KEY)])
+            self.client.get('/products/')
+            self.assertEqual(read.call_count, 2)
+
+
+class HomePageCacheTests(TestCase):
+    """Trang chủ khi cache đã ấm không truy vấn database cho dữ liệu catalog."""
+
+    def setUp(self):
+        make_product()
+        cache.clear()
+
+    def test_warm_anonymous_home_page_makes_no_queries(self):
+        # Lần đầu render và lưu cache toàn trang
+        self.assertEqual(self.client.get('/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertContains(response, 'Galaxy Test')
+
+    def test_warm_home_sections_make_no_catalog_queries(self):
+        user = User.objects.create_user('shopper', password='pw12345!')
+        self.client.force_login(user)
+        self.client.get('/')
+        # Người dùng đã đăng nhập không dùng cache toàn trang: chỉ còn truy vấn session/user
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        self.assertContains(response, 'Galaxy Test')
+        catalog_queries = [query['sql'] for query in queries if 'shop_' in query['sql']]
+        self.assertEqual(catalog_queries, [])
+
+
+class CartUpsertTests(TestCase):
+    """CartItem.upsert_lines cộng dồn vào dòng đã có thay vì tạo dòng trùng."""
+
+    def setUp(self):
+        self.product = make_product()
+        self.cart = Cart.objects.create(session_key='upsert-test')
+
+    def add(self, quantity, price=9000000):
+        return CartItem.upsert_lines(self.cart, [(self.product.id, '128GB', 'Đen', quantity, price)])
+
+    def assert_single_line(self, quantity):
+        lines = list(self.cart.items.values_list('quantity', 'price'))
+        self.assertEqual(lines, [(quantity, 9000000)])
+
+    def test_same_line_twice_sums_quantity(self):
+        [(item, created)] = self.add(1)
+        self.assertTrue(created)
+        # Lần thêm sau giữ giá lúc thêm vào giỏ lần đầu
+        [(item, created)] = self.add(2, price=8000000)
+        self.assertFalse(created)
+        self.assertEqual(item.quantity, 3)
+        self.assert_single_line(3)
+
+    def test_duplicate_lines_in_one_call_are_merged(self):
+        line = (self.product.id, '128GB', 'Đen', 1, 9000000)
+        [(item, created)] = CartItem.upsert_lines(self.cart, [line, line])
+        self.assertTrue(created)
+        self.assert_single_line(2)
+
+    def test_fallback_without_on_conflict(self):
+        from django.db import DatabaseError, connection
+
+        # Database không có INSERT ... RETURNING (SQLite < 3.35, MySQL): INSERT rồi UPDATE F() khi trùng
+        with mock.patch.object(connection.features, 'can_return_columns_from_insert', False):
+            self.add(1)
+            [(item, created)] = self.add(2)
+        self.assertFalse(created)
+        self.assert_single_line(3)
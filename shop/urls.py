@@ -4,6 +4,9 @@ Cấu hình URL cho ứng dụng shop.
 
 Các trang:
 - / : Trang chủ (danh sách sản phẩm)
+- /products/ : Danh sách sản phẩm (lọc theo hãng, giá, sắp xếp, phân trang)
+- /products/search/ : Tìm kiếm sản phẩm
+- /api/search/suggest/ : API gợi ý tìm kiếm (typeahead)
 - /product/<id>/ : Trang chi tiết sản phẩm
 - /login/ : Trang đăng nhập
 - /register/ : Trang đăng ký
@@ -14,6 +17,9 @@ Các trang:
 - /manage/add-product/ : Trang thêm sản phẩm (chỉ admin)
 - /manage/edit/<id>/ : Trang chỉnh sửa sản phẩm (chỉ admin)
 - /manage/delete/<id>/ : Xóa sản phẩm (chỉ admin)
+- /manage/search-cache/ : API thống kê cache kết quả tìm kiếm (chỉ admin)
+- /manage/search-report/ : Thống kê từ khóa tìm kiếm (chỉ admin)
+- /product/<id>/reviews/ : API tải thêm đánh giá (theo trang)
 - /product/<id>/review/ : Xử lý thêm đánh giá
 - /product/<id>/coupon/ : Xử lý áp dụng mã giảm giá
 """
@@ -25,12 +31,21 @@ urlpatterns = [
     # Trang chủ
     path('', views.home, name='home'),
 
+    # Danh sách sản phẩm (lọc, sắp xếp, phân trang)
+    path('products/', views.product_list, name='product_list'),
+
     # Tìm kiếm sản phẩm
     path('products/search/', views.product_search, name='product_search'),
+
+    # API gợi ý tìm kiếm (typeahead)
+    path('api/search/suggest/', views.search_suggest, name='search_suggest'),
     
     # Trang chi tiết sản phẩm
     path('product/<int:product_id>/', views.product_detail, name='product_detail'),
     
+    # API tải thêm đánh giá (keyset pagination)
+    path('product/<int:product_id>/reviews/', views.product_reviews, name='product_reviews'),
+    
     # Xử lý thêm đánh giá
     path('product/<int:product_id>/review/', views.add_review, name='add_review'),
     
@@ -61,8 +76,15 @@ urlpatterns = [
     # Xóa sản phẩm (chỉ admin)
     path('manage/delete/<int:product_id>/', views.admin_delete_product, name='admin_delete_product'),
     
+    # Thống kê cache kết quả tìm kiếm (chỉ admin)
+    path('manage/search-cache/', views.admin_search_cache_stats, name='admin_search_cache_stats'),
+    
+    # Thống kê từ khóa tìm kiếm (chỉ admin)
+    path('manage/search-report/', views.admin_search_report, name='admin_search_report'),
+    
     # Giỏ hàng
     path('cart/', views.cart_detail, name='cart_detail'),
+    path('cart/summary/', views.cart_summary, name='cart_summary'),
     path('cart/add/<int:product_id>/', views.cart_add, name='cart_add'),
     path('cart/update/<int:item_id>/', views.cart_update, name='cart_update'),
     path('cart/update-all/', views.cart_update_all, name='cart_update_all'),
@@ -5,6 +5,8 @@ Các view cho ứng dụng bán điện thoại.
 Các view sử dụng function-based views để dễ hiểu cho sinh viên.
 """
 
+import time
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse, HttpResponseRedirect
 from django.urls import reverse
@@ -13,83 +15,181 @@ from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, condition
+from django.views.decorators.cache import never_cache, cache_control
+from django.db import transaction
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
 
 from .models import Product, Review, Coupon, ProductImage, StorageOption, ColorOption, Cart, CartItem, ShippingAddress, Order, OrderItem, UserProfile, UserVoucher, Feedback, Promotion, PromotionProduct
 from .forms import RegistrationForm, ReviewForm, CouponForm
-
-
+from .cache_utils import get_home_sections, get_catalog_brands, catalog_etag, catalog_last_modified, anonymous_page_cache
+from .pagination_utils import keyset_paginate
+from .catalog_utils import (
+    CATALOG_SORTS, RELEVANCE_SORT, RELEVANCE_LABEL,
+    get_catalog_filters, get_catalog_page, get_ranked_page,
+)
+from .search_utils import cached_search_product_ids, search_result_cache
+from .suggest_utils import suggest_index
+from .fuzzy_utils import correct_query
+from .analytics_utils import record_search, get_search_report, rollup_search_logs, search_log_buffer
+from .facet_utils import get_facet_counts, build_facet_groups, get_brand_logo_row
+from .cart_utils import (
+    CART_SUMMARY_SESSION_KEY, GUEST_CART_MAX_LINES, get_cart_storage, get_or_create_cart,
+    reprice_cart_items, update_cart_summary,
+)
+
+
+@anonymous_page_cache
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
 def home(request):
     """
     Trang chủ - Hiển thị danh sách sản phẩm.
     Mỗi sản phẩm hiển thị: ảnh chính, tên, giá gốc (gạch ngang), giá khuyến mãi, phần trăm giảm giá.
+    Dữ liệu các section được cache theo catalog version (xem cache_utils.py).
     """
-    # Lấy tối đa 15 sản phẩm, sắp xếp theo ngày tạo mới nhất
-    products = Product.objects.all().order_by('-created_at')[:15]
-
-    # Lấy sản phẩm khuyến mãi đặc biệt từ Promotion model
-    special_promotions = []
-    show_promotion = False
-    
-    # Lấy hoặc tạo promotion config
-    promotion, created = Promotion.objects.get_or_create(id=1)
-    
-    if promotion.is_active:
-        show_promotion = True
-        max_products = promotion.max_products or 5
-        # Lấy sản phẩm từ PromotionProduct
-        promo_products = promotion.promotion_products.select_related('product')[:max_products]
-        for promo_product in promo_products:
-            product = promo_product.product
-            # Tính phần trăm giảm giá từ giá gốc và giá bán
-            if product.original_price > 0 and product.sale_price < product.original_price:
-                discount_percent = int((product.original_price - product.sale_price) / product.original_price * 100)
-            else:
-                discount_percent = int(product.discount_percent) if product.discount_percent else 0
-            
-            special_promotions.append({
-                'product': product,
-                'discount_percent': discount_percent,
-                'discounted_price': product.sale_price,
-            })
+    sections = get_home_sections()
 
     context = {
-        'products': products,
-        'show_promotion': show_promotion,
-        'special_promotions': special_promotions,
-        'promotion': promotion,
+        'brand_logos': get_brand_logo_row(),
+        'products': sections['products'],
+        'show_promotion': sections['show_promotion'],
+        'special_promotions': sections['special_promotions'],
+        'promotion': sections['promotion'],
         'page_title': 'Trang chủ - Cửa hàng điện thoại',
     }
 
     return render(request, 'home/index.html', context)
 
 
+def render_catalog_page(request, queryset, context, ranked_ids=None):
+    """
+    Render trang danh sách sản phẩm (dùng chung cho danh sách và tìm kiếm):
+    áp dụng bộ lọc, sắp xếp, lấy một trang theo cursor, đếm số lượng theo
+    từng giá trị bộ lọc và tạo link trang sau.
+    ranked_ids: danh sách id theo độ liên quan (khi tìm kiếm), cho phép sắp xếp "Liên quan nhất".
+    """
+    filters = get_catalog_filters(request, allow_relevance=ranked_ids is not None)
+    cursor = request.GET.get('cursor')
+    if filters['sort'] == RELEVANCE_SORT:
+        products, next_cursor = get_ranked_page(
+            queryset, ranked_ids, filters, cursor, query=context.get('search_query', ''),
+        )
+    else:
+        products, next_cursor = get_catalog_page(queryset, filters, cursor)
+
+    # Link trang sau/trang đầu giữ nguyên các tham số lọc hiện tại
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    first_page_url = f'{request.path}?{params.urlencode()}' if params else request.path
+    next_page_url = None
+    if next_cursor:
+        params['cursor'] = next_cursor
+        next_page_url = f'{request.path}?{params.urlencode()}'
+
+    sort_options = [(key, label) for key, (ordering, label) in CATALOG_SORTS.items()]
+    if ranked_ids is not None:
+        sort_options.insert(0, (RELEVANCE_SORT, RELEVANCE_LABEL))
+
+    # Số lượng theo từng giá trị bộ lọc - tính từ chỉ mục bitmap, không COUNT từng giá trị
+    facets = build_facet_groups(request, filters, get_facet_counts(filters, ranked_ids))
+
+    context.update({
+        'products': products,
+        'facets': facets,
+        'filters': filters,
+        'brands': get_catalog_brands(),
+        'sort_options': sort_options,
+        'is_first_page': not cursor,
+        'first_page_url': first_page_url,
+        'next_page_url': next_page_url,
+    })
+    return render(request, 'product/list.html', context)
+
+
+@anonymous_page_cache
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+def product_list(request):
+    """
+    Trang danh sách sản phẩm.
+    Lọc theo hãng, khoảng giá; sắp xếp theo mới nhất, giá, mức giảm giá; phân trang keyset.
+    """
+    context = {
+        'query': '',
+        'page_title': 'Danh sách sản phẩm - PhoneShop',
+    }
+    return render_catalog_page(request, Product.objects.all(), context)
+
+
+@anonymous_page_cache
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
 def product_search(request):
     """
     Trang tìm kiếm sản phẩm.
-    Tìm kiếm theo tên, hãng, mô tả.
+    Tìm kiếm theo tên, hãng, mô tả, thông số bằng chỉ mục FTS5 (xem search_utils.py),
+    mặc định sắp xếp theo độ liên quan; dùng chung bộ lọc và phân trang với trang danh sách.
+    Danh sách id kết quả được cache theo câu tìm kiếm đã chuẩn hóa (search_result_cache).
+    Không có kết quả thì thử sửa lỗi chính tả (fuzzy_utils.py) và tìm lại.
+    Mỗi lượt tìm (trang đầu) được ghi vào bộ đệm thống kê (analytics_utils.py).
     """
+    started = time.perf_counter()
     query = request.GET.get('q', '').strip()
 
-    if not query:
-        products = Product.objects.all()[:12]  # Hiển thị 12 sản phẩm mặc định
-    else:
-        # Tìm kiếm theo tên, hãng hoặc mô tả
-        products = Product.objects.filter(
-            models.Q(name__icontains=query) |
-            models.Q(brand__icontains=query) |
-            models.Q(description__icontains=query)
-        ).distinct()
+    products = Product.objects.all()
+    ranked_ids = None
+    search_query = query
+    corrected_query = ''
+    if query:
+        ranked_ids = cached_search_product_ids(query)
+        if not ranked_ids:
+            corrected_query = correct_query(query)
+            if corrected_query:
+                search_query = corrected_query
+                ranked_ids = cached_search_product_ids(corrected_query)
+        products = products.filter(id__in=ranked_ids)
 
     context = {
-        'products': products,
         'query': query,
+        'search_query': search_query,
+        'corrected_query': corrected_query,
         'page_title': f'Tìm kiếm: {query} - PhoneShop' if query else 'Tìm kiếm sản phẩm',
     }
+    response = render_catalog_page(request, products, context, ranked_ids)
+
+    # Chỉ tính lượt tìm ở trang đầu (trang sau là cùng một lượt tìm)
+    if query and not request.GET.get('cursor'):
+        # Lưu kèm response để middleware cache toàn trang vẫn ghi nhận khi trả trang từ cache
+        response.search_log = {
+            'query': query,
+            'result_count': len(ranked_ids),
+            'corrected_query': corrected_query,
+        }
+        record_search(latency_ms=(time.perf_counter() - started) * 1000, **response.search_log)
+    return response
 
-    return render(request, 'home/index.html', context)
+
+@cache_control(public=True, max_age=60)
+def search_suggest(request):
+    """
+    API gợi ý tìm kiếm cho ô tìm kiếm (typeahead).
+    Tra trong chỉ mục tiền tố trong bộ nhớ (suggest_utils.py), không truy vấn database.
+    """
+    query = request.GET.get('q', '').strip()
+    suggestions = [
+        {
+            'id': product_id,
+            'name': name,
+            'brand': brand,
+            'price': price,
+            'url': reverse('product_detail', args=[product_id]),
+        }
+        for product_id, name, brand, price in suggest_index.suggest(query)
+    ]
+    return JsonResponse({'query': query, 'suggestions': suggestions})
 
 
+@anonymous_page_cache
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
 def product_detail(request, product_id):
     """
     Trang chi tiết sản phẩm.
@@ -101,11 +201,25 @@ def product_detail(request, product_id):
     - Mã giảm giá
     - Đánh giá của khách hàng
     """
-    # Lấy sản phẩm theo ID, nếu không có trả về 404
-    product = get_object_or_404(Product, id=product_id)
+    # Lấy sản phẩm và toàn bộ dữ liệu liên quan trong một lượt (số query cố định)
+    product = get_object_or_404(
+        Product.objects.prefetch_related(
+            Prefetch('images', queryset=ProductImage.objects.order_by('id')),
+            Prefetch('storage_options', queryset=StorageOption.objects.order_by('id')),
+            Prefetch('color_options', queryset=ColorOption.objects.order_by('id')),
+        ),
+        id=product_id,
+    )
+    
+    # Dùng dữ liệu đã prefetch, template không cần truy vấn thêm
+    images = list(product.images.all())
+    storage_options = list(product.storage_options.all())
+    color_options = list(product.color_options.all())
     
-    # Lấy tất cả đánh giá của sản phẩm này
-    reviews = product.reviews.all()
+    # Chỉ render trang đánh giá đầu tiên, các trang sau tải bằng AJAX (product_reviews)
+    reviews, reviews_next_cursor = get_review_page(product)
+    first_storage = storage_options[0] if storage_options else None
+    first_color = color_options[0] if color_options else None
     
     # Xử lý form đánh giá (chỉ khi user đã đăng nhập VÀ đã mua sản phẩm)
     review_form = None
@@ -113,25 +227,13 @@ def product_detail(request, product_id):
     has_purchased = False
     
     if request.user.is_authenticated:
-        # Kiểm tra xem user đã mua sản phẩm này chưa (đơn hàng đã hoàn thành)
-        user_completed_orders = Order.objects.filter(
-            user=request.user,
-            status='completed'
-        ).prefetch_related('items')
-        
-        # Tìm các order items chưa được đánh giá
-        purchasable_items = []
-        for order in user_completed_orders:
-            for item in order.items.all():
-                if item.product and item.product.id == product_id and not item.is_reviewed:
-                    purchasable_items.append(item)
-        
-        has_purchased = len(purchasable_items) > 0
+        # Kiểm tra xem user đã mua sản phẩm này chưa (đơn hàng đã hoàn thành và chưa đánh giá)
+        has_purchased = OrderItem.get_reviewable_item(request.user, product_id) is not None
         
         # Kiểm tra xem user có thể đánh giá không (đã mua và chưa đánh giá)
         if has_purchased:
             # Kiểm tra user đã đánh giá sản phẩm này chưa
-            user_has_reviewed = reviews.filter(user=request.user).exists()
+            user_has_reviewed = product.reviews.filter(user=request.user).exists()
             if not user_has_reviewed:
                 review_form = ReviewForm()
                 can_review = True
@@ -141,7 +243,13 @@ def product_detail(request, product_id):
     
     context = {
         'product': product,
+        'images': images,
+        'storage_options': storage_options,
+        'color_options': color_options,
+        'first_storage': first_storage,
+        'first_color': first_color,
         'reviews': reviews,
+        'reviews_next_cursor': reviews_next_cursor,
         'review_form': review_form,
         'coupon_form': coupon_form,
         'can_review': can_review,
@@ -152,6 +260,37 @@ def product_detail(request, product_id):
     return render(request, 'product/detail.html', context)
 
 
+# Số đánh giá mỗi trang (trang chi tiết và API tải thêm)
+REVIEWS_PAGE_SIZE = 10
+
+
+def get_review_page(product, cursor=None):
+    """
+    Lấy một trang đánh giá của sản phẩm (mới nhất trước) bằng keyset pagination.
+    Trả về (danh sách đánh giá, cursor trang sau hoặc None).
+    """
+    reviews = Review.objects.filter(product=product).select_related('user')
+    return keyset_paginate(reviews, ['-created_at', '-id'], cursor, REVIEWS_PAGE_SIZE)
+
+
+def product_reviews(request, product_id):
+    """
+    API - Lấy trang đánh giá tiếp theo của sản phẩm (dùng cho cuộn tải thêm).
+    Trả về JSON gồm đoạn HTML đã render và cursor của trang sau.
+    """
+    product = get_object_or_404(Product.objects.only('id'), id=product_id)
+    reviews, next_cursor = get_review_page(product, request.GET.get('cursor'))
+    
+    html = render_to_string('product/reviews_page.html', {'reviews': reviews}, request=request)
+    
+    return JsonResponse({
+        'html': html,
+        'count': len(reviews),
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    })
+
+
 @require_POST
 def add_review(request, product_id):
     """
@@ -166,18 +305,9 @@ def add_review(request, product_id):
         return redirect('product_detail', product_id=product_id)
     
     # Kiểm tra user đã mua sản phẩm này chưa (đơn hàng đã hoàn thành và chưa đánh giá)
-    user_completed_orders = Order.objects.filter(
-        user=request.user,
-        status='completed'
-    ).prefetch_related('items')
-    
-    purchasable_items = []
-    for order in user_completed_orders:
-        for item in order.items.all():
-            if item.product and item.product.id == product_id and not item.is_reviewed:
-                purchasable_items.append(item)
+    purchased_item = OrderItem.get_reviewable_item(request.user, product_id)
     
-    if not purchasable_items:
+    if purchased_item is None:
         messages.error(request, 'Bạn cần mua sản phẩm này trước khi đánh giá.')
         return redirect('product_detail', product_id=product_id)
     
@@ -193,13 +323,15 @@ def add_review(request, product_id):
         review.user = request.user
         # Xử lý checkbox is_anonymous
         review.is_anonymous = 'is_anonymous' in request.POST
-        review.save()
-        
-        # Đánh dấu một order item là đã đánh giá
-        # (mỗi lần mua chỉ được đánh giá 1 lần)
-        if purchasable_items:
-            purchasable_items[0].is_reviewed = True
-            purchasable_items[0].save()
+        # Đánh giá, thống kê của sản phẩm và order item được lưu cùng một transaction
+        with transaction.atomic():
+            review.save()
+            product.record_review_added(review)
+            
+            # Đánh dấu một order item là đã đánh giá
+            # (mỗi lần mua chỉ được đánh giá 1 lần)
+            purchased_item.is_reviewed = True
+            purchased_item.save(update_fields=['is_reviewed'])
         
         messages.success(request, 'Cảm ơn bạn đã đánh giá sản phẩm!')
     else:
@@ -801,6 +933,43 @@ def admin_dashboard(request):
     return render(request, 'admin/qhun22.html', context)
 
 
+@user_passes_test(is_admin)
+def admin_search_report(request):
+    """
+    Trang thống kê tìm kiếm (admin): từ khóa phổ biến và từ khóa không có kết quả
+    trong 7/30 ngày gần nhất, đọc từ bảng tổng hợp theo ngày (SearchQueryDaily).
+    POST: ghi các lượt đang chờ trong bộ đệm và tổng hợp lại số liệu hôm nay.
+    """
+    from django.utils import timezone
+
+    if request.method == 'POST':
+        search_log_buffer.flush()
+        rollup_search_logs(timezone.localdate())
+        messages.success(request, 'Đã cập nhật số liệu tìm kiếm hôm nay.')
+        return redirect('admin_search_report')
+
+    days = 30 if request.GET.get('days') == '30' else 7
+    context = {
+        'report': get_search_report(days),
+        'cache_stats': search_result_cache.stats(),
+        'page_title': 'Thống kê tìm kiếm - Admin',
+    }
+    return render(request, 'admin/search_report.html', context)
+
+
+@user_passes_test(is_admin)
+@never_cache
+def admin_search_cache_stats(request):
+    """
+    API thống kê cache kết quả tìm kiếm của process đang xử lý request
+    (hit rate, số lần bị đẩy ra...) để chọn SEARCH_CACHE_SIZE / SEARCH_CACHE_TTL.
+    Gửi POST để đặt lại các bộ đếm.
+    """
+    if request.method == 'POST':
+        search_result_cache.reset_stats()
+    return JsonResponse(search_result_cache.stats())
+
+
 @user_passes_test(is_admin)
 def admin_product_list(request):
     """
@@ -1052,35 +1221,30 @@ def admin_delete_product(request, product_id):
 # GIỎ HÀNG (CART)
 # =====================
 
-def get_or_create_cart(request):
+@never_cache
+def cart_summary(request):
     """
-    Lấy hoặc tạo giỏ hàng cho user hiện tại.
-    Hỗ cả user đã đăng nhập và guest (session).
+    API trả về số sản phẩm và tổng tiền trong giỏ hàng (badge giỏ hàng trên header).
+    Badge được tải bằng JS để HTML các trang catalog không phụ thuộc vào từng khách
+    và có thể cache toàn trang. Tóm tắt được lấy từ session / cookie giỏ hàng
+    (không truy vấn giỏ hàng, xem cart_utils.py).
     """
-    if request.user.is_authenticated:
-        # User đã đăng nhập - dùng user object
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        # Xóa cart theo session nếu có
-        if request.session.get('cart_session_key'):
-            Cart.objects.filter(session_key=request.session['cart_session_key']).delete()
-    else:
-        # Guest - dùng session
-        session_key = request.session.session_key
-        if not session_key:
-            request.session.create()
-            session_key = request.session.session_key
-        
-        cart, created = Cart.objects.get_or_create(session_key=session_key)
-    
-    return cart
+    # Tóm tắt đã có trong session thì trả về luôn (không cần tải user)
+    summary = request.session.get(CART_SUMMARY_SESSION_KEY)
+    if summary is None:
+        summary = get_cart_storage(request).summary()
+    return JsonResponse(summary)
 
 
 def cart_detail(request):
     """
     Trang xem giỏ hàng.
     Mỗi lần vào trang giỏ hàng, luôn bắt đầu với trạng thái TRỐNG (không coupon).
+    Tóm tắt giỏ hàng được tính lại ở đây (phòng khi sản phẩm trong giỏ bị xóa từ nơi khác).
     """
-    cart = get_or_create_cart(request)
+    cart_storage = get_cart_storage(request)
+    cart_storage.refresh()
+    cart = cart_storage.cart
     
     # KHÔNG BAO GIỜ giữ coupon khi vào lại trang - LUÔN reset
     # Xóa coupon và selected_items khỏi session mỗi khi vào trang giỏ hàng
@@ -1112,7 +1276,7 @@ def cart_add(request, product_id):
     Thêm sản phẩm vào giỏ hàng.
     """
     product = get_object_or_404(Product, id=product_id)
-    cart = get_or_create_cart(request)
+    cart_storage = get_cart_storage(request)
     
     # Lấy dữ liệu từ form
     storage = request.POST.get('storage', '')
@@ -1129,29 +1293,14 @@ def cart_add(request, product_id):
     else:
         price = product.sale_price
     
-    # Kiểm tra sản phẩm đã có trong giỏ chưa (cùng product, storage, color)
-    existing_item = cart.items.filter(
-        product=product,
-        storage=storage,
-        color=color
-    ).first()
-    
-    if existing_item:
-        # Cập nhật số lượng
-        existing_item.quantity += quantity
-        existing_item.save()
-        messages.success(request, f'Đã cập nhật số lượng {product.name}')
-    else:
-        # Tạo mới
-        CartItem.objects.create(
-            cart=cart,
-            product=product,
-            storage=storage,
-            color=color,
-            quantity=quantity,
-            price=price
-        )
+    # Cộng dồn số lượng nếu sản phẩm đã có trong giỏ (cùng product, storage, color)
+    item, created = cart_storage.add(product, storage, color, quantity, price)
+    if item is None:
+        messages.warning(request, f'Giỏ hàng chỉ chứa tối đa {GUEST_CART_MAX_LINES} sản phẩm, vui lòng đăng nhập để thêm tiếp.')
+    elif created:
         messages.success(request, f'Đã thêm {product.name} vào giỏ hàng')
+    else:
+        messages.success(request, f'Đã cập nhật số lượng {product.name}')
     
     return redirect('cart_detail')
 
@@ -1161,17 +1310,15 @@ def cart_update(request, item_id):
     """
     Cập nhật số lượng sản phẩm trong giỏ hàng.
     """
-    cart = get_or_create_cart(request)
-    item = get_object_or_404(CartItem, id=item_id, cart=cart)
+    cart_storage = get_cart_storage(request)
+    item = cart_storage.get_item(item_id)
     
     quantity = int(request.POST.get('quantity', 1))
     
+    cart_storage.set_quantity(item, quantity)
     if quantity > 0:
-        item.quantity = quantity
-        item.save()
         messages.success(request, 'Đã cập nhật giỏ hàng')
     else:
-        item.delete()
         messages.success(request, 'Đã xóa sản phẩm khỏi giỏ hàng')
     
     return redirect('cart_detail')
@@ -1182,22 +1329,19 @@ def cart_remove(request, item_id):
     """
     Xóa sản phẩm khỏi giỏ hàng (AJAX).
     """
-    cart = get_or_create_cart(request)
-    item = get_object_or_404(CartItem, id=item_id, cart=cart)
+    cart_storage = get_cart_storage(request)
+    item = cart_storage.get_item(item_id)
     
     product_name = item.product.name
-    item.delete()
-    
-    # Tính lại tổng
-    remaining_items = cart.items.all()
-    new_subtotal = sum(i.subtotal for i in remaining_items)
-    new_count = remaining_items.count()
+    cart_storage.remove([item.id])
+    summary = cart_storage.summary()
     
     return JsonResponse({
         'success': True,
         'message': f'Đã xóa {product_name} khỏi giỏ hàng',
-        'remaining_count': new_count,
-        'subtotal': new_subtotal
+        'remaining_count': cart_storage.line_count,
+        'subtotal': summary['total_price'],
+        'total_items': summary['total_items'],
     })
 
 
@@ -1205,31 +1349,42 @@ def cart_clear(request):
     """
     Xóa tất cả sản phẩm trong giỏ hàng (AJAX).
     """
-    cart = get_or_create_cart(request)
-    cart.items.all().delete()
+    get_cart_storage(request).clear()
     
     return JsonResponse({
         'success': True,
         'message': 'Đã xóa toàn bộ giỏ hàng',
         'remaining_count': 0,
-        'subtotal': 0
+        'subtotal': 0,
+        'total_items': 0,
     })
 
 
 @require_POST
 def cart_update_all(request):
     """
-    Cập nhật số lượng cho tất cả sản phẩm trong giỏ.
+    Cập nhật số lượng cho tất cả sản phẩm trong giỏ (field quantity_<id dòng>,
+    số lượng <= 0 thì xóa dòng). Số câu lệnh không phụ thuộc số dòng trong giỏ.
+    Request AJAX nhận lại tổng mới dạng JSON.
     """
-    cart = get_or_create_cart(request)
+    quantities = {}
+    for key, value in request.POST.items():
+        item_id = key[len('quantity_'):]
+        if key.startswith('quantity_') and item_id.isdigit():
+            quantities[int(item_id)] = int(value)
     
-    for item in cart.items.all():
-        quantity = int(request.POST.get(f'quantity_{item.id}', item.quantity))
-        if quantity > 0:
-            item.quantity = quantity
-            item.save()
-        else:
-            item.delete()
+    cart_storage = get_cart_storage(request)
+    cart_storage.set_quantities(quantities)
+    
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        summary = cart_storage.summary()
+        return JsonResponse({
+            'success': True,
+            'message': 'Đã cập nhật giỏ hàng',
+            'remaining_count': cart_storage.line_count,
+            'subtotal': summary['total_price'],
+            'total_items': summary['total_items'],
+        })
     
     messages.success(request, 'Đã cập nhật giỏ hàng')
     return redirect('cart_detail')
@@ -1240,11 +1395,10 @@ def cart_remove_bulk(request):
     """
     Xóa nhiều sản phẩm đã chọn khỏi giỏ hàng.
     """
-    cart = get_or_create_cart(request)
     selected_items = request.POST.getlist('selected_items')
     
     if selected_items:
-        deleted_count = cart.items.filter(id__in=selected_items).delete()[0]
+        deleted_count = get_cart_storage(request).remove(selected_items)
         messages.success(request, f'Đã xóa {deleted_count} sản phẩm đã chọn')
     else:
         messages.warning(request, 'Vui lòng chọn sản phẩm cần xóa')
@@ -1277,13 +1431,16 @@ def checkout_view(request):
         # Nếu không có session, lấy tất cả
         selected_items = list(cart.items.values_list('id', flat=True))
     
-    # Lọc các sản phẩm được chọn
-    cart_items = cart.items.filter(id__in=selected_items)
+    # Lọc các sản phẩm được chọn, cập nhật theo giá hiện tại (1 truy vấn)
+    cart_items, repriced_items = reprice_cart_items(request, cart, cart.items.filter(id__in=selected_items))
     
-    if not cart_items.exists():
+    if not cart_items:
         messages.warning(request, 'Vui lòng chọn sản phẩm để thanh toán.')
         return redirect('cart_detail')
     
+    if repriced_items:
+        messages.info(request, f'Giá của {len(repriced_items)} sản phẩm đã thay đổi kể từ khi thêm vào giỏ, tổng tiền đã được cập nhật.')
+    
     # Tính tổng tiền
     subtotal = sum(item.subtotal for item in cart_items)
     
@@ -1300,7 +1457,7 @@ def checkout_view(request):
     if coupon_code:
         coupon = Coupon.objects.filter(code=coupon_code, is_active=True).first()
         if coupon:
-            product_count = cart_items.count()
+            product_count = len(cart_items)
             # Kiểm tra giới hạn sản phẩm
             if coupon.max_product_limit > 0 and product_count > coupon.max_product_limit:
                 # Xóa coupon khỏi session
@@ -1343,12 +1500,18 @@ def checkout_place_order(request):
     if not selected_items:
         selected_items = list(cart.items.values_list('id', flat=True))
     
-    cart_items = cart.items.filter(id__in=selected_items)
+    # Cập nhật theo giá hiện tại (1 truy vấn)
+    cart_items, repriced_items = reprice_cart_items(request, cart, cart.items.filter(id__in=selected_items))
     
-    if not cart_items.exists():
+    if not cart_items:
         messages.warning(request, 'Không có sản phẩm để thanh toán.')
         return redirect('cart_detail')
     
+    # Giá đổi sau khi khách xem trang thanh toán: cho khách xem lại tổng tiền mới trước khi đặt
+    if repriced_items:
+        messages.warning(request, f'Giá của {len(repriced_items)} sản phẩm vừa thay đổi, vui lòng kiểm tra lại tổng tiền trước khi đặt hàng.')
+        return redirect('checkout')
+    
     # Lấy thông tin từ form
     full_name = request.POST.get('full_name', '').strip()
     phone = request.POST.get('phone', '').strip()
@@ -1397,7 +1560,7 @@ def checkout_place_order(request):
                 messages.error(request, 'Bạn đã sử dụng voucher này rồi!')
                 return redirect('cart_detail')
             
-            product_count = cart_items.count()
+            product_count = len(cart_items)
             # Kiểm tra giới hạn sản phẩm
             if coupon.max_product_limit > 0 and product_count > coupon.max_product_limit:
                 # Xóa coupon khỏi session và chuyển về giỏ hàng
@@ -1445,7 +1608,9 @@ def checkout_place_order(request):
         )
     
     # Xóa sản phẩm đã đặt khỏi giỏ hàng
-    cart_items.delete()
+    with transaction.atomic():
+        cart.items.filter(id__in=[item.id for item in cart_items]).delete()
+        update_cart_summary(request, cart)
     
     # Xóa voucher khỏi session
     if 'applied_coupon' in request.session:
@@ -1704,7 +1869,6 @@ def buy_now(request, product_id):
         return redirect('login')
     
     product = get_object_or_404(Product, id=product_id)
-    cart = get_or_create_cart(request)
     
     # Lấy thông tin từ form
     storage = request.POST.get('storage', '')
@@ -1722,17 +1886,7 @@ def buy_now(request, product_id):
         price = product.sale_price
     
     # Thêm vào giỏ hàng
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product,
-        storage=storage,
-        color=color,
-        defaults={'price': price, 'quantity': quantity}
-    )
-    
-    if not created:
-        cart_item.quantity += quantity
-        cart_item.save()
+    cart_item, created = get_cart_storage(request).add(product, storage, color, quantity, price)
     
     # Lưu sản phẩm được chọn vào session
     request.session['selected_cart_items'] = [cart_item.id]
@@ -2178,11 +2332,15 @@ def admin_review_delete(request, review_id):
     """
     Xóa đánh giá (admin).
     """
-    review = get_object_or_404(Review, id=review_id)
-    product_name = review.product.name if review.product else 'Sản phẩm đã xóa'
+    review = get_object_or_404(Review.objects.select_related('product', 'user'), id=review_id)
+    product = review.product
+    product_name = product.name if product else 'Sản phẩm đã xóa'
     user_username = review.user.username
     
-    review.delete()
+    with transaction.atomic():
+        review.delete()
+        if product:
+            product.record_review_removed()
     messages.success(request, f'Đã xóa đánh giá của {user_username} cho sản phẩm {product_name}')
     
     return redirect('admin_reviews')
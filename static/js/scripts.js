@@ -291,8 +291,103 @@ function showConfirmDialog(title, text, type = 'warning') {
     });
 }
 
+/**
+ * Dien CSRF token tu cookie vao cac form cua trang duoc cache chung
+ * (HTML khong chua token rieng cua tung khach)
+ */
+function fillCsrfTokens() {
+    const token = getCookie('csrftoken');
+    if (!token) return;
+    document.querySelectorAll('input[data-csrf-cookie]').forEach(input => {
+        input.value = token;
+    });
+}
+
+/**
+ * Cap nhat so tren badge gio hang (vi du sau khi xoa san pham bang AJAX)
+ */
+function setCartBadge(totalItems) {
+    const badge = document.getElementById('cartBadge');
+    if (badge && totalItems !== undefined) {
+        badge.textContent = totalItems;
+    }
+}
+
+/**
+ * Tai so san pham trong gio hang cho badge tren header
+ */
+function loadCartBadge() {
+    const badge = document.getElementById('cartBadge');
+    if (!badge) return;
+    fetch(badge.dataset.url, { credentials: 'same-origin' })
+        .then(response => response.json())
+        .then(data => {
+            setCartBadge(data.total_items);
+        })
+        .catch(error => console.error('Error:', error));
+}
+
+/**
+ * Goi y tim kiem (typeahead) cho o tim kiem tren header
+ */
+function initSearchSuggest() {
+    const input = document.getElementById('searchInput');
+    const box = document.getElementById('searchSuggestions');
+    if (!input || !box) return;
+    
+    let timer = null;
+    let lastQuery = '';
+    
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            box.classList.add('hidden');
+            return;
+        }
+        // Cho nguoi dung ngung go mot chut roi moi goi API
+        timer = setTimeout(() => {
+            lastQuery = query;
+            fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(query))
+                .then(response => response.json())
+                .then(data => {
+                    if (data.query !== lastQuery) return;
+                    box.innerHTML = '';
+                    data.suggestions.forEach(item => {
+                        const link = document.createElement('a');
+                        link.href = item.url;
+                        link.className = 'flex justify-between gap-4 px-4 py-2 text-sm text-gray-700 hover:bg-gray-100 no-underline';
+                        const name = document.createElement('span');
+                        name.textContent = item.name;
+                        const price = document.createElement('span');
+                        price.className = 'text-red-600 whitespace-nowrap';
+                        price.textContent = formatCurrency(item.price);
+                        link.append(name, price);
+                        box.appendChild(link);
+                    });
+                    box.classList.toggle('hidden', data.suggestions.length === 0);
+                })
+                .catch(error => console.error('Error:', error));
+        }, 150);
+    });
+    
+    // An goi y khi click ra ngoai
+    document.addEventListener('click', function(event) {
+        if (!box.contains(event.target) && event.target !== input) {
+            box.classList.add('hidden');
+        }
+    });
+}
+
 // Initialize when page is loaded
 document.addEventListener('DOMContentLoaded', function() {
+    // Form va badge gio hang rieng cua tung khach
+    fillCsrfTokens();
+    loadCartBadge();
+    
+    // Goi y tim kiem
+    initSearchSuggest();
+    
     // Initialize gallery
     initGallery();
     